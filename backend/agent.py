@@ -1,13 +1,36 @@
 import os
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, Tuple
 from groq import Groq
 from dotenv import load_dotenv
+from backend.llm_scheduler import llm_scheduler, BATCH, INTERACTIVE
+from backend.metrics import span, traced
 
 load_dotenv()
 
 # Configure Groq
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Fan-out settings for running specialist agents side by side
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "4"))
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "90"))
+# Reuse an agent's earlier output when it is asked the exact same thing (e.g. a retried upload)
+AGENT_RESULT_CACHE_ENABLED = os.getenv("AGENT_RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Agents report failures as text starting with one of these, so callers can keep them out of caches and chat history
+ERROR_PREFIXES = ("Error generating response:", "Error: ")
+
+def is_error_response(text: str) -> bool:
+    return not text or str(text).startswith(ERROR_PREFIXES)
+
 class BaseAgent:
+    # Scheduling priority of this agent's LLM calls (see backend/llm_scheduler.py)
+    priority = BATCH
+    # Part of the result-cache key; bump it when the agent's prompt template changes
+    prompt_version = "1"
+
     def __init__(self, model_name="llama-3.3-70b-versatile"):
         if not GROQ_API_KEY:
             print("Error: GROQ_API_KEY not found.")
@@ -16,24 +39,80 @@ class BaseAgent:
             self.client = Groq(api_key=GROQ_API_KEY)
         self.model_name = model_name
 
+    def fingerprint(self, prompt: str) -> str:
+        """Result-cache key: agent, prompt template version, model and the full prompt (which embeds the input data)."""
+        raw = f"{type(self).__name__}:{self.prompt_version}:{self.model_name}\0{prompt}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
     def generate(self, prompt: str) -> str:
         if not self.client:
             return "Error: AI not configured. Please add GROQ_API_KEY to .env"
-        
+
+        key = self.fingerprint(prompt) if AGENT_RESULT_CACHE_ENABLED else None
+        if key:
+            cached = cache_system.get_analysis(key)
+            if cached:
+                print(f"⚡ Reusing {type(self).__name__} output for identical input")
+                return cached
+
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=self.model_name,
-            )
-            return chat_completion.choices[0].message.content
+            with span(f"agent.{type(self).__name__}"):
+                chat_completion = llm_scheduler.complete(
+                    self.client,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt,
+                        }
+                    ],
+                    model=self.model_name,
+                    priority=self.priority,
+                )
+            text = chat_completion.choices[0].message.content
+            # Only real analyses are stored, never error text
+            if key and not is_error_response(text):
+                cache_system.set_analysis(key, text)
+            return text
         except Exception as e:
             return f"Error generating response: {str(e)}"
 
+    @staticmethod
+    def run_concurrently(tasks: Dict[str, Tuple[Callable[..., str], tuple]],
+                         timeout: float = None, max_workers: int = None) -> Dict[str, str]:
+        """
+        Fan out independent agent calls on a bounded thread pool and fan the results back in.
+        `tasks` maps a name to (callable, args). Each task gets `timeout` seconds from the
+        moment the batch starts; a task that times out or raises yields an error string
+        instead of failing the whole batch, so callers always get a result per name.
+        """
+        timeout = AGENT_TIMEOUT_SECONDS if timeout is None else timeout
+        max_workers = max_workers or AGENT_MAX_WORKERS
+        if not tasks:
+            return {}
+
+        start = time.perf_counter()
+        # Not using the context manager: its shutdown would block on timed-out tasks
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)), thread_name_prefix="agent")
+        try:
+            futures = {name: executor.submit(fn, *args) for name, (fn, args) in tasks.items()}
+            wait(futures.values(), timeout=timeout)
+
+            results = {}
+            for name, future in futures.items():
+                if not future.done():
+                    future.cancel()
+                    results[name] = f"Error: {name} analysis timed out after {timeout:.0f}s"
+                    continue
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = f"Error generating response: {str(e)}"
+        finally:
+            executor.shutdown(wait=False)
+
+        print(f"Agent fan-out finished in {time.perf_counter() - start:.2f}s ({len(tasks)} agents)")
+        return results
+
 class EmployeeRiskAgent(BaseAgent):
     def analyze(self, employee_data: str) -> str:
         prompt = f"""
@@ -90,6 +169,27 @@ class MarketAnalysisAgent(BaseAgent):
         """
         return self.generate(prompt)
 
+class SummaryAgent(BaseAgent):
+    # Summaries are folded while a user waits on a chat answer
+    priority = INTERACTIVE
+
+    def summarize(self, previous_summary: str, transcript: str, max_tokens: int = 500) -> str:
+        prompt = f"""
+        You maintain the running memory of a risk-consulting conversation.
+        Update the existing summary with the new conversation turns below.
+        Keep key facts, figures, identified risks, decisions and open questions; drop pleasantries.
+        Stay under {int(max_tokens * 0.75)} words.
+        
+        Existing Summary:
+        {previous_summary or "(none)"}
+        
+        New Turns:
+        {transcript}
+        
+        Updated Summary:
+        """
+        return self.generate(prompt)
+
 from backend.rag import RAGSystem
 from backend.cache import CacheSystem
 
@@ -120,48 +220,106 @@ class MasterAgent(BaseAgent):
         """
         return self.generate(prompt)
 
-    def chat(self, user_message: str, history: list, project_id: str) -> str:
+    def _build_messages(self, user_message: str, history: list, project_id: str, query_vector=None, summary: str = None) -> list:
+        # Retrieve Context (RAG)
+        # We search for relevant documents in the vector DB
+        relevant_chunks = rag_system.retrieve(user_message, limit=3, project_id=project_id, query_vector=query_vector)
+        context_text = "\n---\n".join(relevant_chunks) if relevant_chunks else "No specific document context found."
+        
+        print(f"\n🔍 RAG Retrieved Context ({len(relevant_chunks)} chunks):\n{context_text[:200]}...\n") # Debug print
+
+        # Construct Prompt with RAG Context
+        messages = [
+            {"role": "system", "content": f"You are RiskPilot, an AI Risk Intelligence System.\n\nRelevant Context from Project Files:\n{context_text}"}
+        ]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        
+        # Add history
+        if history:
+            for msg in history:
+                u_msg = str(msg.get('message') or "")
+                a_res = str(msg.get('response') or "")
+                if u_msg: messages.append({"role": "user", "content": u_msg})
+                if a_res: messages.append({"role": "assistant", "content": a_res})
+            
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    @traced("agent.chat")
+    def chat(self, user_message: str, history: list, project_id: str, summary: str = None) -> str:
         try:
+            # Embed once: the same vector drives the semantic cache lookup and retrieval
+            with span("chat.embed_query"):
+                query_vector = rag_system.embed_text(user_message) if cache_system.semantic else None
+
             # 1. Check Cache
-            cached_response = cache_system.get_cached_response(project_id, user_message)
+            cached_response = cache_system.get_cached_response(project_id, user_message, query_vector)
             if cached_response:
                 return f"(Cached) {cached_response}"
 
-            # 2. Retrieve Context (RAG)
-            # We search for relevant documents in the vector DB
-            relevant_chunks = rag_system.retrieve(user_message, limit=3)
-            context_text = "\n---\n".join(relevant_chunks) if relevant_chunks else "No specific document context found."
-            
-            print(f"\n🔍 RAG Retrieved Context ({len(relevant_chunks)} chunks):\n{context_text[:200]}...\n") # Debug print
-
-            # 3. Construct Prompt with RAG Context
-            messages = [
-                {"role": "system", "content": f"You are RiskPilot, an AI Risk Intelligence System.\n\nRelevant Context from Project Files:\n{context_text}"}
-            ]
-            
-            # Add history
-            if history:
-                for msg in history:
-                    u_msg = str(msg.get('message') or "")
-                    a_res = str(msg.get('response') or "")
-                    if u_msg: messages.append({"role": "user", "content": u_msg})
-                    if a_res: messages.append({"role": "assistant", "content": a_res})
-                
-            messages.append({"role": "user", "content": user_message})
+            # 2. Retrieve context and build the prompt
+            with span("chat.retrieve"):
+                messages = self._build_messages(user_message, history, project_id, query_vector, summary)
 
             if not self.client:
                  return "Error: AI Config Missing (Check GROQ_API_KEY)"
 
-            chat_completion = self.client.chat.completions.create(
-                messages=messages,
-                model=self.model_name,
-            )
+            with span("chat.llm"):
+                chat_completion = llm_scheduler.complete(
+                    self.client,
+                    messages=messages,
+                    model=self.model_name,
+                    priority=INTERACTIVE,
+                )
             response_text = chat_completion.choices[0].message.content
             
-            # 4. Save to Cache
-            cache_system.set_cached_response(project_id, user_message, response_text)
+            # 3. Save to Cache
+            if not is_error_response(response_text):
+                cache_system.set_cached_response(project_id, user_message, response_text, query_vector)
             
             return response_text
         except Exception as e:
             print(f"Agent Chat Error: {e}")
             return f"Error generating response: {str(e)}"
+
+    def chat_stream(self, user_message: str, history: list, project_id: str, summary: str = None) -> Iterator[str]:
+        """
+        Streaming variant of chat: yields response text pieces as Groq produces them.
+        The full response is cached once the stream completes; errors are yielded as text.
+        """
+        try:
+            # Spans here open and close between two yields: a generator can resume in another context
+            with span("chat.embed_query"):
+                query_vector = rag_system.embed_text(user_message) if cache_system.semantic else None
+
+            cached_response = cache_system.get_cached_response(project_id, user_message, query_vector)
+            if cached_response:
+                yield f"(Cached) {cached_response}"
+                return
+
+            with span("chat.retrieve"):
+                messages = self._build_messages(user_message, history, project_id, query_vector, summary)
+
+            if not self.client:
+                yield "Error: AI Config Missing (Check GROQ_API_KEY)"
+                return
+
+            stream = llm_scheduler.stream(
+                self.client,
+                messages=messages,
+                model=self.model_name,
+                priority=INTERACTIVE,
+            )
+            parts = []
+            for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    parts.append(token)
+                    yield token
+
+            if not is_error_response("".join(parts)):
+                cache_system.set_cached_response(project_id, user_message, "".join(parts), query_vector)
+        except Exception as e:
+            print(f"Agent Chat Stream Error: {e}")
+            yield f"Error generating response: {str(e)}"
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import uuid
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from dotenv import load_dotenv
+from backend.metrics import span
+
+load_dotenv()
+
+# --- Configuration ---
+BULK_BATCH_ROWS = int(os.getenv("BULK_BATCH_ROWS", "1000"))
+BULK_BATCH_BYTES = int(os.getenv("BULK_BATCH_BYTES", str(2 * 1024 * 1024)))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+BULK_MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", "3"))
+BULK_BACKOFF_SECONDS = float(os.getenv("BULK_BACKOFF_SECONDS", "0.5"))
+
+
+class BulkWriteError(Exception):
+    """Some batches still failed after every retry; `stats` has the counters of the whole write."""
+
+    def __init__(self, table: str, stats: Dict):
+        self.table = table
+        self.stats = stats
+        detail = f": {stats['errors'][0]}" if stats["errors"] else ""
+        super().__init__(f"{stats['failed_rows']} rows could not be written to {table}{detail}")
+
+
+def idempotent_ids(rows: Iterable[Dict], namespace: str, key: str = "id", start: int = 0) -> Iterator[Dict]:
+    """
+    Give each row a deterministic uuid derived from `namespace` and its position.
+    Writing with upsert on that id makes a retried batch overwrite instead of duplicate.
+    `start` is the position of the first row, for streams written one chunk at a time.
+    """
+    ns = uuid.uuid5(uuid.NAMESPACE_URL, namespace)
+    for i, row in enumerate(rows, start):
+        if row.get(key) is None:
+            row[key] = str(uuid.uuid5(ns, str(i)))
+        yield row
+
+
+class BulkWriter:
+    """
+    Writes rows to a Supabase table in size-bounded batches.
+    Batches are limited by row count and approximate JSON size, sent on a small
+    thread pool with a cap on in-flight batches (so streamed input stays bounded
+    in memory), and retried with jittered exponential backoff. `get_client` is any
+    callable returning an object with .table(name).insert/upsert(rows).execute().
+    """
+
+    def __init__(self, get_client: Callable, batch_rows: int = BULK_BATCH_ROWS, batch_bytes: int = BULK_BATCH_BYTES,
+                 concurrency: int = BULK_CONCURRENCY, max_retries: int = BULK_MAX_RETRIES,
+                 backoff_seconds: float = BULK_BACKOFF_SECONDS):
+        self.get_client = get_client
+        self.batch_rows = batch_rows
+        self.batch_bytes = batch_bytes
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+    def _batches(self, rows: Iterable[Dict]) -> Iterator[List[Dict]]:
+        batch, size = [], 2
+        for row in rows:
+            row_size = len(json.dumps(row, default=str)) + 1
+            if batch and (len(batch) >= self.batch_rows or size + row_size > self.batch_bytes):
+                yield batch
+                batch, size = [], 2
+            batch.append(row)
+            size += row_size
+        if batch:
+            yield batch
+
+    def _send(self, table: str, batch: List[Dict], method: str, on_conflict: Optional[str], stats: Dict, lock):
+        for attempt in range(self.max_retries + 1):
+            try:
+                query = self.get_client().table(table)
+                if method == "upsert":
+                    request = query.upsert(batch, on_conflict=on_conflict) if on_conflict else query.upsert(batch)
+                else:
+                    request = query.insert(batch)
+                with span(f"db.{method}.{table}"):
+                    request.execute()
+                with lock:
+                    stats["rows"] += len(batch)
+                    stats["batches"] += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Bulk write to {table} failed after {attempt + 1} attempts ({len(batch)} rows): {e}")
+                    with lock:
+                        stats["failed_rows"] += len(batch)
+                        stats["failed_batches"] += 1
+                        stats["errors"].append(str(e))
+                    return
+                with lock:
+                    stats["retries"] += 1
+                delay = self.backoff_seconds * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+
+    def write(self, table: str, rows: Iterable[Dict], method: str = "insert", on_conflict: str = None,
+              allow_partial: bool = False) -> Dict:
+        """
+        Write all rows and return {rows, batches, retries, failed_rows, failed_batches, seconds, rows_per_sec, errors}.
+        If any batch still fails after its retries, BulkWriteError is raised once every other batch
+        has been sent, unless `allow_partial` is set.
+        """
+        stats = {"rows": 0, "batches": 0, "retries": 0, "failed_rows": 0, "failed_batches": 0, "errors": []}
+        lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+        start = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"bulk-{table}")
+        try:
+            for batch in self._batches(rows):
+                in_flight.acquire()
+                future = executor.submit(self._send, table, batch, method, on_conflict, stats, lock)
+                future.add_done_callback(lambda _: in_flight.release())
+        finally:
+            executor.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = round(elapsed, 3)
+        stats["rows_per_sec"] = round(stats["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+        stats["errors"] = stats["errors"][:5]
+        print(f"Bulk {method} into {table}: {stats['rows']} rows in {elapsed:.2f}s "
+              f"({stats['rows_per_sec']} rows/sec, {stats['retries']} retries, {stats['failed_rows']} failed)")
+        if stats["failed_rows"] and not allow_partial:
+            raise BulkWriteError(table, stats)
+        return stats
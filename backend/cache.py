@@ -1,7 +1,13 @@
 import os
+import time
 import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
 import redis
 from dotenv import load_dotenv
+from backend.metrics import span, CACHE_LOOKUPS
 
 load_dotenv()
 
@@ -9,37 +15,354 @@ load_dotenv()
 # We use a default fallback for local dev if REDIS_URL isn't set
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-try:
-    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-    # Test connection
-    redis_client.ping()
-    print(" Connected to Redis")
-except Exception as e:
-    print(f" Redis Connection Failed: {e}")
-    redis_client = None
+# Semantic cache: reuse an answer when a new question is close enough to one already answered
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_PER_PROJECT = int(os.getenv("SEMANTIC_CACHE_MAX_PER_PROJECT", "256"))
+
+# In-process first tier, kept short-lived so workers don't serve each other stale answers for long
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "2048"))
+LOCAL_CACHE_TTL_SECONDS = int(os.getenv("LOCAL_CACHE_TTL_SECONDS", "300"))
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "30"))
+# How long a worker trusts its copy of a project's data version before re-reading it from Redis
+DATA_VERSION_REFRESH_SECONDS = float(os.getenv("DATA_VERSION_REFRESH_SECONDS", "5"))
+# Agent analyses are keyed by their exact input, so they can live much longer than chat answers
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+class LocalLRUCache:
+    """Bounded in-memory LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES, ttl_seconds: int = LOCAL_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: int = None):
+        ttl = min(ttl_seconds or self.ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisTier:
+    """
+    Shared second tier. A failed ping or command marks Redis as down and starts
+    a background thread that keeps retrying, instead of disabling caching for good.
+    """
+
+    def __init__(self, url: str = REDIS_URL, retry_seconds: float = REDIS_RETRY_SECONDS):
+        self.url = url
+        self.retry_seconds = retry_seconds
+        self.client = None
+        self._reconnecting = False
+        self._lock = threading.Lock()
+        # Connect in the background so importing the backend never waits on Redis;
+        # until then lookups simply fall through to the local tier.
+        self._schedule_reconnect()
+
+    def _connect(self) -> bool:
+        try:
+            client = redis.from_url(self.url, decode_responses=True)
+            # Test connection
+            client.ping()
+            self.client = client
+            print(" Connected to Redis")
+            return True
+        except Exception as e:
+            print(f" Redis Connection Failed: {e}")
+            self.client = None
+            return False
+
+    def _schedule_reconnect(self):
+        with self._lock:
+            if self._reconnecting:
+                return
+            self._reconnecting = True
+
+        def loop():
+            while True:
+                if not self._connect():
+                    time.sleep(self.retry_seconds)
+                    continue
+                with self._lock:
+                    # A command may have failed (and found this loop still running) since the connect
+                    if self.client is not None:
+                        self._reconnecting = False
+                        return
+
+        threading.Thread(target=loop, name="redis-reconnect", daemon=True).start()
+
+    def _mark_down(self, error: Exception):
+        print(f" Redis error, switching to local cache only: {error}")
+        self.client = None
+        self._schedule_reconnect()
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def get(self, key: str) -> Optional[str]:
+        client = self.client
+        if not client:
+            return None
+        try:
+            return client.get(key)
+        except Exception as e:
+            self._mark_down(e)
+            return None
+
+    def setex(self, key: str, ttl_seconds: int, value: str):
+        client = self.client
+        if not client:
+            return
+        try:
+            client.setex(key, ttl_seconds, value)
+        except Exception as e:
+            self._mark_down(e)
+
+    def incr(self, key: str, amount: int = 1) -> Optional[int]:
+        client = self.client
+        if not client:
+            return None
+        try:
+            return client.incr(key, amount)
+        except Exception as e:
+            self._mark_down(e)
+            return None
+
+
+redis_tier = RedisTier()
+
+class SemanticIndex:
+    """
+    Normalized query embeddings for one project, searched with a single matrix-vector product.
+    Entries expire with the cache TTL; the oldest entry is dropped once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = SEMANTIC_CACHE_MAX_PER_PROJECT):
+        self.max_entries = max_entries
+        self.queries: List[str] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.expires = np.empty(0, dtype=np.float64)
+
+    def add(self, query: str, vector: np.ndarray, expires_at: float):
+        if query in self.queries:
+            i = self.queries.index(query)
+            self.vectors[i] = vector
+            self.expires[i] = expires_at
+            return
+        if self.vectors is None:
+            self.vectors = np.empty((0, vector.shape[0]), dtype=np.float32)
+        if len(self.queries) >= self.max_entries:
+            self.queries.pop(0)
+            self.vectors = self.vectors[1:]
+            self.expires = self.expires[1:]
+        self.queries.append(query)
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.expires = np.append(self.expires, expires_at)
+
+    def nearest(self, vector: np.ndarray, now: float):
+        """Return (query, similarity) of the closest live entry, or (None, 0.0)."""
+        if not self.queries:
+            return None, 0.0
+        live = self.expires > now
+        if not live.all():
+            self.queries = [q for q, keep in zip(self.queries, live) if keep]
+            self.vectors = self.vectors[live]
+            self.expires = self.expires[live]
+            if not self.queries:
+                return None, 0.0
+        scores = self.vectors @ vector
+        best = int(np.argmax(scores))
+        return self.queries[best], float(scores[best])
+
+
+def _normalize(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    return v / (np.linalg.norm(v) or 1.0)
+
 
 class CacheSystem:
-    def __init__(self, ttl_seconds=3600):
+    def __init__(self, ttl_seconds=3600, semantic: bool = SEMANTIC_CACHE_ENABLED,
+                 similarity_threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 local: LocalLRUCache = None, remote: RedisTier = None):
         self.ttl = ttl_seconds # Default 1 hour cache
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._semantic_indexes: Dict[str, SemanticIndex] = {}
+        self._semantic_lock = threading.Lock()
+        self.local = local or LocalLRUCache()
+        self.remote = remote or redis_tier
+        self.counters = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+        self._versions: Dict[str, tuple] = {}
+
+    @staticmethod
+    def _version_key(project_id: str) -> str:
+        return f"data_version:{project_id}"
+
+    def get_data_version(self, project_id: str) -> int:
+        """Current data version of a project; cached briefly so lookups stay off the network."""
+        project_id = str(project_id)
+        now = time.time()
+        cached = self._versions.get(project_id)
+        if cached and now - cached[1] < DATA_VERSION_REFRESH_SECONDS:
+            return cached[0]
+
+        known = cached[0] if cached else 0
+        raw = self.remote.get(self._version_key(project_id))
+        if raw is not None:
+            version = int(raw)
+        elif self.remote.available:
+            version = 0
+        else:
+            # Redis unreachable: keep whatever this worker last knew
+            version = known
+        if version < known:
+            version = self._catch_up(project_id, version, known)
+        self._versions[project_id] = (version, now)
+        return version
+
+    def _catch_up(self, project_id: str, remote: int, known: int) -> int:
+        """
+        This worker bumped the version while Redis was unreachable: raise Redis to it rather
+        than go back to a namespace whose keys predate the change. INCRBY only ever moves the
+        counter forward, so a concurrent bump elsewhere is never undone.
+        """
+        version = self.remote.incr(self._version_key(project_id), known - remote)
+        return known if version is None else max(version, known)
+
+    def bump_data_version(self, project_id: str) -> int:
+        """
+        Move a project to a new cache namespace after its data changes.
+        Keys from the old version are never read again and age out with their TTL,
+        so invalidation costs one INCR instead of a key scan.
+        """
+        project_id = str(project_id)
+        cached = self._versions.get(project_id)
+        known = cached[0] if cached else 0
+        version = self.remote.incr(self._version_key(project_id))
+        if version is None:
+            version = known + 1
+        elif version <= known:
+            version = self._catch_up(project_id, version, known + 1)
+        self._versions[project_id] = (version, time.time())
+        with self._semantic_lock:
+            self._semantic_indexes.pop(project_id, None)
+        print(f"Cache namespace for project {project_id} is now v{version}")
+        return version
 
     def _generate_key(self, project_id: str, query: str) -> str:
-        """Create a unique hash for the query within a project."""
-        raw = f"{project_id}:{query.strip().lower()}"
+        """Create a unique hash for the query within a project's current data version."""
+        version = self.get_data_version(project_id)
+        raw = f"{project_id}:v{version}:{query.strip().lower()}"
         return hashlib.sha256(raw.encode()).hexdigest()
 
-    def get_cached_response(self, project_id: str, query: str) -> str:
-        if not redis_client: return None
-        
-        key = self._generate_key(project_id, query)
-        cached = redis_client.get(key)
-        if cached:
-            print(f"⚡ Cache Hit for query: '{query}'")
-            return cached
+    def get_versioned(self, project_id: str, name: str) -> Optional[str]:
+        """Cached artifact (e.g. a computed report) for the project's current data version."""
+        return self._get(self._artifact_key(project_id, name), "artifact")
+
+    def set_versioned(self, project_id: str, name: str, value: str):
+        self._set(self._artifact_key(project_id, name), value)
+
+    def _artifact_key(self, project_id: str, name: str) -> str:
+        version = self.get_data_version(project_id)
+        return hashlib.sha256(f"artifact:{project_id}:v{version}:{name}".encode()).hexdigest()
+
+    def _get(self, key: str, kind: str = "response") -> Optional[str]:
+        """Look the key up in memory first, then Redis, promoting Redis hits into memory."""
+        value = self.local.get(key)
+        if value is not None:
+            self.counters["local_hits"] += 1
+            CACHE_LOOKUPS.inc(cache=kind, result="local_hit")
+            return value
+        with span("cache.redis_get"):
+            value = self.remote.get(key)
+        if value is not None:
+            self.counters["redis_hits"] += 1
+            CACHE_LOOKUPS.inc(cache=kind, result="redis_hit")
+            self.local.set(key, value)
+            return value
+        self.counters["misses"] += 1
+        CACHE_LOOKUPS.inc(cache=kind, result="miss")
         return None
 
-    def set_cached_response(self, project_id: str, query: str, response: str):
-        if not redis_client: return
-        
-        key = self._generate_key(project_id, query)
-        redis_client.setex(key, self.ttl, response)
-        print(f" Saved to Cache: '{query}'")
+    def _set(self, key: str, value: str, ttl_seconds: int = None):
+        ttl = ttl_seconds or self.ttl
+        self.local.set(key, value, ttl)
+        with span("cache.redis_set"):
+            self.remote.setex(key, ttl, value)
+
+    def get_analysis(self, fingerprint: str) -> Optional[str]:
+        """Stored agent output for an input fingerprint (see BaseAgent.generate)."""
+        return self._get(f"analysis:{fingerprint}", "analysis")
+
+    def set_analysis(self, fingerprint: str, text: str):
+        self._set(f"analysis:{fingerprint}", text, ANALYSIS_CACHE_TTL_SECONDS)
+
+    def stats(self) -> Dict:
+        lookups = sum(self.counters.values())
+        rate = lambda n: round(n / lookups, 4) if lookups else 0.0
+        return {
+            **self.counters,
+            "lookups": lookups,
+            "local_hit_rate": rate(self.counters["local_hits"]),
+            "redis_hit_rate": rate(self.counters["redis_hits"]),
+            "local_entries": len(self.local),
+            "redis_available": self.remote.available,
+        }
+
+    def get_cached_response(self, project_id: str, query: str, query_vector: List[float] = None) -> str:
+        with span("cache.get"):
+            key = self._generate_key(project_id, query)
+            cached = self._get(key)
+            if cached:
+                print(f"⚡ Cache Hit for query: '{query}'")
+                return cached
+
+            if self.semantic and query_vector is not None:
+                return self._get_semantic(project_id, query, query_vector)
+            return None
+
+    def _get_semantic(self, project_id: str, query: str, query_vector: List[float]) -> str:
+        with self._semantic_lock:
+            index = self._semantic_indexes.get(str(project_id))
+            if index is None:
+                return None
+            match, score = index.nearest(_normalize(query_vector), time.time())
+        if match is None or score < self.similarity_threshold:
+            return None
+
+        cached = self._get(self._generate_key(project_id, match), "semantic")
+        if cached:
+            print(f"⚡ Semantic Cache Hit for query: '{query}' ~ '{match}' ({score:.3f})")
+        return cached
+
+    def set_cached_response(self, project_id: str, query: str, response: str, query_vector: List[float] = None):
+        with span("cache.set"):
+            key = self._generate_key(project_id, query)
+            self._set(key, response)
+            print(f" Saved to Cache: '{query}'")
+
+            if self.semantic and query_vector is not None:
+                with self._semantic_lock:
+                    index = self._semantic_indexes.setdefault(str(project_id), SemanticIndex())
+                    index.add(query.strip().lower(), _normalize(query_vector), time.time() + self.ttl)
@@ -0,0 +1,282 @@
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from dotenv import load_dotenv
+from backend.columnar import typed_frame
+
+load_dotenv()
+
+# --- Configuration ---
+# How uploaded rows become RAG documents:
+#   "row"     one document per CSV row (the original behaviour)
+#   "window"  RAG_CHUNK_ROWS consecutive rows per document, header stated once
+#   "group"   up to RAG_CHUNK_ROWS rows sharing a value of the type's group column
+#   "summary" one aggregate document per value of the group column
+RAG_CHUNKER = os.getenv("RAG_CHUNKER", "row").lower()
+# all-MiniLM-L6-v2 truncates its input at 256 word pieces, so larger windows stop adding recall
+RAG_CHUNK_ROWS = int(os.getenv("RAG_CHUNK_ROWS", "8"))
+# Group column per document type, e.g. "Financials=category,Employees=department"
+RAG_CHUNK_GROUP_BY = os.getenv("RAG_CHUNK_GROUP_BY", "Financials=category,Employees=department,Projects=name")
+# Example rows quoted in each summary document
+RAG_SUMMARY_EXAMPLES = int(os.getenv("RAG_SUMMARY_EXAMPLES", "3"))
+# Partial groups are flushed once this many rows are waiting for their group to fill up
+RAG_GROUP_BUFFER_ROWS = int(os.getenv("RAG_GROUP_BUFFER_ROWS", "50000"))
+
+CHUNKERS = ("row", "window", "group", "summary")
+SUMMARY_TOP_VALUES = 3
+# Value counts kept per group and column between chunks (approximate top values past this)
+_SUMMARY_VALUE_CAP = 50
+
+# A chunker turns a streamed CSV (read chunk by chunk as raw cell text, row index counting
+# across chunks) into documents: add(df) returns the documents that are complete, finish() the rest.
+# Each document is {"text", "metadata"}; metadata points back to the source rows by their
+# 0-based data row number in the upload ("rows": inclusive [first, last] ranges) and/or the
+# group they were selected by ("group": {"column", "value"}).
+
+
+def parse_group_by(spec: str = RAG_CHUNK_GROUP_BY) -> Dict[str, str]:
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {doc_type.strip(): column.strip() for doc_type, column in pairs}
+
+
+def frame_header(df: pd.DataFrame) -> str:
+    return df.head(0).to_csv(index=False, lineterminator="\n").rstrip("\n")
+
+
+def frame_lines(df: pd.DataFrame) -> List[str]:
+    """One CSV line per row (embedded newlines replaced by spaces), without the header."""
+    flat = df.copy()
+    for col in flat.select_dtypes(include=["object", "string"]).columns:
+        flat[col] = flat[col].str.replace(r"[\r\n]+", " ", regex=True)
+    return flat.to_csv(index=False, header=False, lineterminator="\n").split("\n")[:len(df)]
+
+
+def row_ranges(rows: Iterable[int]) -> List[List[int]]:
+    """Collapse row numbers into sorted inclusive [first, last] runs."""
+    ranges = []
+    for row in sorted(rows):
+        if ranges and row == ranges[-1][1] + 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return ranges
+
+
+def covers(metadata: Dict, row: int) -> bool:
+    """Whether a document's "rows" metadata includes a source row number."""
+    return any(first <= row <= last for first, last in metadata.get("rows", []))
+
+
+def _group_value(value):
+    # A blank cell in a raw text chunk is a missing value, like NaN in a parsed one
+    return None if pd.isna(value) or value == "" else str(value)
+
+
+def _rows_text(doc_type: str, header: str, lines: List[str], title: str = None) -> str:
+    head = f"Context: {doc_type}\n" + (f"{title}\n" if title else "")
+    return head + f"Data: {header}\nValues:\n" + "\n".join(lines)
+
+
+class RowChunker:
+    """One document per row, in the text form ingest_csv has always used."""
+
+    name = "row"
+
+    def __init__(self, doc_type: str):
+        self.doc_type = doc_type
+
+    def add(self, df: pd.DataFrame) -> List[Dict]:
+        header = frame_header(df)
+        return [{"text": f"Context: {self.doc_type}\nData: {header}\nValues: {line}",
+                 "metadata": {"chunker": self.name, "rows": [[row, row]]}}
+                for row, line in zip(df.index.tolist(), frame_lines(df))]
+
+    def finish(self) -> List[Dict]:
+        return []
+
+
+class WindowChunker:
+    """Consecutive rows of the file, `rows` at a time; windows do not restart at chunk boundaries."""
+
+    name = "window"
+
+    def __init__(self, doc_type: str, rows: int = RAG_CHUNK_ROWS):
+        self.doc_type = doc_type
+        self.rows = max(1, rows)
+        self.header = None
+        self._pending: List[tuple] = []
+
+    def _document(self, pending: List[tuple]) -> Dict:
+        return {"text": _rows_text(self.doc_type, self.header, [line for _, line in pending]),
+                "metadata": {"chunker": self.name, "rows": row_ranges(row for row, _ in pending)}}
+
+    def add(self, df: pd.DataFrame) -> List[Dict]:
+        if self.header is None:
+            self.header = frame_header(df)
+        self._pending.extend(zip(df.index.tolist(), frame_lines(df)))
+        full = len(self._pending) - len(self._pending) % self.rows
+        documents = [self._document(self._pending[i:i + self.rows]) for i in range(0, full, self.rows)]
+        self._pending = self._pending[full:]
+        return documents
+
+    def finish(self) -> List[Dict]:
+        documents = [self._document(self._pending)] if self._pending else []
+        self._pending = []
+        return documents
+
+
+class GroupChunker:
+    """Rows sharing a value of `column`, up to `rows` per document, in file order within the group."""
+
+    name = "group"
+
+    def __init__(self, doc_type: str, column: str, rows: int = RAG_CHUNK_ROWS,
+                 buffer_rows: int = RAG_GROUP_BUFFER_ROWS):
+        self.doc_type = doc_type
+        self.column = column
+        self.rows = max(1, rows)
+        self.buffer_rows = buffer_rows
+        self.header = None
+        self._pending: Dict[Optional[str], List[tuple]] = {}
+        self._waiting = 0
+
+    def _document(self, value, pending: List[tuple]) -> Dict:
+        title = f"Group: {self.column} = {value}"
+        return {"text": _rows_text(self.doc_type, self.header, [line for _, line in pending], title),
+                "metadata": {"chunker": self.name, "group": {"column": self.column, "value": value},
+                             "rows": row_ranges(row for row, _ in pending)}}
+
+    def add(self, df: pd.DataFrame) -> List[Dict]:
+        if self.header is None:
+            self.header = frame_header(df)
+        documents = []
+        lines = pd.Series(frame_lines(df), index=df.index)
+        for key, rows in df.groupby(self.column, dropna=False, sort=False).groups.items():
+            value = _group_value(key)
+            pending = self._pending.setdefault(value, [])
+            self._waiting -= len(pending)
+            pending.extend(zip(rows.tolist(), lines.loc[rows].tolist()))
+            full = len(pending) - len(pending) % self.rows
+            documents.extend(self._document(value, pending[i:i + self.rows]) for i in range(0, full, self.rows))
+            self._pending[value] = pending[full:]
+            self._waiting += len(self._pending[value])
+        if self._waiting > self.buffer_rows:
+            documents.extend(self.finish())
+        return documents
+
+    def finish(self) -> List[Dict]:
+        documents = [self._document(value, pending) for value, pending in self._pending.items() if pending]
+        self._pending, self._waiting = {}, 0
+        return documents
+
+
+class _GroupSummary:
+    def __init__(self):
+        self.count = 0
+        self.first_row = None
+        self.last_row = None
+        self.numeric: Dict[str, List[float]] = {}
+        self.values: Dict[str, Counter] = {}
+        self.examples: List[tuple] = []
+
+
+class SummaryChunker:
+    """
+    One document per value of `column` with its row count, numeric totals and ranges,
+    most common values and a few example rows. Documents are only complete once the whole
+    upload has been seen, so everything is returned by finish().
+    """
+
+    name = "summary"
+
+    def __init__(self, doc_type: str, column: str, examples: int = RAG_SUMMARY_EXAMPLES):
+        self.doc_type = doc_type
+        self.column = column
+        self.examples = examples
+        self.header = None
+        self._groups: Dict[Optional[str], _GroupSummary] = {}
+
+    def add(self, df: pd.DataFrame) -> List[Dict]:
+        if self.header is None:
+            self.header = frame_header(df)
+        lines = pd.Series(frame_lines(df), index=df.index)
+        # Totals and value counts need numbers and real missing values, not the raw cell text
+        df = typed_frame(df)
+        grouped = df.groupby(self.column, dropna=False, sort=False)
+        numeric_cols = [c for c in df.select_dtypes(include="number").columns if c != self.column]
+        text_cols = [c for c in df.columns if c not in numeric_cols and c != self.column]
+
+        for key, rows in grouped.groups.items():
+            summary = self._groups.setdefault(_group_value(key), _GroupSummary())
+            summary.count += len(rows)
+            if summary.first_row is None:
+                summary.first_row = int(rows.min())
+            summary.last_row = int(rows.max())
+            if len(summary.examples) < self.examples:
+                head = rows[:self.examples - len(summary.examples)]
+                summary.examples.extend(zip(head.tolist(), lines.loc[head].tolist()))
+
+        if numeric_cols:
+            stats = grouped[numeric_cols].agg(["sum", "min", "max", "count"])
+            for key, values in zip(stats.index, stats.to_numpy().reshape(len(stats), len(numeric_cols), 4)):
+                summary = self._groups[_group_value(key)]
+                for col, (total, low, high, count) in zip(numeric_cols, values.tolist()):
+                    if not count:
+                        continue
+                    current = summary.numeric.get(col)
+                    summary.numeric[col] = [total, low, high, count] if current is None else [
+                        current[0] + total, min(current[1], low), max(current[2], high), current[3] + count]
+
+        for col in text_cols:
+            sizes = df[[self.column, col]].dropna(subset=[col]).groupby(
+                [self.column, col], dropna=False, sort=False).size()
+            touched = set()
+            for (key, value), n in sizes.items():
+                value_key = _group_value(key)
+                self._groups[value_key].values.setdefault(col, Counter())[str(value)] += n
+                touched.add(value_key)
+            for value_key in touched:
+                counts = self._groups[value_key].values[col]
+                if len(counts) > _SUMMARY_VALUE_CAP:
+                    self._groups[value_key].values[col] = Counter(dict(counts.most_common(_SUMMARY_VALUE_CAP)))
+        return []
+
+    def _document(self, value, summary: _GroupSummary) -> Dict:
+        lines = [f"Context: {self.doc_type}", f"Summary of {self.column} = {value} ({summary.count} rows)"]
+        for col, (total, low, high, count) in summary.numeric.items():
+            lines.append(f"{col}: total {total:,.2f}, mean {total / count:,.2f}, min {low:,.2f}, max {high:,.2f}")
+        for col, counts in summary.values.items():
+            top = counts.most_common(SUMMARY_TOP_VALUES)
+            if top:
+                lines.append(f"{col}: " + ", ".join(f"{v} ({n})" for v, n in top))
+        if summary.examples:
+            lines += [f"Examples: {self.header}"] + [line for _, line in summary.examples]
+        return {"text": "\n".join(lines),
+                "metadata": {"chunker": self.name, "group": {"column": self.column, "value": value},
+                             "row_count": summary.count, "first_row": summary.first_row,
+                             "last_row": summary.last_row,
+                             "rows": row_ranges(row for row, _ in summary.examples)}}
+
+    def finish(self) -> List[Dict]:
+        documents = [self._document(value, summary) for value, summary in self._groups.items()]
+        self._groups = {}
+        return documents
+
+
+def create_chunker(strategy: str, doc_type: str, columns, group_by: Dict[str, str] = None,
+                   rows: int = RAG_CHUNK_ROWS):
+    """
+    Chunker for one document type of an upload with the given columns. The grouped
+    strategies fall back to row windows when the type has no group column in the file.
+    """
+    if strategy not in CHUNKERS:
+        raise ValueError(f"Unknown RAG chunker '{strategy}', expected one of {', '.join(CHUNKERS)}")
+    if strategy == "row":
+        return RowChunker(doc_type)
+    column = (group_by if group_by is not None else parse_group_by()).get(doc_type)
+    if strategy == "window" or column not in set(columns):
+        return WindowChunker(doc_type, rows)
+    if strategy == "group":
+        return GroupChunker(doc_type, column, rows)
+    return SummaryChunker(doc_type, column)
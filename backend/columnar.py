@@ -0,0 +1,109 @@
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+from backend.parsers import extract_string_list
+
+# Column-wise conversion of uploaded CSV frames into rows for Supabase tables.
+# Types are coerced once per column instead of once per row, and records are
+# emitted in batches so callers can stream them to the database.
+
+FINANCIAL_DEFAULTS = {
+    "category": "Uncategorized",
+    "description": "",
+    "approved_by": "",
+    "budget_category": "",
+}
+# Upload columns each table's rows are built from; their raw text is what row ids are hashed from
+FINANCIAL_SOURCE_COLUMNS = ("date", "category", "amount", "description", "approved_by", "budget_category")
+SCHEDULE_SOURCE_COLUMNS = ("name", "start_date", "deadline", "milestones", "current_progress", "progress")
+EMPLOYEE_DEFAULTS = {
+    "name": "Unknown",
+    "role": "Unknown",
+    "department": "Unknown",
+    "join_date": None,
+}
+
+
+# read_csv's default missing-value markers, for chunks read as raw text
+NA_STRINGS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+              "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+
+def typed_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    The frame read_csv would have parsed from a chunk read with dtype=str: missing markers
+    become NaN and columns whose every present value is a number become numeric.
+    """
+    typed = raw.mask(raw.isin(NA_STRINGS))
+    for col in typed.columns:
+        values = typed[col]
+        present = values.notna()
+        if not present.any():
+            typed[col] = np.nan
+            continue
+        # Cheap rejection of text columns before coercing the whole column
+        if pd.isna(pd.to_numeric(values[present].iloc[:1], errors="coerce")).any():
+            continue
+        numbers = pd.to_numeric(values, errors="coerce")
+        if numbers[present].notna().all():
+            typed[col] = numbers
+    return typed
+
+
+def financial_frame(df: pd.DataFrame, project_id: str) -> Tuple[pd.DataFrame, float]:
+    """financial_records columns for every row plus the total spend; unparsable amounts count as 0."""
+    amount = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0).astype(float)
+    out = pd.DataFrame({"project_id": str(project_id)}, index=df.index)
+    out["date"] = df["date"] if "date" in df.columns else datetime.now().date().isoformat()
+    for col in FINANCIAL_SOURCE_COLUMNS[1:]:
+        if col == "amount":
+            out[col] = amount
+        else:
+            out[col] = df[col] if col in df.columns else FINANCIAL_DEFAULTS[col]
+    return out, float(amount.sum())
+
+
+def employee_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """employees columns for every row, with the skills list-literal parsed column-wise."""
+    out = pd.DataFrame(index=df.index)
+    if "id" in df.columns:
+        out["id"] = df["id"].astype(str)
+    else:
+        # Fallback if no ID
+        out["id"] = [str(uuid.uuid4()) for _ in range(len(df))]
+    for col, default in EMPLOYEE_DEFAULTS.items():
+        out[col] = df[col] if col in df.columns else default
+    out["skills"] = extract_string_list(df["skills"]) if "skills" in df.columns else [[] for _ in range(len(df))]
+    return out
+
+
+def schedule_frame(df: pd.DataFrame, project_id: str) -> pd.DataFrame:
+    """project_schedule_rows columns: the compute_schedule inputs, with milestones kept as their literal text."""
+    out = pd.DataFrame({"project_id": str(project_id)}, index=df.index)
+    for col in ("name", "start_date", "deadline", "milestones"):
+        out[col] = df[col].astype("string") if col in df.columns else None
+    progress_col = next((c for c in ("current_progress", "progress") if c in df.columns), None)
+    out["progress"] = pd.to_numeric(df[progress_col], errors="coerce") if progress_col else None
+    return out
+
+
+def _column_values(series: pd.Series) -> list:
+    """Plain Python values for JSON encoding, with missing values as None."""
+    if not series.hasnans:
+        return series.tolist()
+    missing = series.isna().tolist()
+    return [None if m else v for v, m in zip(series.tolist(), missing)]
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict]:
+    columns = list(frame.columns)
+    values = [_column_values(frame[c]) for c in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def iter_record_batches(frame: pd.DataFrame, batch_size: int = 1000) -> Iterator[List[Dict]]:
+    """Yield lists of row dicts of at most `batch_size` rows."""
+    for start in range(0, len(frame), batch_size):
+        yield frame_to_records(frame.iloc[start:start + batch_size])
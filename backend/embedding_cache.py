@@ -0,0 +1,122 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store on local disk.
+    Keys are sha256(model name + exact text), values are raw float32 bytes.
+    When the entry count passes max_entries the least recently used tenth is evicted.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "create table if not exists embeddings ("
+            " key text primary key,"
+            " vector blob not null,"
+            " last_used real not null)"
+        )
+        self._conn.execute("create index if not exists embeddings_last_used_idx on embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("select count(*) from embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return a vector per text, or None where the text has not been embedded before."""
+        keys = [self.make_key(model_name, t) for t in texts]
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), _LOOKUP_CHUNK):
+                chunk = unique[i:i + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"select key, vector from embeddings where key in ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany("update embeddings set last_used = ? where key = ?",
+                                       [(now, k) for k in found])
+                self._conn.commit()
+
+            results = []
+            for key in keys:
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(np.frombuffer(blob, dtype=np.float32).tolist())
+        return results
+
+    def put_many(self, model_name: str, texts: List[str], vectors: List[List[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (self.make_key(model_name, t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "insert or ignore into embeddings (key, vector, last_used) values (?, ?, ?)", rows
+            )
+            self._count += self._conn.total_changes - before
+            self._conn.commit()
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        target = int(self.max_entries * 0.9)
+        excess = self._count - target
+        self._conn.execute(
+            "delete from embeddings where key in"
+            " (select key from embeddings order by last_used asc limit ?)", (excess,)
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("select count(*) from embeddings").fetchone()[0]
+        print(f"Embedding cache evicted {excess} entries")
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+        }
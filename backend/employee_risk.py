@@ -0,0 +1,112 @@
+import os
+from datetime import datetime
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from backend.parsers import extract_dict_number, extract_year_ratings, last_valid
+
+load_dotenv()
+
+# --- Configuration ---
+# attendance_record counts are treated as per-year totals
+WORKING_DAYS_PER_YEAR = float(os.getenv("WORKING_DAYS_PER_YEAR", "220"))
+
+# Composite attrition score weights (sum to 1.0). Each component is scaled to 0..1 first.
+SCORE_WEIGHTS = {
+    "low_rating": 0.30,
+    "declining_rating": 0.25,
+    "absence": 0.25,
+    "lateness": 0.10,
+    "short_tenure": 0.10,
+}
+# Rates at which the absence / lateness components saturate at 1.0
+ABSENCE_RATE_CAP = 0.05
+LATENESS_RATE_CAP = 0.05
+RATING_SCALE_MAX = 5.0
+
+SCORE_COLUMNS = ["rating_latest", "rating_trend", "absence_rate", "lateness_rate", "tenure_years",
+                 "attrition_score", "risk_level"]
+
+
+def _rating_slopes(ratings: pd.DataFrame) -> np.ndarray:
+    """Least-squares rating change per year for every row at once, ignoring missing years."""
+    if ratings.shape[1] < 2:
+        return np.zeros(len(ratings))
+    x = ratings.columns.astype(float).to_numpy()
+    y = ratings.to_numpy(dtype=float)
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=1)
+    xs = np.where(mask, x, 0.0)
+    ys = np.where(mask, y, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = xs.sum(axis=1) / n
+        y_mean = ys.sum(axis=1) / n
+        dx = np.where(mask, x - x_mean[:, None], 0.0)
+        dy = np.where(mask, y - y_mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx ** 2).sum(axis=1)
+    return np.where(n >= 2, np.nan_to_num(slope), 0.0)
+
+
+def score_employees(df: pd.DataFrame, as_of: datetime = None) -> pd.DataFrame:
+    """
+    Deterministic attrition-risk scores for every employee in one vectorized pass.
+    Returns the identifying columns plus SCORE_COLUMNS, sorted by attrition_score descending.
+    """
+    as_of = pd.Timestamp(as_of or datetime.now().date())
+    out = df[[c for c in ("id", "name", "role", "department") if c in df.columns]].copy()
+
+    if "performance_ratings" in df.columns:
+        ratings = extract_year_ratings(df["performance_ratings"])
+    else:
+        ratings = pd.DataFrame(index=df.index)
+    out["rating_latest"] = last_valid(ratings)
+    out["rating_trend"] = _rating_slopes(ratings)
+
+    if "attendance_record" in df.columns:
+        absent = extract_dict_number(df["attendance_record"], "absent").fillna(0)
+        late = extract_dict_number(df["attendance_record"], "late").fillna(0)
+    else:
+        absent = late = pd.Series(0.0, index=df.index)
+    out["absence_rate"] = absent / WORKING_DAYS_PER_YEAR
+    out["lateness_rate"] = late / WORKING_DAYS_PER_YEAR
+
+    if "join_date" in df.columns:
+        joined = pd.to_datetime(df["join_date"], errors="coerce")
+        out["tenure_years"] = ((as_of - joined).dt.days / 365.25).clip(lower=0)
+    else:
+        out["tenure_years"] = np.nan
+
+    components = pd.DataFrame({
+        # Missing ratings count as neutral rather than as risky
+        "low_rating": ((RATING_SCALE_MAX - out["rating_latest"]) / (RATING_SCALE_MAX - 1)).clip(0, 1).fillna(0.5),
+        "declining_rating": (-out["rating_trend"] / 0.5).clip(0, 1),
+        "absence": (out["absence_rate"] / ABSENCE_RATE_CAP).clip(0, 1),
+        "lateness": (out["lateness_rate"] / LATENESS_RATE_CAP).clip(0, 1),
+        "short_tenure": (1 - out["tenure_years"]).clip(0, 1).fillna(0),
+    })
+    weights = pd.Series(SCORE_WEIGHTS)
+    out["attrition_score"] = (components[weights.index] @ weights * 100).round(1)
+    out["risk_level"] = pd.cut(out["attrition_score"], bins=[-np.inf, 35, 60, np.inf],
+                               labels=["low", "medium", "high"]).astype(str)
+
+    for col in ("rating_latest", "rating_trend", "absence_rate", "lateness_rate", "tenure_years"):
+        out[col] = out[col].astype(float).round(4)
+    return out.sort_values("attrition_score", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def scores_to_records(scores: pd.DataFrame, project_id: str, computed_at: str = None) -> List[Dict]:
+    """Rows for the employee_risk_scores table (NaN becomes null), stamped with `computed_at` (default: now)."""
+    records = scores.rename(columns={"id": "employee_id"}).astype(object)
+    records = records.where(pd.notna(records), None)
+    records["project_id"] = str(project_id)
+    records["computed_at"] = computed_at or datetime.now().isoformat()
+    keep = ["project_id", "employee_id", "name", "department"] + SCORE_COLUMNS + ["computed_at"]
+    return records[[c for c in keep if c in records.columns]].to_dict("records")
+
+
+def format_top_risks(scores: pd.DataFrame, top_n: int = 10) -> str:
+    """Ranked table of the highest-risk employees for the EmployeeRiskAgent prompt."""
+    cols = [c for c in ("id", "name", "role", "department", "attrition_score", "risk_level",
+                        "rating_latest", "rating_trend", "absence_rate", "lateness_rate") if c in scores.columns]
+    return scores.head(top_n)[cols].to_string(index=False)
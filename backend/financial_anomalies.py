@@ -0,0 +1,253 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+ZSCORE_THRESHOLD = float(os.getenv("ANOMALY_ZSCORE_THRESHOLD", "3.5"))
+ZSCORE_MIN_GROUP = int(os.getenv("ANOMALY_ZSCORE_MIN_GROUP", "5"))
+DUPLICATE_WINDOW_DAYS = int(os.getenv("ANOMALY_DUPLICATE_WINDOW_DAYS", "7"))
+SPIKE_WINDOW = int(os.getenv("ANOMALY_SPIKE_WINDOW", "6"))
+SPIKE_FACTOR = float(os.getenv("ANOMALY_SPIKE_FACTOR", "3.0"))
+# Projects whose history is kept in memory; the least recently used one is dropped and reloaded on demand
+ANOMALY_HISTORY_MAX_PROJECTS = int(os.getenv("ANOMALY_HISTORY_MAX_PROJECTS", "32"))
+
+GROUP_COLUMNS = ["category", "budget_category"]
+# Fields that identify "the same payment" when they repeat within the duplicate window
+DUPLICATE_KEYS = ["amount", "category", "description", "approved_by"]
+DETAIL_COLUMNS = ["date", "category", "amount", "description"]
+# Every input column detect_anomalies reads, the only ones kept in a project's history
+SOURCE_COLUMNS = ["date"] + list(dict.fromkeys(DUPLICATE_KEYS + GROUP_COLUMNS))
+
+
+def _text(df: pd.DataFrame, col: str) -> pd.Series:
+    return df[col].astype("string").fillna("") if col in df.columns else pd.Series("", index=df.index, dtype="string")
+
+
+def _prepare(df: pd.DataFrame, description: bool = True) -> pd.DataFrame:
+    """
+    The columns the detectors work on: date, amount, the group columns, and `payment`, a 64-bit
+    hash of the DUPLICATE_KEYS. Without `description` every column is fixed-width apart from
+    the (few) distinct group labels, so a project's whole history stays small.
+    """
+    frame = pd.DataFrame(index=df.index)
+    frame["date"] = pd.to_datetime(df["date"], errors="coerce") if "date" in df.columns else pd.NaT
+    frame["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+    for col in GROUP_COLUMNS:
+        frame[col] = _text(df, col)
+    keys = pd.DataFrame({col: frame["amount"] if col == "amount" else _text(df, col) for col in DUPLICATE_KEYS})
+    frame["payment"] = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    if description:
+        frame["description"] = _text(df, "description")
+    return frame
+
+
+def _robust_zscores(frame: pd.DataFrame) -> pd.DataFrame:
+    """Modified z-score (0.6745 * (x - median) / MAD) within each category / budget_category group."""
+    flags = []
+    for col in GROUP_COLUMNS:
+        grouped = frame.groupby(col)["amount"]
+        median = grouped.transform("median")
+        mad = (frame["amount"] - median).abs().groupby(frame[col]).transform("median")
+        size = grouped.transform("size")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = 0.6745 * (frame["amount"] - median) / mad
+        hit = (size >= ZSCORE_MIN_GROUP) & (mad > 0) & (z.abs() > ZSCORE_THRESHOLD)
+        if hit.any():
+            flags.append(pd.DataFrame({
+                "type": "robust_zscore",
+                "score": z[hit].round(2),
+                "reason": (f"amount is far from the {col} median ("
+                           + median[hit].round(2).astype(str) + ") for " + frame.loc[hit, col].astype("string")),
+            }, index=frame.index[hit]))
+    return pd.concat(flags) if flags else pd.DataFrame(columns=["type", "score", "reason"])
+
+
+def _duplicates(frame: pd.DataFrame) -> pd.DataFrame:
+    """Same amount, category, description and approver within DUPLICATE_WINDOW_DAYS of an earlier record."""
+    ordered = frame.sort_values(["payment", "date"], kind="stable")
+    same = (ordered["payment"] == ordered["payment"].shift()) & ordered["amount"].notna()
+    gap = ordered["date"].diff().dt.days
+    hit = same & (gap.isna() | (gap <= DUPLICATE_WINDOW_DAYS))
+    hit = hit.reindex(frame.index)
+    return pd.DataFrame({
+        "type": "duplicate_payment",
+        "score": 1.0,
+        "reason": "repeats an earlier payment with the same amount, category, description and approver",
+    }, index=frame.index[hit.to_numpy()])
+
+
+def _spikes(frame: pd.DataFrame) -> pd.DataFrame:
+    """Amount above SPIKE_FACTOR x the rolling median of the previous SPIKE_WINDOW records in its category."""
+    ordered = frame.sort_values(["category", "date"], kind="stable")
+    baseline = (ordered.groupby("category")["amount"]
+                .transform(lambda s: s.shift().rolling(SPIKE_WINDOW, min_periods=3).median()))
+    ratio = ordered["amount"] / baseline
+    hit = (baseline > 0) & (ratio > SPIKE_FACTOR)
+    return pd.DataFrame({
+        "type": "rolling_spike",
+        "score": ratio[hit].round(2),
+        "reason": "amount is " + ratio[hit].round(1).astype(str) + "x the recent median for " + ordered.loc[hit, "category"].astype("string"),
+    }, index=ordered.index[hit.to_numpy()])
+
+
+def detect_anomalies(df: pd.DataFrame, new_rows: pd.Index = None) -> pd.DataFrame:
+    """
+    Flag anomalous financial records.
+    When `new_rows` is given, statistics use every row of `df` (the history plus the new
+    batch) but only flags for the new rows are returned.
+    Returns one row per flag: the source index plus date, category, amount, description, type, score, reason.
+    """
+    if df.empty or "amount" not in df.columns:
+        return pd.DataFrame(columns=["row"] + DETAIL_COLUMNS + ["type", "score", "reason"])
+    return _detect(_prepare(df), new_rows)
+
+
+def _detect(frame: pd.DataFrame, new_rows: pd.Index = None) -> pd.DataFrame:
+    columns = ["row"] + DETAIL_COLUMNS + ["type", "score", "reason"]
+    if frame.empty:
+        return pd.DataFrame(columns=columns)
+    flags = pd.concat([_robust_zscores(frame), _duplicates(frame), _spikes(frame)])
+    if new_rows is not None:
+        flags = flags[flags.index.isin(new_rows)]
+    if flags.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Frames prepared without descriptions (see AnomalyInputs) report them as null
+    details = frame.loc[flags.index].reindex(columns=DETAIL_COLUMNS)
+    details["category"] = details["category"].astype("string")
+    out = pd.concat([details, flags], axis=1)
+    out.insert(0, "row", out.index)
+    out["date"] = out["date"].dt.date.astype(str)
+    return out.sort_values(["row", "type"]).reset_index(drop=True)[columns]
+
+
+def flags_to_records(flags: pd.DataFrame) -> List[Dict]:
+    records = flags.astype(object)
+    return records.where(pd.notna(records), None).to_dict("records")
+
+
+def summarize_flags(flags: pd.DataFrame, top_n: int = 10) -> str:
+    """Short text block of the strongest flags for the FinancialAgent prompt."""
+    if flags.empty:
+        return "No statistical anomalies detected."
+    counts = flags["type"].value_counts().to_dict()
+    ranked = flags.assign(strength=flags["score"].astype(float).abs()).sort_values("strength", ascending=False)
+    lines = [f"Detected anomalies: {counts}",
+             ranked.head(top_n)[["date", "category", "amount", "type", "reason"]].to_string(index=False)]
+    return "\n".join(lines)
+
+
+class AnomalyInputs:
+    """
+    Collects what detect_anomalies needs from a financial upload streamed chunk by chunk:
+    about 30 bytes per row in fixed-width arrays (group labels are kept once each, as
+    category codes), instead of the text of every record. Flags it returns have no description.
+    """
+
+    def __init__(self):
+        self._parts: List[pd.DataFrame] = []
+        self._labels: Dict[str, Dict[str, int]] = {col: {} for col in GROUP_COLUMNS}
+        self.rows = 0
+
+    def add(self, chunk: pd.DataFrame):
+        if "amount" not in chunk.columns or chunk.empty:
+            return
+        part = _prepare(chunk.reset_index(drop=True), description=False)
+        for col in GROUP_COLUMNS:
+            labels = self._labels[col]
+            for value in part[col].unique().tolist():
+                labels.setdefault(value, len(labels))
+            part[col] = part[col].map(labels).astype(np.int32)
+        self._parts.append(part)
+        self.rows += len(part)
+
+    def frame(self) -> pd.DataFrame:
+        if not self._parts:
+            return pd.DataFrame(columns=["date", "amount"] + GROUP_COLUMNS + ["payment"])
+        frame = pd.concat(self._parts, ignore_index=True)
+        for col in GROUP_COLUMNS:
+            frame[col] = pd.Categorical.from_codes(frame[col].to_numpy(), categories=list(self._labels[col]))
+        return frame
+
+    def detect(self) -> pd.DataFrame:
+        """Flags over every row added so far; `row` is the row's position in the upload."""
+        return _detect(self.frame())
+
+
+class FinancialAnomalyDetector:
+    """
+    Keeps the financial history of the most recently used projects in memory so new records
+    can be scored incrementally against it. Only the categories touched by a new batch are
+    re-examined. A project dropped from memory has flags() None and is reloaded with reset().
+    """
+
+    def __init__(self, max_projects: int = ANOMALY_HISTORY_MAX_PROJECTS):
+        self.max_projects = max_projects
+        self._history: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._flags: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, project_id: str, history: pd.DataFrame, flags: pd.DataFrame):
+        # Caller holds the lock
+        self._history[project_id] = history
+        self._history.move_to_end(project_id)
+        self._flags[project_id] = flags
+        while len(self._history) > self.max_projects:
+            evicted, _ = self._history.popitem(last=False)
+            self._flags.pop(evicted, None)
+
+    def reset(self, project_id: str, records: pd.DataFrame = None) -> pd.DataFrame:
+        """Replace a project's history and return flags over all of it."""
+        frame = records.reset_index(drop=True) if records is not None else pd.DataFrame()
+        frame = frame[[c for c in SOURCE_COLUMNS if c in frame.columns]]
+        flags = detect_anomalies(frame)
+        with self._lock:
+            self._remember(str(project_id), frame, flags)
+        return flags
+
+    def update(self, project_id: str, new_records: pd.DataFrame) -> pd.DataFrame:
+        """Append new records and return flags for just those records."""
+        new_records = new_records[[c for c in SOURCE_COLUMNS if c in new_records.columns]]
+        with self._lock:
+            history = self._history.get(str(project_id), pd.DataFrame())
+            combined = pd.concat([history, new_records], ignore_index=True)
+            self._remember(str(project_id), combined, self._flags.get(str(project_id)))
+        new_index = combined.index[len(history):]
+        group_cols = [c for c in GROUP_COLUMNS if c in combined.columns]
+        if group_cols and not history.empty:
+            touched = np.zeros(len(combined), dtype=bool)
+            for col in group_cols:
+                touched |= combined[col].isin(combined.loc[new_index, col].unique()).to_numpy()
+            scope = combined[touched]
+        else:
+            scope = combined
+        flags = detect_anomalies(scope, new_rows=new_index)
+        with self._lock:
+            if str(project_id) in self._history:
+                previous = self._flags.get(str(project_id))
+                parts = [f for f in (previous, flags) if f is not None and not f.empty]
+                self._flags[str(project_id)] = pd.concat(parts, ignore_index=True) if parts else flags
+        return flags
+
+    def forget(self, project_id: str):
+        """Drop a project's history, e.g. after a re-upload; the next caller reloads it with reset()."""
+        with self._lock:
+            self._history.pop(str(project_id), None)
+            self._flags.pop(str(project_id), None)
+
+    def flags(self, project_id: str) -> pd.DataFrame:
+        """All flags raised so far for a project (None if its history is not loaded)."""
+        with self._lock:
+            if str(project_id) not in self._history:
+                return None
+            self._history.move_to_end(str(project_id))
+            return self._flags.get(str(project_id))
+
+
+anomaly_detector = FinancialAnomalyDetector()
@@ -0,0 +1,308 @@
+import os
+import json
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Callable, Dict, Iterator, List, Tuple
+import pandas as pd
+from dotenv import load_dotenv
+from backend.profiling import ProfileBuilder
+from backend.columnar import (financial_frame, employee_frame, schedule_frame, typed_frame, iter_record_batches,
+                              FINANCIAL_SOURCE_COLUMNS, SCHEDULE_SOURCE_COLUMNS)
+from backend.bulk_writer import BulkWriter
+from backend.row_diff import RowDiff, fetch_ids, delete_ids
+from backend.chunking import RAG_CHUNKER, create_chunker
+from backend.metrics import span, ROWS_INGESTED
+from backend.employee_risk import score_employees, scores_to_records, format_top_risks
+from backend.financial_anomalies import AnomalyInputs, anomaly_detector, summarize_flags
+from backend.schedule import compute_schedule, summarize_schedule
+
+load_dotenv()
+
+# --- Configuration ---
+# Rows parsed from an uploaded CSV at a time; every stage works on one chunk, so peak memory
+# follows this setting rather than the size of the file
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "20000"))
+# Rows converted to records at a time when persisting uploaded CSVs (BulkWriter sets the request size)
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "1000"))
+TOP_RISKS_IN_PROMPT = 10
+
+
+def iter_csv_chunks(source, chunk_rows: int = UPLOAD_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Read a CSV file object (bytes or text) `chunk_rows` rows at a time, every cell as its text.
+    The row index keeps counting across chunks, as if the whole file had been read.
+    Unlike dtype inference, the text of a row does not depend on the other rows in its chunk,
+    so row ids and document texts stay the same when rows are added to an export.
+    """
+    try:
+        reader = pd.read_csv(source, chunksize=chunk_rows, encoding="utf-8", dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return
+    with reader:
+        yield from reader
+
+
+class UploadIngestion:
+    """
+    Streams the init uploads for one project through every stage in a single pass per file.
+    Each parsed chunk is profiled, persisted, embedded for RAG and scored before the next one
+    is read; only aggregates, top-N rows and the per-project outputs (schedule, anomaly inputs,
+    team member ids) are kept across chunks.
+
+    financial_records and documents are synced rather than reloaded: rows get content-derived
+    ids (backend/row_diff.py), only rows missing from the table are written (and embedded),
+    and stored rows absent from the upload are deleted. stats["changes"] has the counts.
+    With a multi-row `chunker` (backend/chunking.py) documents are diffed the same way, by
+    their text and source rows.
+
+    A stage that fails (a bulk write included, once rows fail every retry) is reported once,
+    recorded in stats["failed"] and skipped for the rest of the upload, so a database or
+    embedding outage still leaves the agents with their prompt profiles. Nothing is deleted
+    and no totals are saved for a stage that failed.
+    """
+
+    def __init__(self, project_id: str, get_db: Callable, writer: BulkWriter, rag=None,
+                 chunk_rows: int = UPLOAD_CHUNK_ROWS, on_chunk: Callable = None, chunker: str = RAG_CHUNKER):
+        self.project_id = str(project_id)
+        # Called with (kind, rows streamed so far) after every chunk, e.g. to report job progress
+        self.on_chunk = on_chunk
+        self.get_db = get_db
+        self.writer = writer
+        self.rag = rag
+        self.chunk_rows = chunk_rows
+        self.chunker = chunker
+        self._chunkers = {}
+        self.schedule = pd.DataFrame()
+        self.stats = {"documents": 0, "changes": {}, "failed": {}}
+        self._diffs = {}
+        self._failed = set()
+
+    def _run(self, stage: str, fn, *args):
+        if stage in self._failed:
+            return None
+        try:
+            with span(f"upload.{stage.replace(' ', '.')}"):
+                return fn(*args)
+        except Exception as e:
+            self._failed.add(stage)
+            self.stats["failed"][stage] = str(e)
+            print(f"Upload stage '{stage}' failed for project {self.project_id}, skipping it: {e}")
+            return None
+
+    def _chunks(self, kind: str, source) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """(raw, typed) per chunk: the cell texts for row ids and documents, and the parsed values for everything else."""
+        start = time.perf_counter()
+        rows = 0
+        chunks = iter_csv_chunks(source, self.chunk_rows)
+        while True:
+            with span(f"upload.parse.{kind}"):
+                raw = next(chunks, None)
+                if raw is None:
+                    break
+                chunk = typed_frame(raw)
+            ROWS_INGESTED.inc(len(chunk), kind=kind)
+            yield raw, chunk
+            rows += len(chunk)
+            if self.on_chunk:
+                self.on_chunk(kind, rows)
+        self.stats[kind] = {"rows": rows, "seconds": round(time.perf_counter() - start, 3)}
+        print(f"Streamed {rows} {kind} rows in {self.stats[kind]['seconds']}s")
+
+    def _diff(self, name: str, load_existing: Callable) -> RowDiff:
+        if name not in self._diffs:
+            self._diffs[name] = RowDiff(f"{name}:{self.project_id}", load_existing())
+        return self._diffs[name]
+
+    def _sync_removed(self, name: str, stage: str, remove: Callable):
+        """Delete stored rows the upload no longer has, unless the stage failed part-way (rows after that were never compared)."""
+        diff = self._diffs.get(name)
+        if diff is None or stage in self._failed:
+            return
+        self._run(f"remove stale {name}", remove, diff.removed())
+        self.stats["changes"][name] = diff.summary()
+        print(f"Synced {name}: {diff.summary()}")
+
+    def _index(self, chunk: pd.DataFrame, doc_type: str):
+        if self.rag is None:
+            return
+        if self.chunker != "row":
+            if doc_type not in self._chunkers:
+                self._chunkers[doc_type] = create_chunker(self.chunker, doc_type, chunk.columns)
+            self._index_documents(self._chunkers[doc_type].add(chunk), doc_type)
+            return
+        diff = self._diff(f"documents:{doc_type}", lambda: self.rag.document_ids(self.project_id, doc_type))
+        ids = diff.ids(chunk)
+        new = diff.new_mask(ids)
+        if new.any():
+            new_ids = [i for i, keep in zip(ids, new) if keep]
+            count = self.rag.ingest_frame(chunk[new], {"project_id": self.project_id, "type": doc_type}, ids=new_ids)
+            self.stats["documents"] += count
+
+    def _index_documents(self, documents: List[Dict], doc_type: str):
+        diff = self._diff(f"documents:{doc_type}", lambda: self.rag.document_ids(self.project_id, doc_type))
+        if not documents:
+            return
+        # The source rows are part of the id, so a stored document's metadata is never stale
+        ids = diff.ids(pd.DataFrame({"text": [d["text"] for d in documents],
+                                     "source": [json.dumps(d["metadata"], sort_keys=True) for d in documents]}))
+        new = diff.new_mask(ids)
+        if new.any():
+            new_ids = [i for i, keep in zip(ids, new) if keep]
+            count = self.rag.ingest_chunks([d for d, keep in zip(documents, new) if keep],
+                                           {"project_id": self.project_id, "type": doc_type}, ids=new_ids)
+            self.stats["documents"] += count
+
+    def _finish_index(self, doc_type: str):
+        if self.rag is None:
+            return
+        chunker = self._chunkers.pop(doc_type, None)
+        if chunker is not None:
+            self._run(f"index {doc_type}", self._index_documents, chunker.finish(), doc_type)
+        self._sync_removed(f"documents:{doc_type}", f"index {doc_type}",
+                           lambda ids: self.rag.remove_documents(self.project_id, ids))
+
+    # --- Financials ---
+
+    @staticmethod
+    def _source(raw: pd.DataFrame, columns) -> pd.DataFrame:
+        # Ids come from the cell text: dtypes are inferred per chunk, so 101 may parse as 101.0 in one of them
+        present = [c for c in columns if c in raw.columns]
+        return raw[present] if present else pd.DataFrame({"row": ""}, index=raw.index)
+
+    def _persist_financials(self, raw: pd.DataFrame, frame: pd.DataFrame):
+        diff = self._diff("financial_records", lambda: fetch_ids(
+            lambda: self.get_db().table("financial_records").select("id").eq("project_id", self.project_id)))
+        ids = diff.ids(self._source(raw, FINANCIAL_SOURCE_COLUMNS))
+        new = diff.new_mask(ids)
+        if new.any():
+            frame = frame[new].assign(id=[i for i, keep in zip(ids, new) if keep])
+            rows = chain.from_iterable(iter_record_batches(frame, PERSIST_BATCH_SIZE))
+            # Content-derived ids also make retried batches idempotent
+            self.writer.write("financial_records", rows, method="upsert", on_conflict="id")
+
+    def financials(self, source) -> str:
+        """Stream the financials CSV and return the FinancialAgent prompt text."""
+        profile = ProfileBuilder("financials")
+        anomaly_inputs = AnomalyInputs()
+        total_spend, has_amount, offset = 0.0, False, 0
+        for raw, chunk in self._chunks("financials", source):
+            with span("upload.profile"):
+                profile.add(chunk)
+            if "amount" in chunk.columns:
+                has_amount = True
+                anomaly_inputs.add(chunk)
+                frame, spend = financial_frame(chunk, self.project_id)
+                total_spend += spend
+                self._run("persist financial_records", self._persist_financials, raw, frame)
+            self._run("index Financials", self._index, raw, "Financials")
+            offset += len(chunk)
+        self._sync_removed("financial_records", "persist financial_records",
+                           lambda ids: delete_ids(self.get_db, "financial_records", ids))
+        self._finish_index("Financials")
+
+        text = profile.build()["text"]
+        if has_amount and "persist financial_records" not in self._failed:
+            self._run("update actual_spend", lambda: self.get_db().table("projects")
+                      .update({"actual_spend": total_spend}).eq("id", self.project_id).execute())
+            print(f"Calculated Total Spend: {total_spend}")
+        if has_amount:
+            # Statistical spending anomalies, computed locally and handed to the FinancialAgent.
+            # The detector's copy of the old upload is dropped; /anomalies reloads the stored records
+            flags = anomaly_inputs.detect()
+            anomaly_detector.forget(self.project_id)
+            text += f"\n\n{summarize_flags(flags)}"
+        elif offset:
+            print("Warning: 'amount' column not found in financials CSV")
+        return text
+
+    # --- Employees ---
+
+    def _persist_employees(self, chunk: pd.DataFrame, member_ids: List[str]):
+        frame = employee_frame(chunk)
+        member_ids.extend(frame["id"].tolist())
+        # Upsert Employees (Global Table)
+        rows = chain.from_iterable(iter_record_batches(frame, PERSIST_BATCH_SIZE))
+        self.writer.write("employees", rows, method="upsert")
+
+    def _persist_scores(self, scores: pd.DataFrame, computed_at: str):
+        self.writer.write("employee_risk_scores", scores_to_records(scores, self.project_id, computed_at),
+                          method="upsert", on_conflict="project_id,employee_id")
+
+    def _remove_old_scores(self, computed_at: str):
+        # Only once every score of this upload is stored: scores of employees no longer in it
+        self.get_db().table("employee_risk_scores").delete().eq("project_id", self.project_id) \
+            .lt("computed_at", computed_at).execute()
+
+    def employees(self, source) -> str:
+        """Stream the employees CSV and return the EmployeeRiskAgent prompt text."""
+        profile = ProfileBuilder("employees")
+        member_ids = []
+        top_scores = None
+        computed_at = datetime.now().isoformat()
+        scores_written = False
+        for raw, chunk in self._chunks("employees", source):
+            with span("upload.profile"):
+                profile.add(chunk)
+            self._run("persist employees", self._persist_employees, chunk, member_ids)
+            # Deterministic attrition scores; the agent only has to explain the top-ranked cases
+            scores = self._run("score employees", score_employees, chunk)
+            if scores is not None and not scores.empty:
+                if "id" in scores.columns:
+                    self._run("persist employee_risk_scores", self._persist_scores, scores, computed_at)
+                    scores_written = True
+                head = scores.head(TOP_RISKS_IN_PROMPT)
+                top_scores = head if top_scores is None else (
+                    pd.concat([top_scores, head]).sort_values("attrition_score", ascending=False, kind="stable")
+                    .head(TOP_RISKS_IN_PROMPT))
+            self._run("index Employees", self._index, raw, "Employees")
+        self._finish_index("Employees")
+        if scores_written and "persist employee_risk_scores" not in self._failed:
+            self._run("remove stale employee_risk_scores", self._remove_old_scores, computed_at)
+
+        if member_ids:
+            # Link to Project
+            self._run("link team_members", lambda: self.get_db().table("projects")
+                      .update({"team_members": member_ids}).eq("id", self.project_id).execute())
+
+        text = profile.build()["text"]
+        if top_scores is not None:
+            text += f"\n\nComputed attrition risk ranking (highest first):\n{format_top_risks(top_scores, TOP_RISKS_IN_PROMPT)}"
+        return text
+
+    # --- Projects ---
+
+    def _persist_schedule_rows(self, raw: pd.DataFrame, chunk: pd.DataFrame):
+        frame = schedule_frame(chunk, self.project_id)
+        diff = self._diff("project_schedule_rows", lambda: fetch_ids(
+            lambda: self.get_db().table("project_schedule_rows").select("id").eq("project_id", self.project_id)))
+        ids = diff.ids(self._source(raw, SCHEDULE_SOURCE_COLUMNS))
+        new = diff.new_mask(ids)
+        if new.any():
+            frame = frame[new].assign(id=[i for i, keep in zip(ids, new) if keep])
+            rows = chain.from_iterable(iter_record_batches(frame, PERSIST_BATCH_SIZE))
+            self.writer.write("project_schedule_rows", rows, method="upsert", on_conflict="id")
+
+    def projects(self, source) -> str:
+        """Stream the projects CSV and return the ProjectTrackingAgent prompt text (schedule is kept in .schedule)."""
+        profile = ProfileBuilder("projects")
+        schedules = []
+        for raw, chunk in self._chunks("projects", source):
+            with span("upload.profile"):
+                profile.add(chunk)
+            # Schedule variance across the uploaded projects, computed without an LLM call
+            schedule = self._run("compute schedule", compute_schedule, chunk)
+            if schedule is not None:
+                schedules.append(schedule)
+            # The schedule endpoint recomputes from these rows once the cached result has expired
+            self._run("persist project_schedule_rows", self._persist_schedule_rows, raw, chunk)
+            self._run("index Projects", self._index, raw, "Projects")
+        self._sync_removed("project_schedule_rows", "persist project_schedule_rows",
+                           lambda ids: delete_ids(self.get_db, "project_schedule_rows", ids))
+        self._finish_index("Projects")
+
+        self.schedule = pd.concat(schedules) if schedules else pd.DataFrame()
+        text = profile.build()["text"]
+        if not self.schedule.empty:
+            text += f"\n\n{summarize_schedule(self.schedule)}"
+        return text
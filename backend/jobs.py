@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+# "local" keeps the queue and job state in this process; "redis" shares them through REDIS_URL
+# so any API worker can answer a status poll (uploads are spooled to JOB_UPLOAD_DIR, which
+# must then be on storage every worker can read)
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "local").lower()
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR") or None
+JOB_LOCAL_MAX_JOBS = int(os.getenv("JOB_LOCAL_MAX_JOBS", "1000"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+def _now() -> float:
+    return round(time.time(), 3)
+
+
+class LocalJobQueue:
+    """In-process queue and job table; jobs are lost on restart and only visible to this process."""
+
+    def __init__(self, max_jobs: int = JOB_LOCAL_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue()
+        self._jobs: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, job: Dict):
+        with self._lock:
+            self._jobs[job["id"]] = json.dumps(job)
+            self._jobs.move_to_end(job["id"])
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            raw = self._jobs.get(job_id)
+        return json.loads(raw) if raw else None
+
+    def push(self, job_id: str):
+        self._queue.put(job_id)
+
+    def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class RedisJobQueue:
+    """Job state as JSON strings under job:{id} (expiring after JOB_TTL_SECONDS) and a Redis list as the queue."""
+
+    QUEUE_KEY = "jobs:queue"
+
+    def __init__(self, url: str = None, ttl_seconds: int = JOB_TTL_SECONDS):
+        import redis
+        from backend.cache import REDIS_URL
+        self.client = redis.from_url(url or REDIS_URL, decode_responses=True)
+        self.ttl = ttl_seconds
+
+    def save(self, job: Dict):
+        self.client.setex(f"job:{job['id']}", self.ttl, json.dumps(job))
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        raw = self.client.get(f"job:{job_id}")
+        return json.loads(raw) if raw else None
+
+    def push(self, job_id: str):
+        self.client.lpush(self.QUEUE_KEY, job_id)
+
+    def pop(self, timeout: float) -> Optional[str]:
+        item = self.client.brpop(self.QUEUE_KEY, timeout=max(1, int(timeout)))
+        return item[1] if item else None
+
+    def depth(self) -> int:
+        return self.client.llen(self.QUEUE_KEY)
+
+
+def create_job_queue(backend: str = JOB_QUEUE_BACKEND):
+    if backend == "redis":
+        return RedisJobQueue()
+    return LocalJobQueue()
+
+
+class JobProgress:
+    """Handed to a job handler to report which stage it is in; every update is saved for pollers."""
+
+    def __init__(self, manager: "JobManager", job: Dict):
+        self.manager = manager
+        self.job = job
+
+    def _stage(self, name: str) -> Dict:
+        for stage in self.job["stages"]:
+            if stage["name"] == name:
+                return stage
+        stage = {"name": name, "status": QUEUED, "started_at": None, "finished_at": None, "detail": None}
+        self.job["stages"].append(stage)
+        return stage
+
+    def _save(self):
+        stages = self.job["stages"]
+        done = sum(1 for s in stages if s["status"] == SUCCEEDED)
+        self.job["progress"] = round(done / len(stages), 3) if stages else 0.0
+        self.job["updated_at"] = _now()
+        self.manager.queue.save(self.job)
+
+    def start(self, name: str, detail=None):
+        stage = self._stage(name)
+        stage.update(status=RUNNING, started_at=_now(), detail=detail)
+        self.job["stage"] = name
+        self._save()
+
+    def update(self, name: str, detail):
+        self._stage(name)["detail"] = detail
+        self._save()
+
+    def finish(self, name: str, detail=None):
+        stage = self._stage(name)
+        stage.update(status=SUCCEEDED, finished_at=_now())
+        if detail is not None:
+            stage["detail"] = detail
+        self._save()
+
+    def fail(self, name: str, error: str):
+        self._stage(name).update(status=FAILED, finished_at=_now(), detail=error)
+        self._save()
+
+
+class JobManager:
+    """
+    Runs long tasks off the request path. submit() records a queued job and returns it
+    straight away; worker threads pop job ids, call the handler registered for the job's
+    kind with (payload, progress) and store its return value as the job result.
+    """
+
+    def __init__(self, job_queue=None, workers: int = JOB_WORKERS):
+        self.queue = job_queue or create_job_queue()
+        self.workers = max(1, workers)
+        self.handlers: Dict[str, Callable] = {}
+        self.stages: Dict[str, List[str]] = {}
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def register(self, kind: str, handler: Callable, stages: List[str] = None):
+        """`stages` pre-fills the stage list so pollers see the whole plan from the start."""
+        self.handlers[kind] = handler
+        self.stages[kind] = list(stages or [])
+
+    def create(self, kind: str, payload: Dict, project_id: str = None) -> Dict:
+        """Record a queued job without handing it to the workers (see submit and run)."""
+        if kind not in self.handlers:
+            raise ValueError(f"No job handler registered for '{kind}'")
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "project_id": project_id,
+            "status": QUEUED,
+            "stage": None,
+            "progress": 0.0,
+            "stages": [{"name": name, "status": QUEUED, "started_at": None, "finished_at": None, "detail": None}
+                       for name in self.stages[kind]],
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "updated_at": _now(),
+        }
+        self.queue.save(job)
+        return job
+
+    def submit(self, kind: str, payload: Dict, project_id: str = None) -> Dict:
+        job = self.create(kind, payload, project_id)
+        self.queue.push(job["id"])
+        self.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.queue.load(job_id)
+
+    def run(self, job: Dict) -> Dict:
+        """Run one job in the calling thread and return its final state."""
+        progress = JobProgress(self, job)
+        job.update(status=RUNNING, started_at=_now())
+        progress._save()
+        try:
+            job["result"] = self.handlers[job["kind"]](job["payload"], progress)
+            job["status"] = SUCCEEDED
+        except Exception as e:
+            print(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            if job.get("stage") and progress._stage(job["stage"])["status"] == RUNNING:
+                progress.fail(job["stage"], str(e))
+            job.update(status=FAILED, error=str(e))
+        job["finished_at"] = _now()
+        progress._save()
+        return job
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self.queue.pop(timeout=1.0)
+            except Exception as e:
+                print(f"Job queue unavailable: {e}")
+                time.sleep(5)
+                continue
+            if not job_id:
+                continue
+            job = self.queue.load(job_id)
+            if job is None or job["status"] != QUEUED:
+                continue
+            self.run(job)
+
+    def start(self):
+        """Start the worker threads once (safe to call repeatedly)."""
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(len(self._threads), self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+
+def spool_uploads(files: Dict, directory: str = JOB_UPLOAD_DIR) -> Dict[str, str]:
+    """Copy upload file objects to a private temp directory (in bounded blocks) and return their paths."""
+    target = tempfile.mkdtemp(prefix="riskpilot-job-", dir=directory)
+    paths = {}
+    for name, source in files.items():
+        path = os.path.join(target, f"{name}.csv")
+        with open(path, "wb") as out:
+            shutil.copyfileobj(source, out, 1024 * 1024)
+        paths[name] = path
+    return paths
+
+
+def remove_spooled(paths: Dict[str, str]):
+    directories = {os.path.dirname(p) for p in paths.values()}
+    for directory in directories:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,371 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+from backend.memory import estimate_tokens
+from backend.metrics import registry, span, LLM_REQUESTS, LLM_TOKENS
+
+load_dotenv()
+
+# --- Configuration ---
+# Limits of the Groq account/key; every agent call in this process shares them
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "12000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Completion size assumed when reserving tokens for a call that sets no max_tokens
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "800"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1.0"))
+# Longest a call may wait for a slot before giving up
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "120"))
+# Consecutive retryable failures that open the circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Lower runs first: a user waiting on a chat answer goes ahead of batch analysis
+INTERACTIVE = 0
+BATCH = 10
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_ERRORS = {"RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError"}
+
+
+class LLMUnavailableError(Exception):
+    """The LLM could not be reached: rate limited past all retries, circuit open, or no slot in time."""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def is_rate_limit(error: Exception) -> bool:
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable(error: Exception) -> bool:
+    return _status_code(error) in _RETRYABLE_STATUS or type(error).__name__ in _RETRYABLE_ERRORS
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_usage(usage):
+    """Count the tokens the API reports for a call (prompt and completion)."""
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            LLM_TOKENS.inc(tokens, type=kind)
+
+
+def _outcome(error: Optional[Exception]) -> str:
+    if error is None:
+        return "ok"
+    return "rate_limited" if is_rate_limit(error) else "error"
+
+
+def estimate_request_tokens(messages: List[Dict], max_tokens: int = None) -> int:
+    """Prompt tokens plus the expected completion, for reserving against the tokens-per-minute budget."""
+    prompt = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+    return prompt + (max_tokens or LLM_COMPLETION_TOKENS_ESTIMATE)
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than the bucket wait for a full bucket)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Correct a reservation once the real usage is known; the level may go negative (a debt)."""
+        self._refill()
+        self.level = min(self.capacity, self.level - delta)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for `reset_seconds`;
+    then lets calls through again (half-open) and closes on the first success.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if self.clock() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = "half_open"
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"LLM circuit opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = self.clock()
+
+
+class LLMScheduler:
+    """
+    Central gate for chat-completion calls. Each call waits in a priority queue until the
+    requests-per-minute and tokens-per-minute buckets and the concurrency cap allow it, is
+    retried with jittered backoff on 429s and transient errors (honouring Retry-After), and
+    is refused straight away while the circuit breaker is open.
+
+    The client is passed per call and only needs .chat.completions.create(**kwargs), so a
+    fake client can stand in for Groq.
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_seconds: float = LLM_BACKOFF_SECONDS,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS, breaker: CircuitBreaker = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.clock = clock
+        self.sleep = sleep
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._waits = {name: deque(maxlen=1000) for name in PRIORITY_NAMES.values()}
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0, "rejected": 0, "timeouts": 0}
+
+    # --- Slots ---
+
+    def _acquire(self, priority: int, tokens: int):
+        ticket = (priority, next(self._seq))
+        start = self.clock()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    delay = None
+                    if self._waiting[0] == ticket and self._active < self.max_concurrency:
+                        delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if delay <= 0:
+                            break
+                    remaining = self.queue_timeout - (self.clock() - start)
+                    if remaining <= 0:
+                        self.counters["timeouts"] += 1
+                        raise LLMUnavailableError(f"No LLM slot within {self.queue_timeout:.0f}s")
+                    self._cond.wait(min(delay, remaining) if delay is not None else remaining)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._active += 1
+            self._waits[PRIORITY_NAMES.get(priority, "batch")].append(self.clock() - start)
+            # The next ticket in line may be able to go right away
+            self._cond.notify_all()
+
+    def _release(self, reserved: int, used: Optional[int]):
+        with self._cond:
+            self._active -= 1
+            if used is not None:
+                self.tokens.adjust(used - reserved)
+            self._cond.notify_all()
+
+    def _backoff(self, error: Exception, attempt: int):
+        delay = _retry_after(error)
+        if delay is None:
+            base = self.backoff_seconds * (2 ** attempt)
+            delay = base + random.uniform(0, base)
+        with self._cond:
+            self.counters["retries"] += 1
+        self.sleep(delay)
+
+    def _failed(self, error: Exception, attempt: int) -> bool:
+        """Record a failed attempt; returns True when it should be retried."""
+        retryable = is_retryable(error)
+        with self._cond:
+            self.counters["rate_limited"] += int(is_rate_limit(error))
+        if retryable:
+            self.breaker.record_failure()
+        if retryable and attempt < self.max_retries and self.breaker.allow():
+            return True
+        with self._cond:
+            self.counters["failures"] += 1
+        return False
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            with self._cond:
+                self.counters["rejected"] += 1
+            raise LLMUnavailableError("LLM temporarily unavailable (circuit open after repeated failures)")
+
+    # --- Calls ---
+
+    def complete(self, client, messages: List[Dict], model: str, priority: int = BATCH, **kwargs):
+        """Scheduled client.chat.completions.create(messages=..., model=..., **kwargs)."""
+        self._check_breaker()
+        reserved = estimate_request_tokens(messages, kwargs.get("max_tokens"))
+        with self._cond:
+            self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            with span("llm.wait"):
+                self._acquire(priority, reserved)
+            used, error = None, None
+            try:
+                with span("llm.call"):
+                    response = client.chat.completions.create(messages=messages, model=model, **kwargs)
+                usage = getattr(response, "usage", None)
+                used = getattr(usage, "total_tokens", None)
+                _record_usage(usage)
+            except Exception as e:
+                error = e
+            finally:
+                self._release(reserved, used)
+            LLM_REQUESTS.inc(priority=PRIORITY_NAMES.get(priority, "batch"), outcome=_outcome(error))
+            if error is None:
+                self.breaker.record_success()
+                return response
+            if not self._failed(error, attempt):
+                if is_retryable(error):
+                    raise LLMUnavailableError(f"LLM request failed after {attempt + 1} attempts: {error}") from error
+                raise error
+            self._backoff(error, attempt)
+
+    def stream(self, client, messages: List[Dict], model: str, priority: int = INTERACTIVE, **kwargs) -> Iterator:
+        """
+        Scheduled streaming call yielding the raw chunks. Opening the stream is retried like
+        complete(); once chunks have been yielded an error is raised to the caller as is.
+        The slot is held until the stream is exhausted or closed.
+        """
+        self._check_breaker()
+        reserved = estimate_request_tokens(messages, kwargs.get("max_tokens"))
+        with self._cond:
+            self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            with span("llm.wait"):
+                self._acquire(priority, reserved)
+            try:
+                with span("llm.open_stream"):
+                    stream = client.chat.completions.create(messages=messages, model=model, stream=True, **kwargs)
+                LLM_REQUESTS.inc(priority=PRIORITY_NAMES.get(priority, "batch"), outcome="ok")
+                break
+            except Exception as e:
+                LLM_REQUESTS.inc(priority=PRIORITY_NAMES.get(priority, "batch"), outcome=_outcome(e))
+                self._release(reserved, None)
+                if not self._failed(e, attempt):
+                    if is_retryable(e):
+                        raise LLMUnavailableError(f"LLM request failed after {attempt + 1} attempts: {e}") from e
+                    raise
+                self._backoff(e, attempt)
+
+        try:
+            for chunk in stream:
+                # Groq reports usage on the last chunk, under x_groq
+                _record_usage(getattr(getattr(chunk, "x_groq", None), "usage", None))
+                yield chunk
+            self.breaker.record_success()
+        except Exception as e:
+            self._failed(e, self.max_retries)
+            raise
+        finally:
+            self._release(reserved, None)
+
+    # --- Metrics ---
+
+    def stats(self) -> Dict:
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                depth[PRIORITY_NAMES.get(priority, "batch")] += 1
+            waits = {}
+            for name, samples in self._waits.items():
+                ordered = sorted(samples)
+                waits[name] = {
+                    "count": len(ordered),
+                    "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+                    "p95": round(ordered[int(0.95 * (len(ordered) - 1))], 3) if ordered else 0.0,
+                    "max": round(ordered[-1], 3) if ordered else 0.0,
+                }
+            return {
+                "queue_depth": depth,
+                "active": self._active,
+                "wait_seconds": waits,
+                "breaker": self.breaker.state,
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level, 1),
+                **self.counters,
+            }
+
+
+# Shared by every agent in the process, since the rate limits belong to the API key
+llm_scheduler = LLMScheduler()
+
+_queue_depth = registry.gauge("riskpilot_llm_queue_depth", "LLM calls waiting for a slot", ["priority"])
+_active_calls = registry.gauge("riskpilot_llm_active_calls", "LLM calls in flight")
+_breaker_open = registry.gauge("riskpilot_llm_breaker_open", "1 while the LLM circuit breaker refuses calls")
+
+
+def _collect_scheduler_metrics():
+    stats = llm_scheduler.stats()
+    for name, depth in stats["queue_depth"].items():
+        _queue_depth.set(depth, priority=name)
+    _active_calls.set(stats["active"])
+    _breaker_open.set(int(stats["breaker"] == "open"))
+
+
+registry.add_collector(_collect_scheduler_metrics)
@@ -1,24 +1,41 @@
+import time
+_IMPORT_START = time.perf_counter()
+
 import os
-import io
+import threading
 import pandas as pd
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
-from supabase import create_client, Client
+import json
+import hashlib
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from typing import List, Optional
 import uuid
 import uuid
 from datetime import datetime
-import ast # For parsing list strings in CSV
 
 # Import our models and agents
-from backend.models import ProjectCreate, ProjectResponse, ChatRequest, ChatResponse, InitialAnalysisResponse
+from backend.models import ProjectCreate, ProjectResponse, ChatRequest, ChatResponse, InitialAnalysisResponse, FinancialRecordCreate
 from backend.agent import (
     EmployeeRiskAgent, 
     ProjectTrackingAgent, 
     FinancialAgent, 
     MarketAnalysisAgent, 
-    MasterAgent
+    MasterAgent,
+    SummaryAgent,
+    is_error_response
 )
+from backend.memory import ConversationMemory
+from backend.employee_risk import score_employees, scores_to_records
+from backend.financial_anomalies import anomaly_detector, flags_to_records, SOURCE_COLUMNS
+from backend.schedule import compute_schedule, schedule_to_records
+from backend.bulk_writer import BulkWriter, idempotent_ids
+from backend.ingestion import UploadIngestion, iter_csv_chunks
+from backend.columnar import typed_frame
+from backend.row_diff import fetch_rows, existing_ids
+from backend.jobs import JobManager, SUCCEEDED, spool_uploads, remove_spooled
+from backend.metrics import registry, span, METRICS_ENABLED, HTTP_REQUESTS, HTTP_SECONDS
 
 load_dotenv()
 
@@ -41,13 +58,60 @@ key: str = os.environ.get("SUPABASE_KEY")
 if not url or not key:
     print("Warning: Supabase URL or Key not found in environment variables.")
 
-supabase: Client = create_client(url, key) if url and key else None
+# Load the embedding model and clients in a background thread at startup instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
 
 # --- Helpers ---
 def get_db():
-    if not supabase:
+    if not url or not key:
         raise HTTPException(status_code=500, detail="Database not configured")
-    return supabase
+    from backend.rag import get_supabase
+    return get_supabase()
+
+# Shared batched/retrying writer for large table writes
+bulk_writer = BulkWriter(lambda: get_db())
+
+def save_employee_scores(project_id: str, scores: pd.DataFrame, computed_at: str) -> int:
+    """Upsert attrition scores for a project, stamped with `computed_at`."""
+    if scores.empty or "id" not in scores.columns:
+        return 0
+    records = scores_to_records(scores, project_id, computed_at)
+    stats = bulk_writer.write("employee_risk_scores", records, method="upsert", on_conflict="project_id,employee_id")
+    return stats["rows"]
+
+def remove_old_employee_scores(project_id: str, computed_at: str):
+    """Drop scores saved before `computed_at`; called only once every new score is stored."""
+    get_db().table("employee_risk_scores").delete().eq("project_id", str(project_id)) \
+        .lt("computed_at", computed_at).execute()
+
+# Cache scope for portfolio-wide results; bumped whenever any project changes
+PORTFOLIO_SCOPE = "portfolio"
+
+def cached_schedule(scope_id: str, load_df) -> list:
+    """Schedule records for a scope, computed once per data version."""
+    from backend.agent import cache_system
+    cached = cache_system.get_versioned(scope_id, "schedule")
+    if cached:
+        return json.loads(cached)
+    records = schedule_to_records(compute_schedule(load_df()))
+    cache_system.set_versioned(scope_id, "schedule", json.dumps(records))
+    return records
+
+# Startup timings, all in seconds
+startup_report = {
+    "import_seconds": None,
+    "startup_seconds": None,
+    "first_request_seconds": None,
+    "warmup_seconds": None,
+}
+
+def _warm_up():
+    try:
+        from backend.agent import rag_system
+        startup_report["warmup_seconds"] = round(rag_system.warm_up(), 3)
+        print(f"Warm-up finished in {startup_report['warmup_seconds']}s")
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
 
 # --- Endpoints ---
 
@@ -56,6 +120,45 @@ def startup_event():
     print("Startup: Registered Routes:")
     for route in app.routes:
         print(f" - {route.path} [{route.methods}]")
+    startup_report["startup_seconds"] = round(time.perf_counter() - _IMPORT_START, 3)
+    print(f"Startup: import {startup_report['import_seconds']}s, ready {startup_report['startup_seconds']}s")
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    job_manager.start()
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    if startup_report["first_request_seconds"] is None:
+        startup_report["first_request_seconds"] = round(time.perf_counter() - _IMPORT_START, 3)
+        print(f"First request served {startup_report['first_request_seconds']}s after import")
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    if not METRICS_ENABLED:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/jobs/{job_id}), not the raw path, to keep the series bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_REQUESTS.inc(method=request.method, route=path, status=status)
+        HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, route=path)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Span latency histograms and counters (cache lookups, LLM tokens, rows ingested) in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/startup")
+def get_startup_report():
+    """Import time, time until the first request and background warm-up duration."""
+    return startup_report
 
 @app.get("/")
 def health_check():
@@ -71,6 +174,8 @@ def create_project(project: ProjectCreate):
         response = get_db().table("projects").insert(data).execute()
         if response.data:
             print("Project created successfully.")
+            from backend.agent import cache_system
+            cache_system.bump_data_version(PORTFOLIO_SCOPE)
             return response.data[0]
         print("Supabase returned no data.")
         raise HTTPException(status_code=400, detail="Failed to create project - No data returned")
@@ -91,183 +196,175 @@ def list_projects():
         print(f"Error listing projects: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/chat/init/{project_id}")
-async def init_chat(
-    project_id: uuid.UUID,
-    employee_file: UploadFile = File(...),
-    project_file: UploadFile = File(...),
-    financial_file: UploadFile = File(...)
-):
+# Stages of the init job, in order; each CSV stage reports rows streamed so far as its detail
+INIT_STAGES = ["projects", "employees", "financials", "cache", "agents", "synthesis", "save"]
+INIT_UPLOADS = (("projects", "project_file"), ("employees", "employee_file"), ("financials", "financial_file"))
+
+def run_init_analysis(payload: dict, progress) -> dict:
     """
-    Initialize the AI analysis:
-    1. Parse CSVs
-    2. Save data to Supabase (simplified for demo)
+    Job handler behind /chat/init:
+    1. Stream-parse the spooled CSVs
+    2. Save data to Supabase and index it for RAG
     3. Run Multi-Agent Analysis
     """
+    project_id = payload["project_id"]
+    files = payload["files"]
     try:
-        # 1. Read Files
-        emp_df = pd.read_csv(io.StringIO(str(await employee_file.read(), 'utf-8')))
-        proj_df = pd.read_csv(io.StringIO(str(await project_file.read(), 'utf-8')))
-        fin_df = pd.read_csv(io.StringIO(str(await financial_file.read(), 'utf-8')))
-
-        # 2. Convert to string for AI context
-        emp_text = emp_df.to_string(index=False)
-        proj_text = proj_df.to_string(index=False)
-        fin_text = fin_df.to_string(index=False)
-
-        # 3. Calculate Real Financial Aggregates
-
-        # 3. Calculate Real Financial Aggregates AND Persist Data
-        try:
-            # A. Financials
-            if 'amount' in fin_df.columns:
-                 # 1. Clean old records for this project
-                 get_db().table("financial_records").delete().eq("project_id", str(project_id)).execute()
-                 
-                 # 2. Prepare new records
-                 fin_records = []
-                 total_spend = 0.0
-                 for _, row in fin_df.iterrows():
-                     amt = pd.to_numeric(row.get('amount', 0), errors='coerce')
-                     if pd.isna(amt): amt = 0.0
-                     total_spend += float(amt)
-                     
-                     record = {
-                         "project_id": str(project_id),
-                         "date": row.get('date', datetime.now().date().isoformat()),
-                         "category": row.get('category', 'Uncategorized'),
-                         "amount": float(amt),
-                         "description": row.get('description', ''),
-                         "approved_by": row.get('approved_by', ''),
-                         "budget_category": row.get('budget_category', '')
-                     }
-                     fin_records.append(record)
-                 
-                 # 3. Insert new records
-                 if fin_records:
-                     get_db().table("financial_records").insert(fin_records).execute()
-                     print(f"Persisted {len(fin_records)} financial records.")
-
-                 # 4. Update Project Total Spend
-                 get_db().table("projects").update({"actual_spend": total_spend}).eq("id", str(project_id)).execute()
-                 print(f"Calculated Total Spend: {total_spend}")
+        from backend.agent import rag_system, cache_system
+
+        # 1-2. Stream each CSV chunk by chunk through profiling, persistence and RAG ingestion,
+        # so memory stays flat however large the uploads are; only rows that changed since the
+        # previous upload are written, embedded or deleted
+        ingestion = UploadIngestion(project_id, get_db, bulk_writer, rag_system,
+                                    on_chunk=lambda kind, rows: progress.update(kind, {"rows": rows}))
+        texts = {}
+        for kind, field in INIT_UPLOADS:
+            progress.start(kind)
+            failed_before = set(ingestion.stats["failed"])
+            with span(f"init.{kind}"), open(files[field], "rb") as source:
+                texts[kind] = getattr(ingestion, kind)(source)
+            failed = {s: e for s, e in ingestion.stats["failed"].items() if s not in failed_before}
+            if failed:
+                progress.fail(kind, "; ".join(f"{stage}: {error}" for stage, error in failed.items()))
             else:
-                 print("Warning: 'amount' column not found in financials CSV")
-            
-            # B. Employees
-            if not emp_df.empty:
-                emp_records = []
-                emp_ids = []
-                for _, row in emp_df.iterrows():
-                    # Parse skills from string "['A', 'B']" to list
-                    skills_list = []
-                    raw_skills = row.get('skills', '[]')
-                    try:
-                        if isinstance(raw_skills, str):
-                            skills_list = ast.literal_eval(raw_skills)
-                    except:
-                        skills_list = []
-
-                    rec = {
-                        "id": str(row.get('id', uuid.uuid4())), # Fallback if no ID
-                        "name": row.get('name', 'Unknown'),
-                        "role": row.get('role', 'Unknown'),
-                        "department": row.get('department', 'Unknown'),
-                        "join_date": row.get('join_date', None),
-                        "skills": skills_list
-                        # Skip complex jsonb fields for now to keep it simple, or add if needed
-                    }
-                    emp_records.append(rec)
-                    emp_ids.append(rec['id'])
-                
-                # Upsert Employees (Global Table)
-                if emp_records:
-                    get_db().table("employees").upsert(emp_records).execute()
-                    print(f"Upserted {len(emp_records)} employee records.")
-                
-                # Link to Project
-                get_db().table("projects").update({"team_members": emp_ids}).eq("id", str(project_id)).execute()
-
-        except Exception as e:
-            print(f"Error Persisting Data: {e}")
-            import traceback
-            traceback.print_exc()
+                progress.finish(kind, ingestion.stats.get(kind))
+        print(f"✅ RAG Ingestion Complete. {ingestion.stats['documents']} chunks indexed.")
 
-        # --- NEW: RAG Ingestion Pipeline ---
+        # Answers cached against the previous upload are now stale
+        progress.start("cache")
         try:
-            from backend.agent import rag_system
-            
-            # 1. Clean old vectors
-            rag_system.clean_project_data(str(project_id))
-            
-            # 2. Ingest Files
-            count = 0
-            if not proj_df.empty:
-                count += rag_system.ingest_csv(proj_df.to_csv(index=False), {"project_id": str(project_id), "type": "Projects"})
-                
-            if not emp_df.empty:
-                count += rag_system.ingest_csv(emp_df.to_csv(index=False), {"project_id": str(project_id), "type": "Employees"})
-                
-            if not fin_df.empty:
-                count += rag_system.ingest_csv(fin_df.to_csv(index=False), {"project_id": str(project_id), "type": "Financials"})
-                
-            print(f"✅ RAG Ingestion Complete. {count} chunks indexed.")
-            
+            with span("init.cache"):
+                cache_system.bump_data_version(project_id)
+                cache_system.bump_data_version(PORTFOLIO_SCOPE)
+                if not ingestion.schedule.empty:
+                    cache_system.set_versioned(project_id, "schedule", json.dumps(schedule_to_records(ingestion.schedule)))
         except Exception as e:
-            print(f" RAG Ingestion Failed: {e}")
-        # -----------------------------------
-        
-        # 4. Run Agents
+            print(f" Cache invalidation failed: {e}")
+        progress.finish("cache")
+
+        # 3. Run Agents
+        progress.start("agents")
         emp_agent = EmployeeRiskAgent()
         proj_agent = ProjectTrackingAgent()
         fin_agent = FinancialAgent()
         market_agent = MarketAnalysisAgent()
         master_agent = MasterAgent()
 
-        emp_analysis = emp_agent.analyze(emp_text)
-        proj_analysis = proj_agent.analyze(proj_text)
-        fin_analysis = fin_agent.analyze(fin_text)
-        market_analysis = market_agent.analyze(f"Project ID: {project_id}\nDetails: {proj_text}")
-
-        final_report = master_agent.synthesize(
-            emp_analysis, proj_analysis, fin_analysis, market_analysis
-        )
-
-        # 5. Save Analysis to Chat History
+        # Specialist agents are independent, so run them side by side;
+        # a failed or timed-out agent leaves an error note for the synthesis step.
+        with span("init.agents"):
+            analyses = MasterAgent.run_concurrently({
+                "employee": (emp_agent.analyze, (texts["employees"],)),
+                "project": (proj_agent.analyze, (texts["projects"],)),
+                "financial": (fin_agent.analyze, (texts["financials"],)),
+                "market": (market_agent.analyze, (f"Project ID: {project_id}\nDetails: {texts['projects']}",)),
+            })
+        progress.finish("agents")
+
+        progress.start("synthesis")
+        with span("init.synthesis"):
+            final_report = master_agent.synthesize(
+                analyses["employee"], analyses["project"], analyses["financial"], analyses["market"]
+            )
+        if is_error_response(final_report):
+            # Fail the job rather than saving the error text as the project's analysis
+            raise RuntimeError(final_report)
+        progress.finish("synthesis")
+
+        # 4. Save Analysis to Chat History
+        progress.start("save")
         chat_entry = {
-            "project_id": str(project_id),
+            "project_id": project_id,
             "message": "System: Initial Risk Analysis",
             "response": final_report
         }
-        get_db().table("chat_history").insert(chat_entry).execute()
+        with span("init.save"):
+            get_db().table("chat_history").insert(chat_entry).execute()
+        progress.finish("save")
 
-        return {"analysis": final_report}
+        if ingestion.stats["failed"]:
+            # The analysis is saved, but the stored data is incomplete: report the job as failed
+            raise RuntimeError("Upload stages failed: " + ", ".join(ingestion.stats["failed"]))
+        return {"analysis": final_report, "changes": ingestion.stats["changes"]}
 
     except Exception as e:
         print(f"Error in init_chat: {e}")
         import traceback
         traceback.print_exc()
+        raise
+    finally:
+        remove_spooled(files)
+
+job_manager = JobManager()
+job_manager.register("init", run_init_analysis, INIT_STAGES)
+
+_job_queue_depth = registry.gauge("riskpilot_job_queue_depth", "Jobs waiting for a worker")
+registry.add_collector(lambda: _job_queue_depth.set(job_manager.queue.depth()))
+
+@app.post("/chat/init/{project_id}", status_code=202)
+async def init_chat(
+    project_id: uuid.UUID,
+    response: Response,
+    employee_file: UploadFile = File(...),
+    project_file: UploadFile = File(...),
+    financial_file: UploadFile = File(...),
+    wait: bool = False
+):
+    """
+    Queue the initial AI analysis and return its job id straight away; poll GET /jobs/{job_id}.
+    With ?wait=true the job runs within the request and the analysis is returned, as before.
+    """
+    try:
+        # Uploads only live as long as the request, so copy them to disk for the worker,
+        # off the event loop: large files would otherwise stall every other request meanwhile
+        files = await run_in_threadpool(spool_uploads, {
+            "employee_file": employee_file.file,
+            "project_file": project_file.file,
+            "financial_file": financial_file.file,
+        })
+    except Exception as e:
+        print(f"Error spooling uploads: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
 
+    payload = {"project_id": str(project_id), "files": files}
+    if wait:
+        job = await run_in_threadpool(job_manager.run, job_manager.create("init", payload, str(project_id)))
+        if job["status"] != SUCCEEDED:
+            raise HTTPException(status_code=500, detail=f"Error processing files: {job['error']}")
+        response.status_code = 200
+        return job["result"]
+
+    job = job_manager.submit("init", payload, str(project_id))
+    return {"job_id": job["id"], "status": job["status"]}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, current stage, per-stage progress and (once finished) the result or error of a job."""
+    try:
+        job = job_manager.get(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop("payload", None)
+    if job["status"] == "queued":
+        job["queue_depth"] = job_manager.queue.depth()
+    return job
+
 @app.post("/chat/continue/{project_id}")
 def chat_continue(project_id: uuid.UUID, request: ChatRequest):
     """Continue conversation with context."""
     try:
-        # Retrieve history
-        history_response = get_db().table("chat_history").select("*").eq("project_id", str(project_id)).order("timestamp").execute()
-        history = history_response.data
-
-        # Simple context retrieval (in production, use vector store or refined query)
-        # For now, we assume the AI has 'memory' via the history or we re-fetch basics.
-        # To keep it simple, we just pass the history to the agent.
+        # Bounded history: rolling summary of older turns plus the most recent turns verbatim
+        summary, history = ConversationMemory(get_db(), SummaryAgent()).load(str(project_id))
         
         master_agent = MasterAgent()
-        # We might need to fetch project data again if we don't store it in context, 
-        # but for this flow let's rely on history or a generic prompt for now.
-        context_data = "Refer to previous analysis." 
         
         # Updated to pass project_id for Caching
-        ai_response = master_agent.chat(request.message, history, str(project_id))
+        ai_response = master_agent.chat(request.message, history, str(project_id), summary)
+        if is_error_response(ai_response):
+            # Rate limits and outages are reported to the caller, not stored as an answer
+            raise HTTPException(status_code=503, detail=ai_response)
 
         # Save to DB
         new_entry = {
@@ -279,9 +376,172 @@ def chat_continue(project_id: uuid.UUID, request: ChatRequest):
 
         return {"response": ai_response, "timestamp": datetime.now()}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream/{project_id}")
+def chat_stream(project_id: uuid.UUID, request: ChatRequest):
+    """
+    Same as /chat/continue but streams the answer as Server-Sent Events.
+    Each piece of text arrives as `data: {"token": ...}`; a final `event: done`
+    carries the full response once it has been saved to chat history.
+    """
+    try:
+        summary, history = ConversationMemory(get_db(), SummaryAgent()).load(str(project_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    master_agent = MasterAgent()
+
+    def event_stream():
+        parts = []
+        failed = False
+        for token in master_agent.chat_stream(request.message, history, str(project_id), summary):
+            parts.append(token)
+            failed = failed or is_error_response(token)
+            yield f"data: {json.dumps({'token': token})}\n\n"
+
+        ai_response = "".join(parts)
+        try:
+            # Rate limits and outages are shown to the user but not stored as an answer
+            if not failed:
+                get_db().table("chat_history").insert({
+                    "project_id": str(project_id),
+                    "message": request.message,
+                    "response": ai_response
+                }).execute()
+        except Exception as e:
+            print(f"Error saving streamed chat: {e}")
+        yield f"event: done\ndata: {json.dumps({'response': ai_response, 'timestamp': datetime.now().isoformat()})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/projects/{project_id}/employee-risk")
+def compute_employee_risk(project_id: uuid.UUID, employee_file: UploadFile = File(...), limit: int = 20):
+    """
+    Score an employee CSV, replace the stored scores for the project and return the top-ranked employees.
+    A plain def, so FastAPI runs it on the threadpool; the file is streamed chunk by chunk.
+    """
+    try:
+        computed_at = datetime.now().isoformat()
+        scored, saved, top = 0, 0, None
+        for raw in iter_csv_chunks(employee_file.file):
+            scores = score_employees(typed_frame(raw))
+            scored += len(scores)
+            saved += save_employee_scores(str(project_id), scores, computed_at)
+            head = scores.head(limit)
+            top = head if top is None else (
+                pd.concat([top, head]).sort_values("attrition_score", ascending=False, kind="stable").head(limit))
+        if saved:
+            remove_old_employee_scores(str(project_id), computed_at)
+        top = (top if top is not None else pd.DataFrame()).astype(object)
+        return {"scored": scored, "saved": saved, "top": top.where(pd.notna(top), None).to_dict("records")}
+    except Exception as e:
+        print(f"Error scoring employees: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/projects/{project_id}/employee-risk")
+def get_employee_risk(project_id: uuid.UUID, limit: int = 20):
+    """Stored attrition scores for a project, highest risk first."""
+    try:
+        response = (get_db().table("employee_risk_scores").select("*")
+                    .eq("project_id", str(project_id))
+                    .order("attrition_score", desc=True).limit(limit).execute())
+        return response.data
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def load_financial_history(project_id: str) -> pd.DataFrame:
+    """A project's stored financial_records (the columns anomaly detection reads), every page of them."""
+    columns = ",".join(SOURCE_COLUMNS)
+    return pd.DataFrame(fetch_rows(lambda: get_db().table("financial_records").select(f"id,{columns}")
+                                   .eq("project_id", project_id)))
+
+@app.get("/projects/{project_id}/anomalies")
+def get_financial_anomalies(project_id: uuid.UUID):
+    """Anomaly flags over the project's financial_records (robust z-scores, duplicates, spikes)."""
+    try:
+        flags = anomaly_detector.flags(str(project_id))
+        if flags is None:
+            flags = anomaly_detector.reset(str(project_id), load_financial_history(str(project_id)))
+        return {"count": len(flags), "flags": flags_to_records(flags)}
+    except Exception as e:
+        print(f"Error detecting anomalies: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/projects/{project_id}/financial-records")
+def add_financial_records(project_id: uuid.UUID, records: List[FinancialRecordCreate]):
+    """
+    Append financial records and score only the new ones against the project's history.
+    Row ids derive from the request body, so a retried request stores (and scores) its rows once.
+    """
+    try:
+        if anomaly_detector.flags(str(project_id)) is None:
+            anomaly_detector.reset(str(project_id), load_financial_history(str(project_id)))
+
+        rows = [{**r.model_dump(mode="json"), "project_id": str(project_id)} for r in records]
+        body = hashlib.sha256(json.dumps(rows, sort_keys=True).encode()).hexdigest()
+        rows = list(idempotent_ids(rows, f"financial_records:{project_id}:{body}"))
+        stored = existing_ids(get_db, "financial_records", [r["id"] for r in rows])
+        rows = [r for r in rows if r["id"] not in stored]
+        if rows:
+            bulk_writer.write("financial_records", rows, method="upsert", on_conflict="id")
+            # Answers, reports and schedules cached against the old records are now stale
+            from backend.agent import cache_system
+            cache_system.bump_data_version(str(project_id))
+            cache_system.bump_data_version(PORTFOLIO_SCOPE)
+        flags = anomaly_detector.update(str(project_id), pd.DataFrame(rows))
+        return {"inserted": len(rows), "flags": flags_to_records(flags)}
+    except Exception as e:
+        print(f"Error adding financial records: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/projects/{project_id}/schedule")
+def get_project_schedule(project_id: uuid.UUID):
+    """Milestone slippage for the project's latest upload (or its own record if nothing was uploaded)."""
+    try:
+        def load():
+            uploaded = list(fetch_rows(lambda: get_db().table("project_schedule_rows").select("*")
+                                       .eq("project_id", str(project_id))))
+            if uploaded:
+                return pd.DataFrame(uploaded)
+            res = get_db().table("projects").select("*").eq("id", str(project_id)).execute()
+            return pd.DataFrame(res.data)
+        return cached_schedule(str(project_id), load)
+    except Exception as e:
+        print(f"Error computing schedule: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/portfolio/schedule")
+def get_portfolio_schedule():
+    """Schedule variance across every project in the database."""
+    try:
+        def load():
+            res = get_db().table("projects").select("*").execute()
+            return pd.DataFrame(res.data)
+        return cached_schedule(PORTFOLIO_SCOPE, load)
+    except Exception as e:
+        print(f"Error computing portfolio schedule: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/llm/stats")
+def llm_stats():
+    """LLM scheduler queue depth per priority, wait times, retries, rate-limit hits and breaker state."""
+    from backend.llm_scheduler import llm_scheduler
+    return llm_scheduler.stats()
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit rates per cache tier and embedding-cache counters."""
+    from backend.agent import cache_system, rag_system
+    stats = {"responses": cache_system.stats()}
+    if rag_system.embedding_cache:
+        stats["embeddings"] = rag_system.embedding_cache.stats()
+    return stats
+
 @app.get("/chats/{project_id}")
 def get_chat_history(project_id: uuid.UUID):
     try:
@@ -317,3 +577,5 @@ def get_project_stats(project_id: uuid.UUID):
     except Exception as e:
         print(f"Error fetching stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+startup_report["import_seconds"] = round(time.perf_counter() - _IMPORT_START, 3)
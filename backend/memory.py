@@ -0,0 +1,124 @@
+import os
+from typing import List, Dict, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+MEMORY_KEEP_TURNS = int(os.getenv("MEMORY_KEEP_TURNS", "6"))
+# Older turns are folded into the summary in groups of this size, so summarization is amortized
+MEMORY_FOLD_BATCH = int(os.getenv("MEMORY_FOLD_BATCH", "4"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "3000"))
+MEMORY_MAX_TURN_TOKENS = int(os.getenv("MEMORY_MAX_TURN_TOKENS", "600"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "500"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting prompts."""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + " …[truncated]"
+
+
+def format_turns(turns: List[Dict]) -> str:
+    lines = []
+    for turn in turns:
+        if turn.get("message"):
+            lines.append(f"User: {turn['message']}")
+        if turn.get("response"):
+            lines.append(f"RiskPilot: {turn['response']}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    Bounded conversation context for a project.
+    The last `keep_turns` turns are replayed verbatim (each capped at max_turn_tokens);
+    anything older is folded into a rolling summary persisted in conversation_summaries,
+    so only turns newer than the summary are ever read back from chat_history. Older turns
+    that are not folded yet (the batch is not full, or summarizing failed) stay in the
+    history, within the token budget, so none drops out of the context.
+    """
+
+    def __init__(self, db, summarizer, keep_turns: int = MEMORY_KEEP_TURNS, fold_batch: int = MEMORY_FOLD_BATCH,
+                 token_budget: int = MEMORY_TOKEN_BUDGET, max_turn_tokens: int = MEMORY_MAX_TURN_TOKENS):
+        self.db = db
+        self.summarizer = summarizer
+        self.keep_turns = keep_turns
+        self.fold_batch = fold_batch
+        self.token_budget = token_budget
+        self.max_turn_tokens = max_turn_tokens
+
+    def _load_summary(self, project_id: str) -> Dict:
+        try:
+            res = self.db.table("conversation_summaries").select("*").eq("project_id", project_id).execute()
+            if res.data:
+                return res.data[0]
+        except Exception as e:
+            print(f"Error loading conversation summary: {e}")
+        return {"summary": "", "summarized_until": None}
+
+    def _load_recent(self, project_id: str, since) -> List[Dict]:
+        query = self.db.table("chat_history").select("*").eq("project_id", project_id)
+        if since:
+            query = query.gt("timestamp", since)
+        return query.order("timestamp").execute().data or []
+
+    def _fold(self, project_id: str, summary: str, turns: List[Dict]) -> Tuple[str, bool]:
+        """Merge `turns` into the summary and persist it; returns (summary, folded)."""
+        transcript = format_turns([
+            {"message": t.get("message"), "response": truncate_to_tokens(str(t.get("response") or ""), self.max_turn_tokens * 2)}
+            for t in turns
+        ])
+        # Imported here: backend.agent imports the scheduler, which imports this module
+        from backend.agent import is_error_response
+        new_summary = self.summarizer.summarize(summary, transcript, MEMORY_SUMMARY_TOKENS)
+        if is_error_response(new_summary):
+            return summary, False
+
+        new_summary = truncate_to_tokens(new_summary, MEMORY_SUMMARY_TOKENS)
+        try:
+            self.db.table("conversation_summaries").upsert({
+                "project_id": project_id,
+                "summary": new_summary,
+                "summarized_until": turns[-1]["timestamp"],
+            }).execute()
+        except Exception as e:
+            print(f"Error saving conversation summary: {e}")
+            return summary, False
+        print(f"Folded {len(turns)} turns into conversation summary for project {project_id}")
+        return new_summary, True
+
+    def load(self, project_id: str) -> Tuple[str, List[Dict]]:
+        """Return (summary, recent turns) sized to fit the token budget."""
+        project_id = str(project_id)
+        state = self._load_summary(project_id)
+        summary = state.get("summary") or ""
+        turns = self._load_recent(project_id, state.get("summarized_until"))
+
+        overflow = len(turns) - self.keep_turns
+        if overflow >= self.fold_batch:
+            summary, folded = self._fold(project_id, summary, turns[:overflow])
+            if folded:
+                turns = turns[overflow:]
+
+        # Newest turns first until the budget is spent; the summary is paid for up front
+        budget = self.token_budget - estimate_tokens(summary)
+        kept = []
+        for turn in reversed(turns):
+            trimmed = {
+                "message": truncate_to_tokens(str(turn.get("message") or ""), self.max_turn_tokens),
+                "response": truncate_to_tokens(str(turn.get("response") or ""), self.max_turn_tokens),
+            }
+            cost = estimate_tokens(trimmed["message"]) + estimate_tokens(trimmed["response"])
+            if kept and cost > budget:
+                break
+            budget -= cost
+            kept.append(trimmed)
+        kept.reverse()
+        return summary, kept
@@ -0,0 +1,223 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import nullcontext
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+# When disabled, span() hands back a shared no-op context and counters return immediately
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Spans slower than this are printed with their parent chain (0 turns this off)
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "0"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Metrics live in this process only; with several API workers each one serves its own /metrics.
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        with self._lock:
+            samples = self._samples()
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + samples
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One slot per bucket plus +Inf, then the running sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket = _labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], None]):
+        """`collect()` runs before every render, e.g. to copy current queue depths into gauges."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram("riskpilot_span_seconds", "Time spent in traced sections of the backend", ["span"])
+SPAN_ERRORS = registry.counter("riskpilot_span_errors_total", "Traced sections that raised", ["span"])
+HTTP_REQUESTS = registry.counter("riskpilot_http_requests_total", "HTTP requests served",
+                                 ["method", "route", "status"])
+HTTP_SECONDS = registry.histogram("riskpilot_http_request_seconds", "HTTP request latency", ["method", "route"])
+ROWS_INGESTED = registry.counter("riskpilot_rows_ingested_total", "Uploaded CSV rows streamed through ingestion",
+                                 ["kind"])
+DOCUMENTS_INGESTED = registry.counter("riskpilot_documents_ingested_total", "RAG documents embedded and stored",
+                                      ["type"])
+CACHE_LOOKUPS = registry.counter("riskpilot_cache_lookups_total", "CacheSystem lookups by kind and tier hit",
+                                 ["cache", "result"])
+EMBEDDING_CACHE_LOOKUPS = registry.counter("riskpilot_embedding_cache_lookups_total",
+                                           "Embedding cache lookups by outcome", ["result"])
+LLM_REQUESTS = registry.counter("riskpilot_llm_requests_total", "LLM request attempts by priority and outcome",
+                                ["priority", "outcome"])
+LLM_TOKENS = registry.counter("riskpilot_llm_tokens_total", "LLM tokens reported by the API", ["type"])
+
+# Dotted path of the spans enclosing the current code, e.g. "chat/rag.retrieve"
+_current_span = contextvars.ContextVar("riskpilot_span", default="")
+
+
+class _Span:
+    __slots__ = ("name", "start", "token")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.token = _current_span.set(f"{parent}/{self.name}" if parent else self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        path = _current_span.get()
+        _current_span.reset(self.token)
+        SPAN_SECONDS.observe(elapsed, span=self.name)
+        if exc_type is not None:
+            SPAN_ERRORS.inc(span=self.name)
+        if TRACE_SLOW_SECONDS and elapsed >= TRACE_SLOW_SECONDS:
+            print(f"Slow span {path}: {elapsed:.3f}s")
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def span(name: str):
+    """Time a block under `name`: `with span("rag.embed"): ...`."""
+    return _Span(name) if METRICS_ENABLED else _NOOP
+
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -24,6 +24,14 @@ class ProjectResponse(ProjectBase):
     class Config:
         from_attributes = True
 
+class FinancialRecordCreate(BaseModel):
+    date: date
+    category: Optional[str] = None
+    amount: float
+    description: Optional[str] = None
+    approved_by: Optional[str] = None
+    budget_category: Optional[str] = None
+
 class ChatRequest(BaseModel):
     message: str
 
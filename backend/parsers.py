@@ -0,0 +1,123 @@
+import ast
+import numpy as np
+import pandas as pd
+
+# The CSV exports store nested fields as Python literal strings, e.g.
+#   attendance_record:   "{'absent': 2, 'late': 1}"
+#   performance_ratings: "{'2023': 4.5, '2024': 4.7}"
+#   milestones:          "[{'name': 'API Setup', 'date': '2024-02-01'}, ...]"
+#   skills:              "['Python', 'FastAPI']"
+# Each distinct cell value is parsed once with ast.literal_eval (exports repeat the
+# same literals a lot) and the result is broadcast back to the rows by code.
+
+
+def _factorize(series: pd.Series):
+    codes, uniques = pd.factorize(series.astype("string"))
+    return codes, pd.Series(uniques, dtype="string")
+
+
+def _literal(text: str):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+
+
+def _parse_uniques(series: pd.Series):
+    """
+    Codes per row and the literal parsed from each distinct cell (None when a cell is not one).
+    Cells that are already lists or dicts (jsonb columns read back from the database) go
+    through their repr, which is a valid literal, so both sources parse the same way.
+    """
+    codes, uniques = _factorize(series)
+    return codes, [_literal(text) for text in uniques.tolist()]
+
+
+def _number(value) -> float:
+    if isinstance(value, bool):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _dict_items(value) -> dict:
+    """Dict cell with its keys as text, so {2023: 4.5} and {'2023': 4.5} read alike."""
+    return {str(k): v for k, v in value.items()} if isinstance(value, dict) else {}
+
+
+def extract_dict_number(series: pd.Series, key: str) -> pd.Series:
+    """Numeric value stored under `key` in a dict-literal column (NaN when absent)."""
+    codes, parsed = _parse_uniques(series)
+    values = np.array([_number(_dict_items(v).get(key)) for v in parsed] + [np.nan], dtype=float)
+    # code -1 (missing cell) picks the trailing NaN
+    return pd.Series(values[codes], index=series.index)
+
+
+def extract_year_ratings(series: pd.Series) -> pd.DataFrame:
+    """Wide frame of ratings per year (one column per year, sorted), aligned to the series index."""
+    codes, parsed = _parse_uniques(series)
+    pairs = [(code, year, _number(rating)) for code, value in enumerate(parsed)
+             for year, rating in _dict_items(value).items() if len(year) == 4 and year.isdigit()]
+    if not pairs:
+        return pd.DataFrame(index=series.index)
+    pairs = pd.DataFrame(pairs, columns=["row", "year", "rating"])
+    wide = pairs.groupby(["row", "year"])["rating"].last().unstack("year")
+    wide = wide.reindex(range(len(parsed))).sort_index(axis=1)
+    wide.columns.name = None
+    values = np.vstack([wide.to_numpy(dtype=float), np.full((1, wide.shape[1]), np.nan)])
+    return pd.DataFrame(values[codes], index=series.index, columns=wide.columns)
+
+
+def last_valid(frame: pd.DataFrame) -> pd.Series:
+    """Right-most non-null value of each row (NaN when the row is empty)."""
+    values = frame.to_numpy(dtype=float)
+    if values.shape[1] == 0:
+        return pd.Series(np.nan, index=frame.index)
+    mask = ~np.isnan(values)
+    idx = values.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+    picked = values[np.arange(len(values)), idx]
+    return pd.Series(np.where(mask.any(axis=1), picked, np.nan), index=frame.index)
+
+
+def first_valid(frame: pd.DataFrame) -> pd.Series:
+    """Left-most non-null value of each row (NaN when the row is empty)."""
+    values = frame.to_numpy(dtype=float)
+    if values.shape[1] == 0:
+        return pd.Series(np.nan, index=frame.index)
+    mask = ~np.isnan(values)
+    picked = values[np.arange(len(values)), mask.argmax(axis=1)]
+    return pd.Series(np.where(mask.any(axis=1), picked, np.nan), index=frame.index)
+
+
+def extract_milestones(series: pd.Series) -> pd.DataFrame:
+    """Long frame with one row per milestone: the source row index, name and parsed date."""
+    codes, parsed = _parse_uniques(series)
+    entries = []
+    for code, value in enumerate(parsed):
+        for milestone in ([value] if isinstance(value, dict) else value if isinstance(value, (list, tuple)) else []):
+            # Key order does not matter: jsonb hands dicts back with their keys sorted
+            if isinstance(milestone, dict) and "name" in milestone and "date" in milestone:
+                entries.append((code, str(milestone["name"]), str(milestone["date"])))
+    if not entries:
+        return pd.DataFrame({"row": pd.Series(dtype="int64"), "name": pd.Series(dtype="string"),
+                             "date": pd.Series(dtype="datetime64[ns]")})
+    found = pd.DataFrame(entries, columns=["code", "name", "date"])
+    found["name"] = found["name"].astype("string")
+    found["date"] = pd.to_datetime(found["date"], errors="coerce")
+
+    # Broadcast each distinct cell's milestones back to every row that holds it
+    rows = pd.DataFrame({"row": series.index, "code": codes})
+    out = rows.merge(found, on="code", how="inner", sort=False).sort_values("row", kind="stable")
+    return out.reset_index(drop=True)[["row", "name", "date"]]
+
+
+def extract_string_list(series: pd.Series) -> pd.Series:
+    """List of strings from a list-literal column; non-list cells become []."""
+    codes, parsed = _parse_uniques(series)
+    parsed = [[str(item) for item in v] if isinstance(v, (list, tuple)) else [] for v in parsed] + [[]]
+    # Each row gets its own list object so callers can mutate them safely
+    return pd.Series([list(parsed[c]) for c in codes], index=series.index, dtype=object)
@@ -0,0 +1,347 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from backend.memory import estimate_tokens
+from backend.parsers import extract_dict_number, extract_year_ratings, extract_milestones, first_valid, last_valid
+
+load_dotenv()
+
+# --- Configuration ---
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "5"))
+# Small uploads are cheap to show in full, so the raw rows are appended below this size
+PROFILE_RAW_ROWS = int(os.getenv("PROFILE_RAW_ROWS", "20"))
+# Values kept for medians; medians are exact up to this many rows and sampled beyond it
+PROFILE_SAMPLE_SIZE = int(os.getenv("PROFILE_SAMPLE_SIZE", "100000"))
+
+# Profiles are built one chunk at a time (see ProfileBuilder), so each profiler only keeps
+# running totals, per-group partial sums, top-N candidate rows and a bounded sample.
+
+
+def _table(df: Optional[pd.DataFrame]) -> str:
+    return df.to_string(index=False) if df is not None and not df.empty else "(none)"
+
+
+def _money(value) -> str:
+    return f"{float(value):,.2f}" if pd.notna(value) else "n/a"
+
+
+def _mean(total: float, count: int) -> float:
+    return total / count if count else np.nan
+
+
+def _top(current: Optional[pd.DataFrame], candidates: pd.DataFrame, n: int, by, ascending=False) -> pd.DataFrame:
+    """Keep the best `n` rows seen so far; earlier rows win ties, as with nlargest on the full frame."""
+    combined = candidates if current is None else pd.concat([current, candidates])
+    return combined.sort_values(by, ascending=ascending, kind="stable").head(n)
+
+
+def _add_groups(current: Optional[pd.DataFrame], part):
+    """Merge per-group partial sums from one chunk into the running totals."""
+    if current is None:
+        return part
+    return pd.concat([current, part]).groupby(level=0, dropna=False, sort=False).sum()
+
+
+class _Sample:
+    """Uniform reservoir sample of at most `size` values, for medians over chunked data."""
+
+    def __init__(self, size: int = PROFILE_SAMPLE_SIZE, seed: int = 0):
+        self.size = size
+        self.values = np.empty(0)
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, values) -> None:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        take = max(0, min(self.size - len(self.values), len(values)))
+        self.values = np.concatenate([self.values, values[:take]])
+        self.seen += take
+        rest = values[take:]
+        if len(rest):
+            slots = (self._rng.random(len(rest)) * (self.seen + np.arange(1, len(rest) + 1))).astype(np.int64)
+            keep = slots < self.size
+            self.values[slots[keep]] = rest[keep]
+            self.seen += len(rest)
+
+    def median(self) -> float:
+        return float(np.median(self.values)) if len(self.values) else np.nan
+
+
+class _NumericSummary:
+    """Column list plus mean/min/max of every numeric column."""
+
+    def __init__(self):
+        self.columns = []
+        self.stats = None
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.columns += [c for c in df.columns if c not in self.columns]
+        numeric = df.select_dtypes("number")
+        if numeric.empty:
+            return
+        part = pd.DataFrame({"sum": numeric.sum(), "count": numeric.count(), "min": numeric.min(), "max": numeric.max()})
+        if self.stats is not None:
+            part = (pd.concat([self.stats, part]).groupby(level=0, sort=False)
+                    .agg({"sum": "sum", "count": "sum", "min": "min", "max": "max"}))
+        self.stats = part
+
+    def lines(self) -> list:
+        lines = [f"Columns: {', '.join(map(str, self.columns))}"]
+        if self.stats is not None:
+            table = self.stats.assign(mean=self.stats["sum"] / self.stats["count"])[["mean", "min", "max"]]
+            lines += ["Numeric columns:", table.astype(float).round(2).to_string()]
+        return lines
+
+
+class EmployeeProfile:
+    def __init__(self, top_n: int = PROFILE_TOP_N):
+        self.top_n = top_n
+        self.rows = 0
+        self.departments = None
+        self.has_attendance = False
+        self.absent_total = self.late_total = 0.0
+        self.absent_max = np.nan
+        self.absent_sample = _Sample()
+        self.top_attendance = None
+        self.rated = 0
+        self.rating_total = 0.0
+        self.rating_min = np.nan
+        self.declining = 0
+        self.top_ratings = None
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        if "department" in df.columns:
+            self.departments = _add_groups(self.departments, df["department"].value_counts())
+
+        view = df[[c for c in ("id", "name", "role", "department") if c in df.columns]].copy()
+        if "attendance_record" in df.columns:
+            self.has_attendance = True
+            view["absent"] = extract_dict_number(df["attendance_record"], "absent").fillna(0)
+            view["late"] = extract_dict_number(df["attendance_record"], "late").fillna(0)
+            self.absent_total += view["absent"].sum()
+            self.late_total += view["late"].sum()
+            self.absent_max = np.fmax(self.absent_max, view["absent"].max())
+            self.absent_sample.add(view["absent"])
+            ranked = view.assign(total=view["absent"] + view["late"]).nlargest(self.top_n, "total")
+            self.top_attendance = _top(self.top_attendance, ranked, self.top_n, "total")
+
+        if "performance_ratings" in df.columns:
+            ratings = extract_year_ratings(df["performance_ratings"])
+            if not ratings.empty:
+                latest = last_valid(ratings)
+                view["rating"] = latest
+                view["trend"] = (latest - first_valid(ratings)).round(2)
+                self.rated += int(latest.count())
+                self.rating_total += latest.sum()
+                self.rating_min = np.fmin(self.rating_min, latest.min())
+                self.declining += int((view["trend"] < 0).sum())
+                self.top_ratings = _top(self.top_ratings, view.sort_values(["trend", "rating"]).head(self.top_n),
+                                        self.top_n, ["trend", "rating"], ascending=True)
+
+    def lines(self, generic: _NumericSummary) -> list:
+        lines = [f"Employees: {self.rows}"]
+        if self.departments is not None:
+            counts = self.departments.sort_values(ascending=False, kind="stable").head(self.top_n * 2)
+            lines += ["Headcount by department:", counts.rename_axis("department").rename("count").to_string()]
+        if self.has_attendance:
+            lines.append(f"Absences: mean {_mean(self.absent_total, self.rows):.1f}, "
+                         f"median {self.absent_sample.median():.1f}, max {self.absent_max:.0f}; "
+                         f"lateness: mean {_mean(self.late_total, self.rows):.1f}")
+            lines += [f"Top {self.top_n} by absences + lateness:", _table(self.top_attendance.drop(columns="total"))]
+        if self.top_ratings is not None:
+            lines.append(f"Latest rating: mean {_mean(self.rating_total, self.rated):.2f}, min {self.rating_min:.2f}; "
+                         f"{self.declining} employees with declining ratings")
+            lines += [f"Top {self.top_n} lowest or declining:", _table(self.top_ratings)]
+        return lines
+
+
+class ProjectProfile:
+    def __init__(self, top_n: int = PROFILE_TOP_N):
+        self.top_n = top_n
+        self.today = pd.Timestamp(datetime.now().date())
+        self.rows = 0
+        self.budgeted = 0
+        self.budget_total = 0.0
+        self.budget_max = np.nan
+        self.top_budgets = None
+        self.has_deadlines = False
+        self.past_deadlines = self.upcoming_deadlines = 0
+        self.has_milestones = False
+        self.milestones = self.overdue_milestones = 0
+        self.next_milestones = None
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        if "budget" in df.columns:
+            budget = pd.to_numeric(df["budget"], errors="coerce")
+            self.budgeted += int(budget.count())
+            self.budget_total += budget.sum()
+            self.budget_max = np.fmax(self.budget_max, budget.max())
+            cols = [c for c in ("name", "budget", "deadline") if c in df.columns]
+            ranked = df.assign(budget=budget).nlargest(self.top_n, "budget")[cols]
+            self.top_budgets = _top(self.top_budgets, ranked, self.top_n, "budget")
+
+        if "deadline" in df.columns:
+            self.has_deadlines = True
+            deadline = pd.to_datetime(df["deadline"], errors="coerce")
+            self.past_deadlines += int((deadline < self.today).sum())
+            self.upcoming_deadlines += int(((deadline >= self.today)
+                                            & (deadline <= self.today + pd.Timedelta(days=90))).sum())
+
+        if "milestones" in df.columns:
+            self.has_milestones = True
+            milestones = extract_milestones(df["milestones"])
+            self.milestones += len(milestones)
+            self.overdue_milestones += int((milestones["date"] < self.today).sum())
+            if "name" in df.columns and not milestones.empty:
+                upcoming = milestones[milestones["date"] >= self.today].nsmallest(self.top_n, "date")
+                upcoming = upcoming.assign(project=df["name"].reindex(upcoming["row"]).values)
+                self.next_milestones = _top(self.next_milestones, upcoming[["project", "name", "date"]],
+                                            self.top_n, "date", ascending=True)
+
+    def lines(self, generic: _NumericSummary) -> list:
+        lines = [f"Projects: {self.rows}"]
+        if self.top_budgets is not None:
+            lines.append(f"Budget: total {_money(self.budget_total)}, mean {_money(_mean(self.budget_total, self.budgeted))}, "
+                         f"max {_money(self.budget_max)}")
+            lines += [f"Top {self.top_n} by budget:", _table(self.top_budgets)]
+        if self.has_deadlines:
+            lines.append(f"Deadlines: {self.past_deadlines} past, {self.upcoming_deadlines} within 90 days")
+        if self.has_milestones:
+            lines.append(f"Milestones: {self.milestones} total, {self.overdue_milestones} dated in the past")
+            if self.next_milestones is not None:
+                lines += [f"Next {self.top_n} milestones:", _table(self.next_milestones)]
+        return lines
+
+
+class FinancialProfile:
+    GROUP_COLUMNS = ("budget_category", "category", "approved_by")
+
+    def __init__(self, top_n: int = PROFILE_TOP_N):
+        self.top_n = top_n
+        self.rows = 0
+        self.has_amount = False
+        self.priced = 0
+        self.amount_total = 0.0
+        self.amount_sample = _Sample()
+        self.groups = {}
+        self.monthly = None
+        self.top_transactions = None
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        if "amount" not in df.columns:
+            return
+        self.has_amount = True
+        amount = pd.to_numeric(df["amount"], errors="coerce")
+        frame = df.assign(amount=amount)
+        self.priced += int(amount.count())
+        self.amount_total += amount.sum()
+        self.amount_sample.add(amount)
+
+        for col in self.GROUP_COLUMNS:
+            if col in df.columns:
+                part = frame.groupby(col, dropna=False)["amount"].agg(["count", "sum"])
+                self.groups[col] = _add_groups(self.groups.get(col), part)
+
+        if "date" in df.columns:
+            dates = pd.to_datetime(df["date"], errors="coerce")
+            self.monthly = _add_groups(self.monthly, amount.groupby(dates.dt.to_period("M")).sum())
+
+        cols = [c for c in ("date", "category", "amount", "description", "approved_by") if c in df.columns]
+        self.top_transactions = _top(self.top_transactions, frame.nlargest(self.top_n, "amount")[cols],
+                                     self.top_n, "amount")
+
+    def lines(self, generic: _NumericSummary) -> list:
+        if not self.has_amount:
+            return [f"Financial records: {self.rows}"] + generic.lines()
+
+        lines = [f"Financial records: {self.rows}; total spend {_money(self.amount_total)}, "
+                 f"mean {_money(_mean(self.amount_total, self.priced))}, median {_money(self.amount_sample.median())}"]
+        for col in self.GROUP_COLUMNS:
+            if col in self.groups:
+                grouped = self.groups[col].assign(mean=lambda g: g["sum"] / g["count"])
+                grouped = grouped.sort_values("sum", ascending=False, kind="stable").head(self.top_n * 2).round(2)
+                lines += [f"Spend by {col}:", grouped.rename_axis(col).to_string()]
+
+        if self.monthly is not None:
+            monthly = self.monthly.sort_index().tail(12).round(2)
+            if not monthly.empty:
+                lines += ["Monthly spend (last 12 months):", monthly.rename_axis("date").rename("amount").to_string()]
+
+        lines += [f"Top {self.top_n} largest transactions:", _table(self.top_transactions)]
+        return lines
+
+
+_PROFILERS = {
+    "employees": EmployeeProfile,
+    "projects": ProjectProfile,
+    "financials": FinancialProfile,
+}
+
+
+class ProfileBuilder:
+    """
+    Builds a dataset profile incrementally: add() each parsed chunk, then build().
+    Memory stays bounded by the per-group totals, top-N rows and median sample,
+    however many rows pass through.
+    """
+
+    def __init__(self, kind: str, raw_rows: int = PROFILE_RAW_ROWS, top_n: int = PROFILE_TOP_N):
+        self.kind = kind
+        self.raw_rows = raw_rows
+        self.rows = 0
+        self.head = []
+        self.generic = _NumericSummary()
+        self.profiler = _PROFILERS[kind](top_n)
+        self.error = None
+
+    def add(self, df: pd.DataFrame) -> "ProfileBuilder":
+        if df.empty:
+            return self
+        held = sum(len(h) for h in self.head)
+        if held <= self.raw_rows:
+            self.head.append(df.head(self.raw_rows + 1 - held))
+        self.rows += len(df)
+        self.generic.add(df)
+        if self.error is None:
+            try:
+                self.profiler.add(df)
+            except Exception as e:
+                self.error = e
+        return self
+
+    def build(self) -> Dict:
+        """Returns {"text", "tokens", "rows"}; prompt size stays roughly constant as the row count grows."""
+        if not self.rows:
+            text = f"No {self.kind} data provided."
+        else:
+            lines = None
+            if self.error is None:
+                try:
+                    lines = self.profiler.lines(self.generic)
+                except Exception as e:
+                    self.error = e
+            if self.error is not None:
+                print(f"Profiling {self.kind} failed, falling back to generic summary: {self.error}")
+                lines = [f"{self.kind.title()}: {self.rows} rows"] + self.generic.lines()
+            if self.rows <= self.raw_rows:
+                lines += ["All rows:", pd.concat(self.head).to_string(index=False)]
+            text = "\n".join(lines)
+
+        profile = {"text": text, "tokens": estimate_tokens(text), "rows": self.rows}
+        print(f"Profiled {self.kind}: {profile['rows']} rows -> ~{profile['tokens']} tokens")
+        return profile
+
+
+def build_profile(kind: str, df: pd.DataFrame, raw_rows: int = PROFILE_RAW_ROWS) -> Dict:
+    """
+    Compact statistical summary of one uploaded dataset for an agent prompt.
+    Returns {"text", "tokens", "rows"}; prompt size stays roughly constant as the row count grows.
+    """
+    return ProfileBuilder(kind, raw_rows).add(df).build()
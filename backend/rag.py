@@ -1,55 +1,188 @@
 import os
+import time
+import threading
 from typing import List, Dict
 from dotenv import load_dotenv
-from langchain_community.document_loaders import CSVLoader
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_postgres import PGVector
-from langchain_core.documents import Document
+from backend.vector_store import create_vector_store
+from backend.embedding_cache import EmbeddingCache, EMBEDDING_CACHE_ENABLED
+from backend.bulk_writer import BulkWriter, BulkWriteError, idempotent_ids
+from backend.row_diff import fetch_ids, delete_ids
+from backend.chunking import frame_header, frame_lines
+from backend.metrics import span, DOCUMENTS_INGESTED, EMBEDDING_CACHE_LOOKUPS
 
 load_dotenv()
 
 # --- Configuration ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
-from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
 
-supabase: Client = create_client(SUPABASE_URL, os.getenv("SUPABASE_KEY"))
-model = SentenceTransformer('all-MiniLM-L6-v2') 
+# The Supabase client and the embedding model are created on first use (or by warm_up)
+# so that importing the backend stays fast and the API can answer health checks immediately.
+_supabase = None
+_model = None
+_supabase_lock = threading.Lock()
+_model_lock = threading.Lock()
+
+def get_supabase():
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(SUPABASE_URL, os.getenv("SUPABASE_KEY"))
+    return _supabase
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                start = time.perf_counter()
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                print(f"Loaded embedding model {EMBEDDING_MODEL_NAME} in {time.perf_counter() - start:.2f}s")
+    return _model
+
+# Ingestion batching (rows per model.encode call / rows per documents insert)
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+INSERT_BATCH_SIZE = int(os.getenv("RAG_INSERT_BATCH_SIZE", "500"))
 
 class RAGSystem:
-    def __init__(self):
+    def __init__(self, embed_batch_size: int = EMBED_BATCH_SIZE, insert_batch_size: int = INSERT_BATCH_SIZE):
         self.dims = 384
+        self.embed_batch_size = embed_batch_size
+        self.insert_batch_size = insert_batch_size
+        self.last_ingest_stats = {}
+        self.store = create_vector_store(get_supabase)
+        self.writer = BulkWriter(get_supabase, batch_rows=insert_batch_size)
+        self.embedding_cache = None
+        if EMBEDDING_CACHE_ENABLED:
+            try:
+                self.embedding_cache = EmbeddingCache()
+            except Exception as e:
+                print(f"Embedding cache disabled: {e}")
         
+    def warm_up(self) -> float:
+        """Load the embedding model and database client ahead of the first request."""
+        start = time.perf_counter()
+        get_supabase()
+        get_model().encode("warm up")
+        return time.perf_counter() - start
+
     def embed_text(self, text: str) -> List[float]:
         """Convert text to vector."""
-        return model.encode(text).tolist()
+        return self.embed_texts([text])[0]
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Convert a list of texts to vectors, encoding only those not already in the embedding cache."""
+        if not texts:
+            return []
+        if not self.embedding_cache:
+            with span("rag.encode"):
+                return get_model().encode(texts, batch_size=self.embed_batch_size).tolist()
+
+        with span("rag.embedding_cache"):
+            vectors = self.embedding_cache.get_many(EMBEDDING_MODEL_NAME, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        EMBEDDING_CACHE_LOOKUPS.inc(len(texts) - len(missing), result="hit")
+        EMBEDDING_CACHE_LOOKUPS.inc(len(missing), result="miss")
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            with span("rag.encode"):
+                encoded = get_model().encode(missing_texts, batch_size=self.embed_batch_size).tolist()
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+            self.embedding_cache.put_many(EMBEDDING_MODEL_NAME, missing_texts, encoded)
+        return vectors
 
     def ingest_csv(self, file_content: str, metadata: Dict):
         """Parse CSV content and save embeddings."""
         # Simple splitting by line
         lines = file_content.split('\n')
-        header = lines[0]
-        
-        chunk_batch = []
-        for line in lines[1:]:
-            if not line.strip(): continue
-            
-            # Create a meaningful text representation
-            # e.g. "Employee: Alice, Role: CEO"
-            text_representation = f"Context: {metadata.get('type', 'General')}\nData: {header}\nValues: {line}"
-            
-            vector = self.embed_text(text_representation)
-            
-            chunk_batch.append({
-                "content": text_representation,
-                "metadata": metadata,
-                "embedding": vector
-            })
-            
-        # Bulk Insert
-        if chunk_batch:
-            data = supabase.table("documents").insert(chunk_batch).execute()
-        return len(chunk_batch)
+        return self._ingest_lines(lines[0], lines[1:], metadata)
+
+    def ingest_frame(self, df, metadata: Dict, start: int = 0, ids: List[str] = None):
+        """
+        Save embeddings for one parsed chunk of an uploaded CSV, in the same text form as ingest_csv.
+        `start` is the chunk's first row number in the file, so document ids stay stable across chunks;
+        alternatively `ids` gives each row's document id (see backend/row_diff.py).
+        """
+        return self._ingest_lines(frame_header(df), frame_lines(df), metadata, start, ids)
+
+    def ingest_chunks(self, chunks: List[Dict], metadata: Dict, ids: List[str] = None):
+        """
+        Save embeddings for multi-row documents built by a chunker (see backend/chunking.py).
+        Each document's own metadata (its source rows and group) is stored alongside `metadata`.
+        """
+        texts = [chunk["text"] for chunk in chunks]
+        extra = [chunk["metadata"] for chunk in chunks]
+        return self._ingest_texts(texts, metadata, ids=ids, extra_metadata=extra)
+
+    def document_ids(self, project_id: str, doc_type: str) -> set:
+        """Ids of the stored documents of one type for a project."""
+        return fetch_ids(lambda: get_supabase().table("documents").select("id")
+                         .eq("metadata->>project_id", str(project_id))
+                         .eq("metadata->>type", doc_type))
+
+    def remove_documents(self, project_id: str, ids: List[str]) -> int:
+        """Delete specific documents (rows dropped from a re-upload) and refresh the local index."""
+        if not ids:
+            return 0
+        delete_ids(get_supabase, "documents", ids)
+        self.store.drop(str(project_id))
+        return len(ids)
+
+    def _ingest_lines(self, header: str, lines: List[str], metadata: Dict, start: int = 0, ids: List[str] = None):
+        # Create a meaningful text representation
+        # e.g. "Employee: Alice, Role: CEO"
+        if ids is None:
+            texts = [
+                f"Context: {metadata.get('type', 'General')}\nData: {header}\nValues: {line}"
+                for line in lines if line.strip()
+            ]
+        else:
+            texts = [f"Context: {metadata.get('type', 'General')}\nData: {header}\nValues: {line}" for line in lines]
+        return self._ingest_texts(texts, metadata, start, ids)
+
+    def _ingest_texts(self, texts: List[str], metadata: Dict, start: int = 0, ids: List[str] = None,
+                      extra_metadata: List[Dict] = None):
+        start_time = time.perf_counter()
+
+        # Embed one bounded batch at a time and stream the rows to the bulk writer,
+        # which sends them in size-bounded, retried batches while the next batch is encoded
+        def rows():
+            for i in range(0, len(texts), self.embed_batch_size):
+                batch_texts = texts[i:i + self.embed_batch_size]
+                vectors = self.embed_texts(batch_texts)
+                if metadata.get("project_id"):
+                    self.store.add(metadata["project_id"], batch_texts, vectors)
+                batch_ids = ids[i:i + self.embed_batch_size] if ids is not None else [None] * len(batch_texts)
+                batch_meta = ([{**metadata, **extra} for extra in extra_metadata[i:i + self.embed_batch_size]]
+                              if extra_metadata is not None else [metadata] * len(batch_texts))
+                for text, vector, doc_id, meta in zip(batch_texts, vectors, batch_ids, batch_meta):
+                    yield {"id": doc_id, "content": text, "metadata": meta, "embedding": vector}
+
+        namespace = f"documents:{metadata.get('project_id')}:{metadata.get('type', 'General')}"
+        try:
+            with span("rag.ingest"):
+                write_stats = self.writer.write("documents", idempotent_ids(rows(), namespace, start=start),
+                                                method="upsert", on_conflict="id")
+        except BulkWriteError:
+            # The local index already holds the rows that failed; rebuild it from the table on next search
+            if metadata.get("project_id"):
+                self.store.drop(str(metadata["project_id"]))
+            raise
+        total = write_stats["rows"]
+        DOCUMENTS_INGESTED.inc(total, type=metadata.get("type", "General"))
+
+        elapsed = time.perf_counter() - start_time
+        rate = total / elapsed if elapsed > 0 else 0.0
+        self.last_ingest_stats = {"rows": total, "seconds": round(elapsed, 3), "rows_per_sec": round(rate, 1),
+                                  "failed_rows": write_stats["failed_rows"]}
+        if self.embedding_cache:
+            self.last_ingest_stats["embedding_cache"] = self.embedding_cache.stats()
+        print(f"Ingested {total} {metadata.get('type', 'General')} rows in {elapsed:.2f}s ({rate:.1f} rows/sec)")
+        return total
 
     def clean_project_data(self, project_id: str):
         """Remove all documents for a specific project to prevent stale data."""
@@ -57,25 +190,20 @@ class RAGSystem:
             # We assume metadata contains 'project_id'
             # Note: This requires the metadata column to be queried appropriately. 
             # In Supabase filter, we access jsonb fields using ->> operator string matching
-            supabase.table("documents").delete().eq("metadata->>project_id", str(project_id)).execute()
+            get_supabase().table("documents").delete().eq("metadata->>project_id", str(project_id)).execute()
+            self.store.drop(str(project_id))
             print(f"Cleaned old vectors for project: {project_id}")
         except Exception as e:
             print(f"Error cleaning project data: {e}")
 
-    def retrieve(self, query: str, limit: int = 3) -> List[str]:
-        """Find relevant context for a query."""
-        query_vector = self.embed_text(query)
+    def retrieve(self, query: str, limit: int = 3, project_id: str = None, query_vector: List[float] = None) -> List[str]:
+        """Find relevant context for a query, scoped to one project when project_id is given."""
+        if query_vector is None:
+            query_vector = self.embed_text(query)
 
-        
-        params = {
-            "query_embedding": query_vector,
-            "match_threshold": 0.0, # Debug: Lowered to catch any match
-            "match_count": limit
-        }
-        
         try:
-            res = supabase.rpc("match_documents", params).execute()
-            return [item['content'] for item in res.data]
+            with span("rag.search"):
+                return self.store.search(query_vector, limit, project_id)
         except Exception as e:
             print(f"RAG Retrieval Error: {e}")
             return []
@@ -0,0 +1,118 @@
+import os
+from typing import Callable, Dict, Iterator, List
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+ROW_DIFF_PAGE_SIZE = int(os.getenv("ROW_DIFF_PAGE_SIZE", "1000"))
+# Ids per ... WHERE id IN (...) request (deletes and lookups); kept small so the request URL stays short
+ROW_DIFF_DELETE_BATCH = int(os.getenv("ROW_DIFF_DELETE_BATCH", "100"))
+
+# Incremental re-ingestion: a stored row's id is derived from its content (and from how many
+# identical rows came before it in the upload), so uploading the same data again reproduces
+# the same ids. Comparing those with the ids already stored tells which rows were added
+# and which were removed; unchanged rows are neither rewritten nor re-embedded.
+
+# 16-character keys for the two halves of a 128-bit row id. A hash key only changes how
+# text is hashed, so rows are hashed in their string form, once with each key.
+_ID_KEYS = ("riskpilot-rowid1", "riskpilot-rowid2")
+
+
+def _namespace_hash(namespace: str) -> np.uint64:
+    return pd.util.hash_array(np.array([namespace], dtype=object))[0]
+
+
+def _format_uuid(hex32: str) -> str:
+    # Same text as str(uuid.UUID(hex=...)) without building UUID objects
+    return f"{hex32[:8]}-{hex32[8:12]}-{hex32[12:16]}-{hex32[16:20]}-{hex32[20:]}"
+
+
+def fetch_rows(query: Callable, page_size: int = ROW_DIFF_PAGE_SIZE) -> Iterator[Dict]:
+    """
+    Every row returned by `query()` (a fresh .select(...) builder per call), read page by page.
+    Pages are ordered by id: without an order Postgres may return rows in a different order
+    for each page, so some would be skipped and others read twice.
+    """
+    offset = 0
+    while True:
+        rows = query().order("id").range(offset, offset + page_size - 1).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def fetch_ids(query: Callable, page_size: int = ROW_DIFF_PAGE_SIZE) -> set:
+    """Every id returned by `query()` (a fresh .select("id")... builder per call)."""
+    return {str(row["id"]) for row in fetch_rows(query, page_size)}
+
+
+def existing_ids(get_client: Callable, table: str, ids: List[str], batch_size: int = ROW_DIFF_DELETE_BATCH) -> set:
+    """Which of `ids` are already stored in `table`."""
+    found = set()
+    for start in range(0, len(ids), batch_size):
+        rows = get_client().table(table).select("id").in_("id", ids[start:start + batch_size]).execute().data or []
+        found.update(str(row["id"]) for row in rows)
+    return found
+
+
+def delete_ids(get_client: Callable, table: str, ids: List[str], batch_size: int = ROW_DIFF_DELETE_BATCH) -> int:
+    for start in range(0, len(ids), batch_size):
+        get_client().table(table).delete().in_("id", ids[start:start + batch_size]).execute()
+    return len(ids)
+
+
+class RowDiff:
+    """
+    Compares an upload, streamed chunk by chunk, with the row ids already stored for it.
+    Call ids() on each chunk, new_mask() to pick the rows to write, and removed() at the
+    end for the stored rows the upload no longer contains.
+    """
+
+    def __init__(self, namespace: str, existing_ids=()):
+        self.namespace = _namespace_hash(namespace)
+        self.existing = set(existing_ids)
+        self.kept = set()
+        self.added = 0
+        self._occurrences: Dict[int, int] = {}
+
+    def ids(self, frame: pd.DataFrame) -> List[str]:
+        """
+        One stable uuid per row of `frame`, from its values, its columns and the namespace.
+        Values are compared as text, so 100 and "100" give the same id; pass the raw cell text
+        of uploads (see iter_csv_chunks) rather than dtype-inferred values.
+        """
+        if frame.empty:
+            return []
+        header = _namespace_hash("\x1f".join(map(str, frame.columns)))
+        text = frame.astype("string")
+        hashes = pd.util.hash_pandas_object(text, index=False, hash_key=_ID_KEYS[0]).to_numpy() ^ self.namespace ^ header
+        second = pd.util.hash_pandas_object(text, index=False, hash_key=_ID_KEYS[1]).to_numpy() ^ self.namespace ^ header
+
+        # Identical rows are legitimate (e.g. repeated payments), so number them by occurrence
+        occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+        prior = np.fromiter((self._occurrences.get(h, 0) for h in hashes.tolist()), dtype=np.int64, count=len(hashes))
+        occurrence = occurrence + prior
+        unique, counts = np.unique(hashes, return_counts=True)
+        for h, n in zip(unique.tolist(), counts.tolist()):
+            self._occurrences[h] = self._occurrences.get(h, 0) + n
+
+        high = pd.util.hash_pandas_object(pd.DataFrame({"row": hashes, "occurrence": occurrence}), index=False).to_numpy()
+        low = pd.util.hash_pandas_object(pd.DataFrame({"row": second, "occurrence": occurrence}), index=False).to_numpy()
+        return [_format_uuid(f"{a:016x}{b:016x}") for a, b in zip(high.tolist(), low.tolist())]
+
+    def new_mask(self, ids: List[str]) -> np.ndarray:
+        """True for rows not stored yet; stored ones are remembered as unchanged."""
+        mask = np.fromiter((i not in self.existing for i in ids), dtype=bool, count=len(ids))
+        self.kept.update(i for i, new in zip(ids, mask) if not new)
+        self.added += int(mask.sum())
+        return mask
+
+    def removed(self) -> List[str]:
+        return list(self.existing - self.kept)
+
+    def summary(self) -> Dict:
+        return {"added": self.added, "removed": len(self.existing - self.kept), "unchanged": len(self.kept)}
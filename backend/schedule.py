@@ -0,0 +1,107 @@
+import os
+from datetime import datetime
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from backend.parsers import extract_milestones
+
+load_dotenv()
+
+# --- Configuration ---
+# Projects whose projected finish lands within this many days past the deadline are "at_risk" rather than "late"
+SCHEDULE_AT_RISK_DAYS = int(os.getenv("SCHEDULE_AT_RISK_DAYS", "14"))
+
+SCHEDULE_COLUMNS = ["name", "start_date", "deadline", "progress", "days_to_deadline", "milestones_total",
+                    "milestones_due", "milestones_overdue", "next_milestone", "next_milestone_date",
+                    "projected_completion", "variance_days", "status"]
+
+
+def compute_schedule(df: pd.DataFrame, as_of: datetime = None) -> pd.DataFrame:
+    """
+    Schedule variance for every project in one vectorized pass.
+
+    - milestones_due: milestones dated on or before `as_of`
+    - milestones_overdue: due milestones not covered by the reported progress
+      (progress% of all milestones are assumed done; with no progress column, none are)
+    - projected_completion: with progress, start + elapsed / progress; otherwise the deadline
+      pushed back by how long the oldest overdue milestone has been waiting
+    """
+    as_of = pd.Timestamp(as_of or datetime.now().date())
+    n = len(df)
+    out = pd.DataFrame(index=df.index)
+    out["name"] = df["name"] if "name" in df.columns else pd.Series(range(n), index=df.index).astype(str)
+    start = pd.to_datetime(df["start_date"], errors="coerce") if "start_date" in df.columns else pd.Series(pd.NaT, index=df.index)
+    deadline = pd.to_datetime(df["deadline"], errors="coerce") if "deadline" in df.columns else pd.Series(pd.NaT, index=df.index)
+    progress_col = next((c for c in ("current_progress", "progress") if c in df.columns), None)
+    progress = (pd.to_numeric(df[progress_col], errors="coerce") if progress_col
+                else pd.Series(np.nan, index=df.index)).clip(0, 100)
+
+    milestones = extract_milestones(df["milestones"]) if "milestones" in df.columns else extract_milestones(pd.Series([], dtype="string"))
+    milestones = milestones[milestones["row"].isin(df.index)]
+    due = milestones["date"] <= as_of
+    grouped = milestones.groupby("row")
+    total = grouped.size().reindex(df.index, fill_value=0)
+    due_count = due.groupby(milestones["row"]).sum().reindex(df.index, fill_value=0)
+
+    done_estimate = np.floor(progress.fillna(0) / 100 * total)
+    overdue = (due_count - done_estimate).clip(lower=0).astype(int)
+
+    # Oldest due milestone that progress does not cover: the (done_estimate + 1)-th milestone by date
+    ranked = milestones.sort_values(["row", "date"], kind="stable")
+    ranked["rank"] = ranked.groupby("row").cumcount()
+    ranked["done"] = done_estimate.reindex(ranked["row"]).to_numpy()
+    first_open = ranked[ranked["rank"] == ranked["done"]].set_index("row")["date"]
+    oldest_overdue = first_open.reindex(df.index).where(overdue > 0)
+
+    upcoming = milestones[~due].sort_values("date", kind="stable").drop_duplicates("row").set_index("row")
+    next_name = upcoming["name"].reindex(df.index)
+    next_date = upcoming["date"].reindex(df.index)
+
+    elapsed_days = (as_of - start).dt.days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        velocity_finish = start + pd.to_timedelta(elapsed_days / (progress / 100), unit="D")
+    velocity_finish = velocity_finish.where((progress > 0) & (progress < 100) & (elapsed_days > 0))
+    slip = (as_of - oldest_overdue).dt.days.fillna(0)
+    slip_finish = (deadline + pd.to_timedelta(slip, unit="D")).where(deadline.notna())
+    slip_finish = slip_finish.where(~((slip_finish < as_of) & (progress.fillna(0) < 100)), as_of)
+    projected = velocity_finish.fillna(slip_finish)
+
+    variance = (projected - deadline).dt.days
+    status = np.select(
+        [progress >= 100, variance.isna(), variance <= 0, variance <= SCHEDULE_AT_RISK_DAYS],
+        ["complete", "unknown", "on_track", "at_risk"],
+        default="late",
+    )
+
+    out["start_date"] = start.dt.date
+    out["deadline"] = deadline.dt.date
+    out["progress"] = progress
+    out["days_to_deadline"] = (deadline - as_of).dt.days
+    out["milestones_total"] = total.astype(int)
+    out["milestones_due"] = due_count.astype(int)
+    out["milestones_overdue"] = overdue
+    out["next_milestone"] = next_name
+    out["next_milestone_date"] = next_date.dt.date
+    out["projected_completion"] = projected.dt.date
+    out["variance_days"] = variance
+    out["status"] = status
+    return out[SCHEDULE_COLUMNS]
+
+
+def schedule_to_records(schedule: pd.DataFrame) -> List[Dict]:
+    records = schedule.astype(object)
+    records = records.where(pd.notna(records), None)
+    for col in ("start_date", "deadline", "next_milestone_date", "projected_completion"):
+        records[col] = records[col].map(lambda d: d.isoformat() if d is not None else None)
+    return records.to_dict("records")
+
+
+def summarize_schedule(schedule: pd.DataFrame, top_n: int = 10) -> str:
+    """Portfolio counts plus the worst slippages for the ProjectTrackingAgent prompt."""
+    if schedule.empty:
+        return "No schedule data available."
+    counts = schedule["status"].value_counts().to_dict()
+    worst = schedule.sort_values("variance_days", ascending=False, na_position="last").head(top_n)
+    cols = ["name", "deadline", "milestones_overdue", "projected_completion", "variance_days", "status"]
+    return f"Computed schedule status: {counts}\n{worst[cols].to_string(index=False)}"
@@ -0,0 +1,179 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Dict, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+# "pgvector" (default) ranks rows inside Postgres via RPC,
+# "local" keeps a per-project matrix of embeddings in process memory.
+RAG_BACKEND = os.getenv("RAG_BACKEND", "pgvector").lower()
+LOCAL_INDEX_BUDGET_MB = float(os.getenv("RAG_LOCAL_INDEX_MB", "256"))
+
+
+class PGVectorStore:
+    """Rank documents with the match_* RPCs defined in supabase_schema.sql."""
+
+    def __init__(self, get_client: Callable):
+        self.get_client = get_client
+
+    def search(self, query_vector: List[float], limit: int, project_id: Optional[str] = None) -> List[str]:
+        params = {
+            "query_embedding": query_vector,
+            "match_threshold": 0.0, # Debug: Lowered to catch any match
+            "match_count": limit
+        }
+        rpc_name = "match_documents"
+        if project_id:
+            params["filter_project_id"] = str(project_id)
+            rpc_name = "match_project_documents"
+
+        res = self.get_client().rpc(rpc_name, params).execute()
+        return [item['content'] for item in res.data]
+
+    def add(self, project_id: str, contents: List[str], vectors: List[List[float]]):
+        """Rows are already in the documents table; nothing to keep in sync."""
+        pass
+
+    def drop(self, project_id: str):
+        pass
+
+
+class _ProjectMatrix:
+    """Row-normalized float32 embeddings for one project plus their contents."""
+
+    def __init__(self, contents: List[str], vectors, dims: int = 384):
+        self.contents = list(contents)
+        if self.contents:
+            self.matrix = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(self.contents), -1))
+        else:
+            self.matrix = np.empty((0, dims), dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def append(self, contents: List[str], vectors):
+        new = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(contents), -1))
+        self.matrix = np.vstack([self.matrix, new])
+        self.contents.extend(contents)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _parse_embedding(raw) -> List[float]:
+    # PostgREST returns pgvector columns as their text form, e.g. "[0.1,0.2,...]"
+    return json.loads(raw) if isinstance(raw, str) else raw
+
+
+class LocalVectorStore:
+    """
+    In-process per-project vector index.
+    A project's embeddings are pulled from the documents table on first search,
+    ranked with one matrix-vector product, and evicted least-recently-used once
+    the total matrix size passes the memory budget.
+    """
+
+    def __init__(self, get_client: Callable, budget_mb: float = LOCAL_INDEX_BUDGET_MB, page_size: int = 1000):
+        self.get_client = get_client
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.page_size = page_size
+        self.fallback = PGVectorStore(get_client)
+        self._projects: "OrderedDict[str, _ProjectMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, project_id: str) -> _ProjectMatrix:
+        contents, vectors = [], []
+        offset = 0
+        while True:
+            res = (self.get_client().table("documents")
+                   .select("content, embedding")
+                   .eq("metadata->>project_id", project_id)
+                   .order("id")
+                   .range(offset, offset + self.page_size - 1)
+                   .execute())
+            rows = res.data or []
+            for row in rows:
+                contents.append(row["content"])
+                vectors.append(_parse_embedding(row["embedding"]))
+            if len(rows) < self.page_size:
+                break
+            offset += self.page_size
+        print(f"Loaded local vector index for project {project_id}: {len(contents)} rows")
+        return _ProjectMatrix(contents, vectors)
+
+    def _get(self, project_id: str) -> _ProjectMatrix:
+        with self._lock:
+            entry = self._projects.get(project_id)
+            if entry is not None:
+                self._projects.move_to_end(project_id)
+                return entry
+
+        entry = self._load(project_id)
+        with self._lock:
+            self._projects[project_id] = entry
+            self._projects.move_to_end(project_id)
+            self._evict()
+        return entry
+
+    def _evict(self):
+        total = sum(m.nbytes for m in self._projects.values())
+        # Always keep the most recent project, even if it alone exceeds the budget
+        while total > self.budget_bytes and len(self._projects) > 1:
+            project_id, entry = self._projects.popitem(last=False)
+            total -= entry.nbytes
+            print(f"Evicted local vector index for project {project_id}")
+
+    def search(self, query_vector: List[float], limit: int, project_id: Optional[str] = None) -> List[str]:
+        if not project_id:
+            return self.fallback.search(query_vector, limit)
+
+        entry = self._get(str(project_id))
+        if not entry.contents:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = entry.matrix @ query
+        k = min(limit, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [entry.contents[i] for i in top]
+
+    def add(self, project_id: str, contents: List[str], vectors: List[List[float]]):
+        """Append freshly ingested rows if the project is resident; otherwise the next search loads them."""
+        if not contents:
+            return
+        with self._lock:
+            entry = self._projects.get(str(project_id))
+            if entry is not None:
+                entry.append(contents, vectors)
+                self._evict()
+
+    def drop(self, project_id: str):
+        with self._lock:
+            self._projects.pop(str(project_id), None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "projects": len(self._projects),
+                "bytes": sum(m.nbytes for m in self._projects.values()),
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+def create_vector_store(get_client: Callable, backend: str = RAG_BACKEND):
+    if backend == "local":
+        return LocalVectorStore(get_client)
+    if backend != "pgvector":
+        print(f"Unknown RAG_BACKEND '{backend}', falling back to pgvector")
+    return PGVectorStore(get_client)
@@ -0,0 +1,124 @@
+"""
+Trade-off between the RAG chunking strategies in backend/chunking.py: how many vectors
+each one stores for a synthetic financial ledger, and how well the stored documents
+answer two kinds of question.
+
+  row hit@k       "Gemini API Credits approved by Bob Smith on 2024-01-20": does one of the
+                  top k documents contain that exact row?
+  group cover@k   "How much was spent on Contractor?": what share of the category's rows do
+                  the top k documents cover (a summary document covers its whole group)?
+
+Usage (from the repo root):
+    python -m benchmarks.bench_chunking
+    python -m benchmarks.bench_chunking --rows 100000 --strategies window summary --k 5
+    python -m benchmarks.bench_chunking --embedder hashing   # offline, no model download
+
+--embedder model uses the same SentenceTransformer as the API. --embedder hashing is a
+deterministic bag-of-words stand-in (truncated at the model's 256-token limit) for machines
+without the model; it only reflects lexical overlap, so use it to compare vector counts and
+rough trends, not absolute quality.
+"""
+import argparse
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from backend.chunking import CHUNKERS, RAG_CHUNK_ROWS, create_chunker, covers
+from backend.ingestion import UPLOAD_CHUNK_ROWS
+from benchmarks.synthetic import CATEGORIES, financials
+
+DIMS = 384
+MODEL_MAX_TOKENS = 256
+
+
+def build_documents(df: pd.DataFrame, strategy: str, window_rows: int):
+    chunker = create_chunker(strategy, "Financials", df.columns, rows=window_rows)
+    documents = []
+    for start in range(0, len(df), UPLOAD_CHUNK_ROWS):
+        documents.extend(chunker.add(df.iloc[start:start + UPLOAD_CHUNK_ROWS]))
+    return documents + chunker.finish()
+
+
+def hashing_embed(texts):
+    """Signed feature hashing of lower-cased words, L2-normalised."""
+    matrix = np.zeros((len(texts), DIMS), dtype=np.float32)
+    for i, text in enumerate(texts):
+        words = text.lower().replace(",", " ").split()[:MODEL_MAX_TOKENS]
+        for word in words:
+            h = zlib.crc32(word.encode())
+            matrix[i, h % DIMS] += 1.0 if h & 0x80000000 else -1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def model_embed(texts):
+    from backend.rag import get_model
+    return np.asarray(get_model().encode(texts, batch_size=64, normalize_embeddings=True), dtype=np.float32)
+
+
+def top_k(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ matrix.T
+    k = min(k, matrix.shape[0])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, best, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(best, order, axis=1)
+
+
+def group_coverage(documents, hits, category: str, category_rows: np.ndarray) -> float:
+    covered = set()
+    for doc_index in hits:
+        meta = documents[doc_index]["metadata"]
+        group = meta.get("group", {})
+        if meta["chunker"] == "summary":
+            if group.get("value") == category:
+                return 1.0
+            continue
+        for first, last in meta["rows"]:
+            covered.update(range(first, last + 1))
+    return len(covered.intersection(category_rows.tolist())) / len(category_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--strategies", nargs="+", default=list(CHUNKERS), choices=CHUNKERS)
+    parser.add_argument("--window-rows", type=int, default=RAG_CHUNK_ROWS)
+    parser.add_argument("--queries", type=int, default=200, help="row lookups to sample")
+    parser.add_argument("--k", type=int, default=3, help="documents retrieved per question (RAGSystem.retrieve uses 3)")
+    parser.add_argument("--embedder", choices=["model", "hashing"], default="model")
+    args = parser.parse_args()
+
+    embed = model_embed if args.embedder == "model" else hashing_embed
+    df = financials(args.rows)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(df), size=min(args.queries, len(df)), replace=False)
+    row_queries = [f"{df.at[i, 'description']} approved by {df.at[i, 'approved_by']} on {df.at[i, 'date']}"
+                   for i in sample]
+    group_queries = [f"How much was spent on {category}?" for category in CATEGORIES]
+    query_vectors = embed(row_queries + group_queries)
+    category_rows = {c: np.flatnonzero(df["category"].to_numpy() == c) for c in CATEGORIES}
+
+    print(f"{args.rows} rows, k={args.k}, embedder={args.embedder}")
+    print(f"{'strategy':<10}{'vectors':>10}{'per 1k rows':>13}{'avg chars':>11}{'chunk s':>9}"
+          f"{'embed s':>9}{'row hit@k':>11}{'group cover@k':>15}")
+    for strategy in args.strategies:
+        start = time.perf_counter()
+        documents = build_documents(df, strategy, args.window_rows)
+        chunk_s = time.perf_counter() - start
+        start = time.perf_counter()
+        matrix = embed([d["text"] for d in documents])
+        embed_s = time.perf_counter() - start
+
+        hits = top_k(matrix, query_vectors, args.k)
+        row_hits = np.mean([any(covers(documents[d]["metadata"], int(row)) for d in found)
+                            for row, found in zip(sample, hits[:len(sample)])])
+        cover = np.mean([group_coverage(documents, found, category, category_rows[category])
+                         for category, found in zip(CATEGORIES, hits[len(sample):])])
+        avg_chars = np.mean([len(d["text"]) for d in documents])
+        print(f"{strategy:<10}{len(documents):>10}{1000 * len(documents) / args.rows:>13.1f}{avg_chars:>11.0f}"
+              f"{chunk_s:>9.2f}{embed_s:>9.2f}{row_hits:>11.2%}{cover:>15.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare the old per-row (iterrows) record conversion from init_chat with the
+column-wise conversion in backend/columnar.py.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_columnar
+    python -m benchmarks.bench_columnar --sizes 10000 100000 --skip-legacy-above 100000
+"""
+import argparse
+import ast
+import time
+import uuid
+from datetime import datetime
+import pandas as pd
+from backend.columnar import financial_frame, employee_frame, iter_record_batches
+
+TEST_FILES = "test_files"
+
+
+def legacy_financial(fin_df: pd.DataFrame, project_id: str):
+    """The original iterrows loop from init_chat, kept here as the baseline."""
+    fin_records = []
+    total_spend = 0.0
+    for _, row in fin_df.iterrows():
+        amt = pd.to_numeric(row.get('amount', 0), errors='coerce')
+        if pd.isna(amt): amt = 0.0
+        total_spend += float(amt)
+        fin_records.append({
+            "project_id": str(project_id),
+            "date": row.get('date', datetime.now().date().isoformat()),
+            "category": row.get('category', 'Uncategorized'),
+            "amount": float(amt),
+            "description": row.get('description', ''),
+            "approved_by": row.get('approved_by', ''),
+            "budget_category": row.get('budget_category', '')
+        })
+    return fin_records, total_spend
+
+
+def legacy_employees(emp_df: pd.DataFrame):
+    emp_records = []
+    for _, row in emp_df.iterrows():
+        skills_list = []
+        raw_skills = row.get('skills', '[]')
+        try:
+            if isinstance(raw_skills, str):
+                skills_list = ast.literal_eval(raw_skills)
+        except:
+            skills_list = []
+        emp_records.append({
+            "id": str(row.get('id', uuid.uuid4())),
+            "name": row.get('name', 'Unknown'),
+            "role": row.get('role', 'Unknown'),
+            "department": row.get('department', 'Unknown'),
+            "join_date": row.get('join_date', None),
+            "skills": skills_list
+        })
+    return emp_records
+
+
+def columnar_financial(fin_df: pd.DataFrame, project_id: str):
+    frame, total = financial_frame(fin_df, project_id)
+    records = [r for batch in iter_record_batches(frame) for r in batch]
+    return records, total
+
+
+def columnar_employees(emp_df: pd.DataFrame):
+    return [r for batch in iter_record_batches(employee_frame(emp_df)) for r in batch]
+
+
+def scale(df: pd.DataFrame, rows: int) -> pd.DataFrame:
+    reps = -(-rows // len(df))
+    out = pd.concat([df] * reps, ignore_index=True).iloc[:rows].copy()
+    if "id" in out.columns:
+        out["id"] = [f"E{i:07d}" for i in range(rows)]
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--skip-legacy-above", type=int, default=None,
+                        help="don't time the iterrows path above this many rows (it takes minutes at 1M)")
+    args = parser.parse_args()
+
+    fin_base = pd.read_csv(f"{TEST_FILES}/financials.csv")
+    emp_base = pd.read_csv(f"{TEST_FILES}/employees.csv")
+    project_id = str(uuid.uuid4())
+
+    print(f"{'dataset':<12}{'rows':>10}{'legacy s':>12}{'columnar s':>12}{'speedup':>10}")
+    for rows in args.sizes:
+        for name, base, legacy, columnar in (
+            ("financials", fin_base, lambda d: legacy_financial(d, project_id), lambda d: columnar_financial(d, project_id)),
+            ("employees", emp_base, legacy_employees, columnar_employees),
+        ):
+            df = scale(base, rows)
+            col_s, col_out = timed(columnar, df)
+            if args.skip_legacy_above is not None and rows > args.skip_legacy_above:
+                print(f"{name:<12}{rows:>10}{'skipped':>12}{col_s:>12.3f}{'-':>10}")
+                continue
+            leg_s, leg_out = timed(legacy, df)
+            if name == "financials":
+                assert abs(leg_out[1] - col_out[1]) < 1e-6 * max(1.0, abs(leg_out[1])), "total spend differs"
+                assert len(leg_out[0]) == len(col_out[0])
+            else:
+                assert leg_out[0] == col_out[0], "employee records differ"
+            print(f"{name:<12}{rows:>10}{leg_s:>12.3f}{col_s:>12.3f}{leg_s / col_s:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
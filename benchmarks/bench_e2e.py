@@ -0,0 +1,323 @@
+"""
+Offline end-to-end benchmark of the API: runs backend.main.app in-process against the
+deterministic fakes in benchmarks/fakes.py (Supabase, Groq, Redis, embedding model) and
+synthetic uploads from benchmarks/synthetic.py, then reports as JSON:
+
+  init   per-stage seconds and peak RSS of the /chat/init job, polled through /jobs/{id}
+         (with --reupload, a second init of the same files measures the incremental path)
+  chat   per-turn latency of /chat/continue, including a repeated question (cache hit)
+
+Backend logs go to stderr (or nowhere with --quiet) so stdout is only the JSON report,
+which is meant to be diffed between releases. Peak RSS includes the fake database's rows;
+large tables keep only the columns the backend reads back (see KEEP_COLUMNS).
+
+Needs fastapi, httpx, groq and redis installed (no services running).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_e2e > bench.json
+    python -m benchmarks.bench_e2e --sizes 10000 100000 --turns 10 --llm-first-token-ms 500
+    python -m benchmarks.bench_e2e --sizes 1000000 --reupload --output bench-1m.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.fakes import Latency, FakeSupabase, FakeGroq, FakeRedis, FakeEmbeddingModel
+from benchmarks.synthetic import write_uploads
+
+# Columns kept for the bulk tables: what the backend selects or filters on
+KEEP_COLUMNS = {
+    "documents": ["id", "content", "metadata"],
+    "financial_records": ["id", "project_id"],
+    "employees": ["id", "name"],
+    "employee_risk_scores": ["project_id", "employee_id", "attrition_score"],
+}
+
+CHAT_MESSAGES = [
+    "Summarize the top risks for this project.",
+    "Which employees are most likely to leave?",
+    "Are there any spending anomalies?",
+    "Which milestones are slipping?",
+    "What should we do first?",
+]
+
+UPLOAD_FIELDS = {"projects": "project_file", "employees": "employee_file", "financials": "financial_file"}
+
+
+def current_rss() -> int:
+    """Resident set size in bytes (from /proc on Linux, else the process peak so far)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemorySampler:
+    """Samples RSS every `interval` seconds on a background thread; peak() answers for any time window."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append((time.time(), current_rss()))
+            time.sleep(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def peak(self, start: float, end: float) -> float:
+        # The last sample before `start` stands in for windows shorter than the interval
+        before = [rss for t, rss in self.samples if t < start][-1:]
+        values = before + [rss for t, rss in self.samples if start <= t <= end]
+        return _mb(max(values)) if values else None
+
+
+def _mb(size: int) -> float:
+    return round(size / (1024 * 1024), 1)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+
+def install_fakes(args, workdir: str) -> Dict:
+    """
+    Point the backend at the fakes. Must run before backend.main is imported: settings are
+    read from the environment at import time and agents bind groq.Groq when imported.
+    """
+    latency = Latency(db_ms=args.db_ms, db_ms_per_row=args.db_ms_per_row, redis_ms=args.redis_ms,
+                      llm_first_token_ms=args.llm_first_token_ms, llm_ms_per_token=args.llm_ms_per_token,
+                      embed_ms_per_text=args.embed_ms_per_text)
+    keep = dict(KEEP_COLUMNS)
+    if args.keep_embeddings:
+        keep["documents"] = keep["documents"] + ["embedding"]
+    fakes = {
+        "supabase": FakeSupabase(latency, keep),
+        "groq": FakeGroq(latency=latency, output_tokens=args.llm_output_tokens,
+                         rate_limit_every=args.llm_rate_limit_every),
+        "redis": FakeRedis(latency),
+        "embeddings": FakeEmbeddingModel(latency=latency),
+    }
+    os.environ.update({
+        "SUPABASE_URL": "http://fake-supabase.local",
+        "SUPABASE_KEY": "benchmark",
+        "GROQ_API_KEY": "benchmark",
+        "REDIS_URL": "redis://fake-redis.local:6379/0",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "JOB_UPLOAD_DIR": workdir,
+        "JOB_QUEUE_BACKEND": args.job_queue,
+        "LLM_REQUESTS_PER_MINUTE": str(args.llm_rpm),
+        "LLM_TOKENS_PER_MINUTE": str(args.llm_tpm),
+    })
+
+    import groq
+    import redis
+    groq.Groq = lambda *a, **kw: fakes["groq"]
+    redis.from_url = lambda *a, **kw: fakes["redis"]
+
+    import backend.rag as rag
+    rag._supabase = fakes["supabase"]
+    rag._model = fakes["embeddings"]
+    return fakes
+
+
+def _reset_counters(fakes: Dict):
+    fakes["supabase"].calls.clear()
+    fakes["supabase"].rows_sent.clear()
+    fakes["groq"].calls.clear()
+    fakes["groq"].tokens.clear()
+    fakes["redis"].calls.clear()
+
+
+def run_init(client, project_id: str, paths: Dict[str, str], sampler: MemorySampler, poll: float) -> Dict:
+    start_wall, start = time.time(), time.perf_counter()
+    handles = {kind: open(path, "rb") for kind, path in paths.items()}
+    try:
+        response = client.post(f"/chat/init/{project_id}", files={
+            UPLOAD_FIELDS[kind]: (os.path.basename(paths[kind]), handle, "text/csv")
+            for kind, handle in handles.items()})
+    finally:
+        for handle in handles.values():
+            handle.close()
+    accepted = time.perf_counter() - start
+    if response.status_code != 202:
+        raise RuntimeError(f"/chat/init returned {response.status_code}: {response.text[:500]}")
+
+    job_id = response.json()["job_id"]
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(poll)
+    end_wall = time.time()
+
+    stages = {}
+    for stage in job["stages"]:
+        started, finished = stage["started_at"], stage["finished_at"]
+        stages[stage["name"]] = {
+            "status": stage["status"],
+            "seconds": round(finished - started, 3) if started and finished else None,
+            "peak_rss_mb": sampler.peak(started, finished) if started and finished else None,
+            "detail": stage["detail"],
+        }
+    return {
+        "status": job["status"],
+        "error": job["error"],
+        "accept_seconds": round(accepted, 3),
+        "total_seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": sampler.peak(start_wall, end_wall),
+        "stages": stages,
+        "changes": (job.get("result") or {}).get("changes"),
+    }
+
+
+def run_chat(client, project_id: str, turns: int) -> Dict:
+    # The last turn repeats the first question, so the cached path is measured too
+    messages = [CHAT_MESSAGES[i % len(CHAT_MESSAGES)] for i in range(max(0, turns - 1))] + CHAT_MESSAGES[:1]
+    results = []
+    for message in messages[:turns]:
+        start = time.perf_counter()
+        response = client.post(f"/chat/continue/{project_id}", json={"message": message})
+        seconds = time.perf_counter() - start
+        cached = response.status_code == 200 and response.json()["response"].startswith("(Cached)")
+        results.append({"message": message, "status": response.status_code, "seconds": round(seconds, 4),
+                        "cached": cached})
+    latencies = [r["seconds"] for r in results if r["status"] == 200 and not r["cached"]]
+    return {
+        "turns": results,
+        "uncached_mean_seconds": round(float(np.mean(latencies)), 4) if latencies else None,
+        "uncached_p50_seconds": _percentile(latencies, 50),
+        "uncached_p95_seconds": _percentile(latencies, 95),
+    }
+
+
+def run_size(client, fakes: Dict, rows: int, args, sampler: MemorySampler, workdir: str) -> Dict:
+    directory = os.path.join(workdir, f"uploads-{rows}")
+    start = time.perf_counter()
+    paths = write_uploads(directory, rows, args.project_rows, seed=args.seed)
+    generate_seconds = time.perf_counter() - start
+    gc.collect()
+    _reset_counters(fakes)
+
+    project = client.post("/projects", json={"name": f"Benchmark {rows}", "budget": 1_000_000}).json()
+    report = {
+        "rows": rows,
+        "upload_bytes": {kind: os.path.getsize(path) for kind, path in paths.items()},
+        "generate_seconds": round(generate_seconds, 3),
+        "baseline_rss_mb": _mb(current_rss()),
+        "init": run_init(client, project["id"], paths, sampler, args.poll),
+    }
+    if args.reupload:
+        report["reinit"] = run_init(client, project["id"], paths, sampler, args.poll)
+    report["chat"] = run_chat(client, project["id"], args.turns)
+    report["services"] = {"supabase": fakes["supabase"].stats(), "groq": fakes["groq"].stats(),
+                          "redis": fakes["redis"].stats()}
+    report["llm_scheduler"] = client.get("/llm/stats").json()
+
+    shutil.rmtree(directory, ignore_errors=True)
+    # Each size starts from an empty database, so earlier sizes do not inflate its memory
+    fakes["supabase"].tables.clear()
+    gc.collect()
+    return report
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="rows per upload (employees and financials)")
+    parser.add_argument("--project-rows", type=int, default=None, help="rows in the projects upload (default: same)")
+    parser.add_argument("--turns", type=int, default=6, help="chat turns per size, the last one a repeat")
+    parser.add_argument("--reupload", action="store_true", help="init a second time with the same files")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--poll", type=float, default=0.05, help="job status poll interval (s)")
+    parser.add_argument("--job-queue", choices=["local", "redis"], default="local")
+    parser.add_argument("--db-ms", type=float, default=Latency.db_ms)
+    parser.add_argument("--db-ms-per-row", type=float, default=Latency.db_ms_per_row)
+    parser.add_argument("--redis-ms", type=float, default=Latency.redis_ms)
+    parser.add_argument("--llm-first-token-ms", type=float, default=Latency.llm_first_token_ms)
+    parser.add_argument("--llm-ms-per-token", type=float, default=Latency.llm_ms_per_token)
+    parser.add_argument("--llm-output-tokens", type=int, default=200)
+    parser.add_argument("--llm-rate-limit-every", type=int, default=0, help="fail every Nth LLM request with a 429")
+    parser.add_argument("--llm-rpm", type=int, default=100_000, help="LLM_REQUESTS_PER_MINUTE for the scheduler")
+    parser.add_argument("--llm-tpm", type=int, default=100_000_000, help="LLM_TOKENS_PER_MINUTE for the scheduler")
+    parser.add_argument("--embed-ms-per-text", type=float, default=Latency.embed_ms_per_text)
+    parser.add_argument("--keep-embeddings", action="store_true",
+                        help="store document embeddings so retrieval ranks by similarity (memory heavy)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--quiet", action="store_true", help="discard backend logs instead of sending them to stderr")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="riskpilot-bench-")
+    fakes = install_fakes(args, workdir)
+    sampler = MemorySampler().start()
+    log = open(os.devnull, "w") if args.quiet else sys.stderr
+    try:
+        with contextlib.redirect_stdout(log):
+            from fastapi.testclient import TestClient
+            import pandas as pd
+            from backend.main import app
+            from backend.ingestion import UPLOAD_CHUNK_ROWS
+            from backend.chunking import RAG_CHUNKER
+
+            report = {
+                "meta": {
+                    "git_commit": _git_commit(),
+                    "python": platform.python_version(),
+                    "pandas": pd.__version__,
+                    "platform": platform.platform(),
+                    "upload_chunk_rows": UPLOAD_CHUNK_ROWS,
+                    "rag_chunker": RAG_CHUNKER,
+                    "latency_ms": vars(fakes["supabase"].latency),
+                    "llm_output_tokens": args.llm_output_tokens,
+                    "job_queue": args.job_queue,
+                },
+                "runs": [],
+            }
+            with TestClient(app) as client:
+                for rows in args.sizes:
+                    print(f"=== Benchmark: {rows} rows ===")
+                    report["runs"].append(run_size(client, fakes, rows, args, sampler, workdir))
+    finally:
+        sampler.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2, sort_keys=True, default=str)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+Deterministic in-process stand-ins for the services the backend talks to, for offline
+benchmarks: a Supabase/PostgREST client, a Groq client, a Redis client and the
+sentence-transformers model. Each one sleeps for a configurable latency per call so
+round trips cost roughly what they would over the network, and counts its calls.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from itertools import islice
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import numpy as np
+
+
+@dataclass
+class Latency:
+    """Simulated service latencies, in milliseconds."""
+    db_ms: float = 5.0               # per Supabase request
+    db_ms_per_row: float = 0.01      # per row sent or returned
+    redis_ms: float = 0.5            # per Redis command
+    llm_first_token_ms: float = 300.0
+    llm_ms_per_token: float = 5.0    # per generated token
+    embed_ms_per_text: float = 0.0   # per text encoded
+
+
+def _sleep(ms: float):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# --- Supabase ---
+
+# Primary keys and column defaults from supabase_schema.sql
+PRIMARY_KEYS = {"conversation_summaries": ("project_id",), "employee_risk_scores": ("project_id", "employee_id")}
+DEFAULTS = {
+    "projects": lambda: {"current_progress": 0.0, "actual_spend": 0.0, "created_at": _now()},
+    "chat_history": lambda: {"timestamp": _now()},
+    "conversation_summaries": lambda: {"updated_at": _now()},
+}
+
+
+def _value(row: Dict, column: str):
+    if "->>" in column:
+        column, key = column.split("->>", 1)
+        value = (row.get(column) or {}).get(key)
+        return None if value is None else str(value)
+    return row.get(column)
+
+
+def _text(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+class _Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    """The subset of the postgrest query builder the backend uses."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.ordering = None
+        self.bounds = None
+        self.max_rows = None
+
+    def select(self, columns: str = "*", count: str = None):
+        self.op, self.columns = "select", columns
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = None):
+        self.op, self.payload = "upsert", rows
+        return self
+
+    def update(self, values: Dict):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def _filter(self, kind: str, column: str, value):
+        self.filters.append((kind, column, value))
+        return self
+
+    def eq(self, column, value): return self._filter("eq", column, _text(value))
+    def neq(self, column, value): return self._filter("neq", column, _text(value))
+    def gt(self, column, value): return self._filter("gt", column, _text(value))
+    def gte(self, column, value): return self._filter("gte", column, _text(value))
+    def lt(self, column, value): return self._filter("lt", column, _text(value))
+    def lte(self, column, value): return self._filter("lte", column, _text(value))
+    def in_(self, column, values): return self._filter("in", column, frozenset(map(str, values)))
+
+    def order(self, column: str, desc: bool = False):
+        self.ordering = (column, desc)
+        return self
+
+    def limit(self, n: int):
+        self.max_rows = n
+        return self
+
+    def range(self, start: int, end: int):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self) -> _Response:
+        return self.db._execute(self)
+
+
+class _RPC:
+    def __init__(self, db: "FakeSupabase", name: str, params: Dict):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self) -> _Response:
+        return self.db._rpc(self.name, self.params)
+
+
+def _matches(row: Dict, filters) -> bool:
+    for kind, column, expected in filters:
+        value = _text(_value(row, column))
+        if kind == "in":
+            if value not in expected:
+                return False
+        elif kind == "eq" and value != expected or kind == "neq" and value == expected:
+            return False
+        elif kind in ("gt", "gte", "lt", "lte"):
+            if value is None:
+                return False
+            if (kind == "gt" and not value > expected or kind == "gte" and not value >= expected
+                    or kind == "lt" and not value < expected or kind == "lte" and not value <= expected):
+                return False
+    return True
+
+
+class FakeSupabase:
+    """
+    Tables are insertion-ordered dicts keyed by primary key. `keep_columns` limits which
+    columns of a large table are retained (e.g. no embeddings), so the fake's own memory
+    does not swamp what is being measured. Filtered scans are cached until the table next
+    changes, so paging through a large result with .range() stays linear.
+    """
+
+    def __init__(self, latency: Latency = None, keep_columns: Dict[str, List[str]] = None):
+        self.latency = latency or Latency()
+        self.keep_columns = keep_columns or {}
+        self.tables: Dict[str, "OrderedDict"] = {}
+        self.calls = Counter()
+        self.rows_sent = Counter()
+        self._versions = Counter()
+        self._scans = {}
+        self._lock = threading.RLock()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: Dict) -> _RPC:
+        return _RPC(self, name, params)
+
+    def _key(self, table: str, row: Dict):
+        columns = PRIMARY_KEYS.get(table, ("id",))
+        return tuple(_text(row.get(c)) for c in columns) if len(columns) > 1 else _text(row.get(columns[0]))
+
+    def _store(self, table: str, row: Dict) -> Dict:
+        keep = self.keep_columns.get(table)
+        if keep:
+            row = {c: row[c] for c in keep if c in row}
+        return row
+
+    def _candidates(self, table: str, filters):
+        rows = self.tables.setdefault(table, OrderedDict())
+        key_columns = PRIMARY_KEYS.get(table, ("id",))
+        if len(key_columns) == 1:
+            for kind, column, expected in filters:
+                if column == key_columns[0] and kind in ("eq", "in"):
+                    keys = [expected] if kind == "eq" else expected
+                    return [rows[k] for k in keys if k in rows]
+        return rows.values()
+
+    def _scan(self, query: _Query) -> List[Dict]:
+        cache_key = (query.table, tuple(query.filters), query.ordering, self._versions[query.table])
+        found = self._scans.get(cache_key)
+        if found is None:
+            found = [row for row in self._candidates(query.table, query.filters) if _matches(row, query.filters)]
+            if query.ordering:
+                column, desc = query.ordering
+                found.sort(key=lambda r: (r.get(column) is None, "" if r.get(column) is None else r.get(column)),
+                           reverse=desc)
+            self._scans = {cache_key: found}
+        return found
+
+    def _changed(self, table: str):
+        self._versions[table] += 1
+        self._scans = {}
+
+    def _execute(self, query: _Query) -> _Response:
+        table, op = query.table, query.op
+        with self._lock:
+            rows = self.tables.setdefault(table, OrderedDict())
+            if op == "select":
+                found = self._scan(query)
+                if query.bounds:
+                    found = found[query.bounds[0]:query.bounds[1] + 1]
+                if query.max_rows is not None:
+                    found = found[:query.max_rows]
+                if query.columns.strip() == "*":
+                    data = [dict(r) for r in found]
+                else:
+                    columns = [c.strip() for c in query.columns.split(",")]
+                    data = [{c: r.get(c) for c in columns} for r in found]
+            elif op in ("insert", "upsert"):
+                payload = query.payload if isinstance(query.payload, list) else [query.payload]
+                data = []
+                for row in payload:
+                    row = dict(row)
+                    if table not in PRIMARY_KEYS and not row.get("id"):
+                        row["id"] = str(uuid.uuid4())
+                    key = self._key(table, row)
+                    existing = rows.get(key) if op == "upsert" else None
+                    stored = {**existing, **row} if existing else {**DEFAULTS.get(table, dict)(), **row}
+                    rows[key] = self._store(table, stored)
+                    data.append(stored)
+                self._changed(table)
+            elif op == "update":
+                data = []
+                for row in list(self._candidates(table, query.filters)):
+                    if _matches(row, query.filters):
+                        row.update(query.payload)
+                        data.append(dict(row))
+                self._changed(table)
+            elif op == "delete":
+                doomed = [r for r in self._candidates(table, query.filters) if _matches(r, query.filters)]
+                for row in doomed:
+                    rows.pop(self._key(table, row), None)
+                data = doomed
+                self._changed(table)
+            else:
+                raise ValueError(f"Unsupported operation {op}")
+            self.calls[f"{table}.{op}"] += 1
+            moved = len(data) if op == "select" else len(query.payload) if isinstance(query.payload, list) else 1
+            self.rows_sent[table] += moved
+        _sleep(self.latency.db_ms + self.latency.db_ms_per_row * moved)
+        return _Response(data)
+
+    def _rpc(self, name: str, params: Dict) -> _Response:
+        """match_documents / match_project_documents: cosine ranking when embeddings are kept, else insertion order."""
+        limit = params.get("match_count", 3)
+        project_id = params.get("filter_project_id")
+        with self._lock:
+            self.calls[f"rpc.{name}"] += 1
+            documents = (r for r in self.tables.get("documents", {}).values()
+                         if project_id is None or _value(r, "metadata->>project_id") == str(project_id))
+            if "embedding" in self.keep_columns.get("documents", ["embedding"]):
+                documents = list(documents)
+                matrix = np.asarray([r["embedding"] for r in documents], dtype=np.float32).reshape(len(documents), -1)
+                scores = matrix @ np.asarray(params["query_embedding"], dtype=np.float32)
+                order = np.argsort(-scores, kind="stable")[:limit]
+                data = [{**documents[i], "similarity": float(scores[i])} for i in order]
+            else:
+                data = [{**r, "similarity": 0.0} for r in islice(documents, limit)]
+        _sleep(self.latency.db_ms + self.latency.db_ms_per_row * len(data))
+        return _Response(data)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"calls": dict(sorted(self.calls.items())),
+                    "rows": {table: len(rows) for table, rows in sorted(self.tables.items())},
+                    "rows_transferred": dict(sorted(self.rows_sent.items()))}
+
+
+# --- Groq ---
+
+_WORDS = ("risk budget schedule attrition variance milestone exposure mitigation vendor spend forecast "
+          "delay compliance audit capacity dependency escalation contingency margin runway").split()
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__("Rate limit reached (simulated)")
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after": str(retry_after)})
+
+
+class FakeGroq:
+    """
+    Answers chat.completions.create with text derived from a hash of the messages,
+    after llm_first_token_ms + llm_ms_per_token per output token. Streams token by token.
+    With rate_limit_every=N every Nth request fails with a 429, as Groq does under load.
+    """
+
+    def __init__(self, api_key: str = None, latency: Latency = None, output_tokens: int = 200,
+                 rate_limit_every: int = 0, **kwargs):
+        self.latency = latency or Latency()
+        self.output_tokens = output_tokens
+        self.rate_limit_every = rate_limit_every
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.calls = Counter()
+        self.tokens = Counter()
+        self._lock = threading.Lock()
+
+    def _answer(self, messages: List[Dict], model: str) -> List[str]:
+        digest = hashlib.sha256(f"{model}\0{messages[-1]['content'] if messages else ''}".encode()).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+        words = [_WORDS[i] for i in rng.integers(0, len(_WORDS), self.output_tokens)]
+        return ["Analysis:"] + [f" {w}" for w in words]
+
+    def create(self, messages: List[Dict], model: str, stream: bool = False, **kwargs):
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        with self._lock:
+            self.calls["requests"] += 1
+            limited = self.rate_limit_every and self.calls["requests"] % self.rate_limit_every == 0
+            if limited:
+                self.calls["rate_limited"] += 1
+        _sleep(self.latency.llm_first_token_ms)
+        if limited:
+            raise FakeRateLimitError()
+        tokens = self._answer(messages, model)
+        with self._lock:
+            self.tokens["prompt"] += prompt_tokens
+            self.tokens["completion"] += len(tokens)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(tokens),
+                                total_tokens=prompt_tokens + len(tokens))
+        if stream:
+            return self._stream(tokens)
+        _sleep(self.latency.llm_ms_per_token * len(tokens))
+        message = SimpleNamespace(role="assistant", content="".join(tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+    def _stream(self, tokens: List[str]):
+        for token in tokens:
+            _sleep(self.latency.llm_ms_per_token)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=token))])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**dict(self.calls), "prompt_tokens": self.tokens["prompt"],
+                    "completion_tokens": self.tokens["completion"]}
+
+
+# --- Redis ---
+
+class FakeRedis:
+    """Strings with expiry, counters and lists: the commands backend/cache.py and backend/jobs.py use."""
+
+    def __init__(self, latency: Latency = None):
+        self.latency = latency or Latency()
+        self.calls = Counter()
+        self._data: Dict[str, tuple] = {}
+        self._cond = threading.Condition()
+
+    def _call(self, name: str):
+        self.calls[name] += 1
+        _sleep(self.latency.redis_ms)
+
+    def _live(self, key: str):
+        item = self._data.get(key)
+        if item and item[0] is not None and item[0] <= time.time():
+            del self._data[key]
+            return None
+        return item[1] if item else None
+
+    def ping(self):
+        self._call("ping")
+        return True
+
+    def get(self, key: str):
+        self._call("get")
+        with self._cond:
+            return self._live(key)
+
+    def set(self, key: str, value):
+        self._call("set")
+        with self._cond:
+            self._data[key] = (None, str(value))
+        return True
+
+    def setex(self, key: str, ttl_seconds: int, value):
+        self._call("setex")
+        with self._cond:
+            self._data[key] = (time.time() + ttl_seconds, str(value))
+        return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        self._call("incr")
+        with self._cond:
+            value = int(self._live(key) or 0) + amount
+            expires = self._data[key][0] if key in self._data else None
+            self._data[key] = (expires, str(value))
+            return value
+
+    def lpush(self, key: str, *values) -> int:
+        self._call("lpush")
+        with self._cond:
+            items = self._live(key) or []
+            items[:0] = [str(v) for v in reversed(values)]
+            self._data[key] = (None, items)
+            self._cond.notify_all()
+            return len(items)
+
+    def brpop(self, key: str, timeout: float = 0):
+        self._call("brpop")
+        deadline = time.time() + timeout if timeout else None
+        with self._cond:
+            while not self._live(key):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return key, self._data[key][1].pop()
+
+    def llen(self, key: str) -> int:
+        self._call("llen")
+        with self._cond:
+            return len(self._live(key) or [])
+
+    def stats(self) -> Dict:
+        return dict(sorted(self.calls.items()))
+
+
+# --- Embeddings ---
+
+class FakeEmbeddingModel:
+    """
+    Stands in for SentenceTransformer: a fixed random projection of each text's byte
+    histogram, L2-normalised, so equal texts get equal vectors and similar texts similar ones.
+    """
+
+    def __init__(self, dims: int = 384, latency: Latency = None, seed: int = 0):
+        self.latency = latency or Latency()
+        self.projection = np.random.default_rng(seed).standard_normal((256, dims)).astype(np.float32)
+        self.texts = 0
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        self.texts += len(texts)
+        _sleep(self.latency.embed_ms_per_text * len(texts))
+        counts = np.zeros((len(texts), 256), dtype=np.float32)
+        for i, text in enumerate(texts):
+            counts[i] = np.bincount(np.frombuffer(text.encode("utf-8"), dtype=np.uint8), minlength=256)
+        vectors = counts @ self.projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+        return vectors[0] if single else vectors
@@ -0,0 +1,146 @@
+"""
+Deterministic synthetic uploads in the schemas of test_files/ (employees, projects,
+financials), with the same Python-literal cells, at any row count.
+
+Usage (from the repo root):
+    python -m benchmarks.synthetic --rows 100000 --out /tmp/riskpilot-100k
+"""
+import argparse
+import os
+from typing import Callable, Dict
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ["Software License", "Contractor", "Cloud Hosting", "Equipment", "Travel", "Training",
+              "Marketing", "Consulting", "Office Supplies", "Legal", "Recruiting", "Insurance"]
+ITEMS = ["API Credits", "Monthly Bill", "Annual Renewal", "Laptop Purchase", "Flight Booking",
+         "Workshop Fees", "Ad Campaign", "Audit Services", "Freelancer Payment", "Support Plan",
+         "Hotel Stay", "Data Migration", "Security Review", "Licence Upgrade", "Conference Pass"]
+VENDORS = [f"{prefix} {suffix}" for prefix in ("Acme", "Globex", "Initech", "Umbrella", "Stark", "Wayne",
+                                               "Hooli", "Vandelay", "Soylent", "Tyrell")
+           for suffix in ("Corp", "Labs", "Systems", "Partners")]
+APPROVERS = ["Alice Johnson", "Bob Smith", "Carol White", "David Brown", "Eve Davis", "Frank Miller",
+             "Grace Lee", "Henry Wilson", "Ivy Clark", "Jack Turner"]
+BUDGETS = ["Operational", "Labor", "Infrastructure", "Capital", "Marketing"]
+PROJECTS = ["Gemini Integration", "Mobile App Revamp", "Legacy Migration", "Data Platform",
+            "Customer Portal", "Billing Rewrite"]
+
+FIRST_NAMES = ["Alice", "Bob", "Charlie", "Diana", "Ethan", "Fiona", "George", "Hannah", "Ivan", "Julia",
+               "Kevin", "Laura", "Mohan", "Nina", "Omar", "Priya", "Quentin", "Rosa", "Sam", "Tara"]
+LAST_NAMES = ["Johnson", "Smith", "Davis", "Evans", "Hunt", "Chen", "Garcia", "Patel", "Kim", "Muller",
+              "Rossi", "Silva", "Tanaka", "Nowak", "Okafor", "Singh", "Brown", "Lopez", "Ivanov", "Haddad"]
+ROLES = ["Senior Developer", "Project Manager", "UX Designer", "Data Analyst", "Security Specialist",
+         "DevOps Engineer", "QA Engineer", "Product Owner", "Staff Engineer", "Support Lead"]
+DEPARTMENTS = ["Engineering", "Product", "Design", "Data", "Security", "Operations", "Sales", "Finance"]
+SKILLS = ["Python", "FastAPI", "React", "Agile", "JIRA", "Scrum", "Figma", "SQL", "Pandas", "Tableau",
+          "Kubernetes", "AWS", "Go", "Rust", "Cybersecurity", "TensorFlow", "Excel", "Negotiation"]
+COMPANIES = ["TechCorp", "Meta", "Google", "Samsung", "TCS", "Initech"]
+PARTNERS = ["Google Cloud", "AppStudio", "Oculus", "DeepMind", "Accenture", "None"]
+DESCRIPTIONS = ["Integrate AI into existing platform", "Migrate legacy database", "Redesign mobile apps",
+                "Build customer self-service portal", "Consolidate billing systems", "Harden network security"]
+MILESTONES = ["API Setup", "Beta Launch", "Schema Design", "Data Transfer", "UI/UX Finalize", "Dev Sprint 1",
+              "Security Audit", "Go Live"]
+
+
+def _pick(rng, values, rows: int) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), rows)]
+
+
+def _dates(rng, rows: int, start: str, days: int) -> pd.DatetimeIndex:
+    return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit="D")
+
+
+def _text(values) -> pd.Series:
+    return pd.Series(values).astype(str)
+
+
+def project_name(index) -> pd.Series:
+    """Project names are a function of the row number, so financials can refer to them."""
+    index = np.asarray(index)
+    return _text(np.asarray(PROJECTS, dtype=object)[index % len(PROJECTS)]) + " " + _text(index // len(PROJECTS) + 1)
+
+
+def financials(rows: int, start: int = 0, seed: int = 7, projects: int = len(PROJECTS)) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, start])
+    return pd.DataFrame({
+        "date": _dates(rng, rows, "2023-01-01", 730).strftime("%Y-%m-%d"),
+        "category": _pick(rng, CATEGORIES, rows),
+        "amount": np.round(rng.lognormal(7.5, 1.0, rows), 2),
+        "description": _pick(rng, ITEMS, rows) + " from " + _pick(rng, VENDORS, rows),
+        "approved_by": _pick(rng, APPROVERS, rows),
+        "budget_category": _pick(rng, BUDGETS, rows),
+        "project_name": project_name(rng.integers(0, max(1, projects), rows)).to_numpy(),
+    })
+
+
+def employees(rows: int, start: int = 0, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, start])
+    ratings = np.round(rng.uniform(2.0, 5.0, (rows, 2)), 1)
+    absences = rng.poisson(4, (rows, 2))
+    skill = rng.integers(0, len(SKILLS), rows)
+    skill_names = [_text(np.asarray(SKILLS, dtype=object)[(skill + k) % len(SKILLS)]) for k in (0, 5, 11)]
+    return pd.DataFrame({
+        "id": "E" + pd.Series(np.arange(start, start + rows)).astype(str).str.zfill(7),
+        "name": _pick(rng, FIRST_NAMES, rows) + " " + _pick(rng, LAST_NAMES, rows),
+        "role": _pick(rng, ROLES, rows),
+        "department": _pick(rng, DEPARTMENTS, rows),
+        "join_date": _dates(rng, rows, "2015-01-01", 3650).strftime("%Y-%m-%d"),
+        "performance_ratings": ("{'2023': " + _text(ratings[:, 0]) + ", '2024': " + _text(ratings[:, 1]) + "}").to_numpy(),
+        "attendance_record": ("{'absent': " + _text(absences[:, 0]) + ", 'late': " + _text(absences[:, 1]) + "}").to_numpy(),
+        "skills": ("['" + skill_names[0] + "', '" + skill_names[1] + "', '" + skill_names[2] + "']").to_numpy(),
+    })
+
+
+def projects(rows: int, start: int = 0, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, start])
+    begin = _dates(rng, rows, "2023-01-01", 540)
+    length = pd.to_timedelta(rng.integers(90, 540, rows), unit="D")
+    first = begin + length * 0.3
+    second = begin + length * 0.8
+    milestone = lambda names, dates: "{'name': '" + _text(names) + "', 'date': '" + _text(dates.strftime("%Y-%m-%d")) + "'}"
+    return pd.DataFrame({
+        "name": project_name(np.arange(start, start + rows)).to_numpy(),
+        "description": _pick(rng, DESCRIPTIONS, rows),
+        "start_date": begin.strftime("%Y-%m-%d"),
+        "deadline": (begin + length).strftime("%Y-%m-%d"),
+        "parent_company": _pick(rng, COMPANIES, rows),
+        "business_partner": _pick(rng, PARTNERS, rows),
+        "budget": rng.integers(10, 2000, rows) * 1000,
+        "milestones": ("[" + milestone(_pick(rng, MILESTONES, rows), first) + ", "
+                       + milestone(_pick(rng, MILESTONES, rows), second) + "]").to_numpy(),
+    })
+
+
+def write_csv(path: str, make: Callable[..., pd.DataFrame], rows: int, chunk_rows: int = 100_000, **kwargs) -> str:
+    """Write `rows` generated rows to `path`, `chunk_rows` at a time so memory stays bounded."""
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        for start in range(0, rows, chunk_rows):
+            make(min(chunk_rows, rows - start), start, **kwargs).to_csv(out, index=False, header=start == 0)
+    return path
+
+
+def write_uploads(directory: str, rows: int, project_rows: int = None, seed: int = 7) -> Dict[str, str]:
+    """The three init uploads with `rows` employees and financial records; returns paths by kind."""
+    project_rows = project_rows or rows
+    os.makedirs(directory, exist_ok=True)
+    return {
+        "projects": write_csv(os.path.join(directory, "projects.csv"), projects, project_rows, seed=seed),
+        "employees": write_csv(os.path.join(directory, "employees.csv"), employees, rows, seed=seed),
+        "financials": write_csv(os.path.join(directory, "financials.csv"), financials, rows, seed=seed,
+                                projects=project_rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--project-rows", type=int, default=None, help="defaults to --rows")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", required=True, help="directory for projects.csv, employees.csv, financials.csv")
+    args = parser.parse_args()
+    for kind, path in write_uploads(args.out, args.rows, args.project_rows, args.seed).items():
+        print(f"{kind:<12}{path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -57,7 +57,8 @@ def test_backend():
             'financial_file': ('fin.csv', 'date,amount\n2024-01-01,100', 'text/csv')
         }
         try:
-             r = requests.post(f"{BASE_URL}/chat/init/{project_id}", files=files)
+             # wait=true runs the init job within the request instead of returning a job id to poll
+             r = requests.post(f"{BASE_URL}/chat/init/{project_id}", params={"wait": "true"}, files=files)
              print(f"Status: {r.status_code}")
              if r.status_code == 200:
                  print("✅ AI Initialization Passed!")
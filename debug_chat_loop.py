@@ -20,7 +20,8 @@ def run_chat_loop():
         'project_file': ('proj.csv', 'name,due\nA,2025', 'text/csv'),
         'financial_file': ('fin.csv', 'date,amt\n2025,100', 'text/csv')
     }
-    r = requests.post(f"{BASE_URL}/chat/init/{pid}", files=files)
+    # wait=true runs the init job within the request instead of returning a job id to poll
+    r = requests.post(f"{BASE_URL}/chat/init/{pid}", params={"wait": "true"}, files=files)
     if r.status_code != 200:
         print(f"Init Failed: {r.text}")
         return
@@ -1,5 +1,7 @@
 import streamlit as st
 import requests
+import json
+import time
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -11,6 +13,11 @@ import os
 # Configuration
 # Default to localhost for local dev, but override with env var in production
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.5"))
+# Give up on a job after this long, or after this many poll requests in a row fail to connect
+JOB_WAIT_SECONDS = float(os.getenv("JOB_WAIT_SECONDS", "1800"))
+JOB_POLL_MAX_ERRORS = 3
+REQUEST_TIMEOUT_SECONDS = 10
 st.set_page_config(page_title="RiskPilot", page_icon="✈️", layout="wide")
 
 # Custom CSS for "professional" look
@@ -65,6 +72,53 @@ def create_project(name, description, budget):
         st.error(f"Error creating project: {e}")
         return None
 
+def wait_for_job(job_id):
+    """Poll a background job, showing its current stage, until it succeeds or fails."""
+    bar = st.progress(0.0, text="Queued...")
+    deadline = time.time() + JOB_WAIT_SECONDS
+    errors = 0
+    while True:
+        if time.time() > deadline:
+            bar.empty()
+            return {"status": "failed", "error": f"Gave up waiting for job {job_id} after {JOB_WAIT_SECONDS:.0f}s"}
+        try:
+            res = requests.get(f"{API_URL}/jobs/{job_id}", timeout=REQUEST_TIMEOUT_SECONDS)
+        except requests.exceptions.RequestException as e:
+            errors += 1
+            if errors >= JOB_POLL_MAX_ERRORS:
+                bar.empty()
+                return {"status": "failed", "error": f"Lost contact with the backend: {e}"}
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        errors = 0
+        # A 404 means the job is gone (evicted from the local job table, or the backend restarted)
+        if res.status_code != 200:
+            bar.empty()
+            return {"status": "failed", "error": f"Job status unavailable ({res.status_code}): {res.text}"}
+        job = res.json()
+        stage = job.get("stage") or "queued"
+        detail = next((s.get("detail") for s in job.get("stages", []) if s["name"] == stage), None)
+        rows = f" ({detail['rows']:,} rows)" if isinstance(detail, dict) and "rows" in detail else ""
+        bar.progress(job.get("progress", 0.0), text=f"{stage.title()}{rows}...")
+        if job.get("status") in ("succeeded", "failed"):
+            bar.empty()
+            return job
+        time.sleep(JOB_POLL_SECONDS)
+
+def stream_chat(project_id, message):
+    """Yield response tokens from the backend's Server-Sent-Events chat endpoint."""
+    with requests.post(f"{API_URL}/chat/stream/{project_id}", json={"message": message}, stream=True) as resp:
+        resp.raise_for_status()
+        event = "message"
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                event = "message"
+                continue
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event == "message":
+                yield json.loads(line[len("data:"):].strip()).get("token", "")
+
 # --- UI Layout ---
 
 st.title(" RiskPilot: Corporate Risk Intelligence")
@@ -90,7 +144,8 @@ if page == "Add New Project":
         
         if submitted:
             if name and employee_file and project_file and financial_file:
-                with st.spinner("Creating Project and Running AI Agents..."):
+                job_id = None
+                with st.spinner("Creating Project and Uploading Data..."):
                     # 1. Create Project
                     project_data = create_project(name, description, budget)
                     
@@ -114,14 +169,22 @@ if page == "Add New Project":
                                 }
                             )
                             
-                            if res.status_code == 200:
-                                st.success("Project Initialized Successfully!")
-                                st.write("### Initial AI Analysis")
-                                st.info(res.json().get("analysis"))
+                            if res.status_code == 202:
+                                job_id = res.json()["job_id"]
                             else:
                                 st.error(f"Analysis Failed: {res.text}")
                         except Exception as e:
                             st.error(f"Upload failed: {e}")
+
+                # 3. The analysis runs as a background job; poll it instead of holding the upload request open
+                if job_id:
+                    job = wait_for_job(job_id)
+                    if job.get("status") == "succeeded":
+                        st.success("Project Initialized Successfully!")
+                        st.write("### Initial AI Analysis")
+                        st.info(job["result"].get("analysis"))
+                    else:
+                        st.error(f"Analysis Failed: {job.get('error')}")
             else:
                 st.warning("Please fill all fields and upload all files.")
 
@@ -212,6 +275,18 @@ elif page == "Dashboard":
             ))
             st.plotly_chart(fig_gauge, use_container_width=True)
 
+            st.write("### 🚩 Spending Anomalies")
+            try:
+                anomalies_res = requests.get(f"{API_URL}/projects/{project_id}/anomalies")
+                flags = anomalies_res.json().get("flags", []) if anomalies_res.status_code == 200 else []
+                if flags:
+                    df_flags = pd.DataFrame(flags)[["date", "category", "amount", "type", "reason"]]
+                    st.dataframe(df_flags, use_container_width=True, hide_index=True)
+                else:
+                    st.info("No spending anomalies detected.")
+            except:
+                st.warning("Could not fetch anomaly flags.")
+
         with tab2:
             st.write("### Chat with RiskPilot")
             
@@ -237,16 +312,9 @@ elif page == "Dashboard":
                 with st.chat_message("user"):
                     st.write(user_input)
                 
-                # Send to API
-                with st.spinner("Analyzing..."):
-                    try:
-                        payload = {"message": user_input}
-                        resp = requests.post(f"{API_URL}/chat/continue/{project_id}", json=payload)
-                        if resp.status_code == 200:
-                            ai_reply = resp.json().get("response")
-                            with st.chat_message("ai"):
-                                st.write(ai_reply)
-                        else:
-                            st.error("Failed to get response")
-                    except Exception as e:
-                        st.error(f"Error: {e}")
+                # Stream the answer from the API as it is generated
+                try:
+                    with st.chat_message("ai"):
+                        st.write_stream(stream_chat(project_id, user_input))
+                except Exception as e:
+                    st.error(f"Error: {e}")
@@ -40,6 +40,68 @@ begin
 end;
 $$;
 
+-- DOCUMENT INDEXES
+-- Lets project-scoped lookups and deletes (metadata->>'project_id') avoid a full table scan
+create index if not exists documents_project_id_idx
+  on documents ((metadata->>'project_id'));
+
+-- Approximate nearest-neighbour index for cosine distance (<=>)
+create index if not exists documents_embedding_hnsw_idx
+  on documents using hnsw (embedding vector_cosine_ops);
+
+-- MATCH PROJECT DOCUMENTS FUNCTION (RPC)
+-- Same as match_documents but restricted to one project's rows, so a tenant only
+-- ever searches (and sees) its own documents and cost follows that project's size.
+-- The HNSW index returns the nearest rows of the whole table (hnsw.ef_search of them) and
+-- the project filter runs afterwards, so a small project could get no rows back at all.
+-- pgvector 0.8+ keeps scanning the index until enough rows pass the filter
+-- (hnsw.iterative_scan); older versions get a wider candidate list instead.
+create or replace function match_project_documents (
+  query_embedding vector(384),
+  match_threshold float,
+  match_count int,
+  filter_project_id text
+)
+returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+declare
+  vector_version int[];
+begin
+  -- Branch on the installed version: setting an unknown hnsw.* option does not fail, it is just ignored
+  select (string_to_array(extversion, '.'))[1:2]::int[] into vector_version
+  from pg_extension where extname = 'vector';
+  if vector_version >= array[0, 8] then
+    perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  else
+    perform set_config('hnsw.ef_search', '1000', true);
+  end if;
+
+  -- relaxed_order may return neighbours slightly out of order, so rank them again here
+  return query
+  with nearest as materialized (
+    select
+      documents.id,
+      documents.content,
+      documents.metadata,
+      documents.embedding <=> query_embedding as distance
+    from documents
+    where documents.metadata->>'project_id' = filter_project_id
+    order by documents.embedding <=> query_embedding
+    limit match_count
+  )
+  select nearest.id, nearest.content, nearest.metadata, 1 - nearest.distance as similarity
+  from nearest
+  where 1 - nearest.distance > match_threshold
+  order by nearest.distance;
+end;
+$$;
+
 -- PROJECTS TABLE
 create table if not exists projects (
   id uuid default gen_random_uuid() primary key,
@@ -94,3 +156,52 @@ create table if not exists chat_history (
   response text,
   timestamp timestamp with time zone default now()
 );
+
+create index if not exists chat_history_project_timestamp_idx
+  on chat_history (project_id, timestamp);
+
+-- CONVERSATION SUMMARIES TABLE
+-- Rolling summary of chat turns up to summarized_until; newer turns are replayed verbatim
+create table if not exists conversation_summaries (
+  project_id uuid primary key references projects(id) on delete cascade,
+  summary text,
+  summarized_until timestamp with time zone,
+  updated_at timestamp with time zone default now()
+);
+
+-- EMPLOYEE RISK SCORES TABLE
+-- Deterministic attrition scores computed by backend/employee_risk.py for each project upload
+create table if not exists employee_risk_scores (
+  project_id uuid references projects(id) on delete cascade,
+  employee_id text not null,
+  name text,
+  department text,
+  rating_latest float,
+  rating_trend float,
+  absence_rate float,
+  lateness_rate float,
+  tenure_years float,
+  attrition_score float,
+  risk_level text,
+  computed_at timestamp with time zone default now(),
+  primary key (project_id, employee_id)
+);
+
+create index if not exists employee_risk_scores_rank_idx
+  on employee_risk_scores (project_id, attrition_score desc);
+
+-- PROJECT SCHEDULE ROWS TABLE
+-- Schedule inputs from a project's latest projects upload (backend/schedule.py computes the
+-- variance from them); ids are content-derived so re-uploads only write changed rows
+create table if not exists project_schedule_rows (
+  id uuid primary key,
+  project_id uuid references projects(id) on delete cascade,
+  name text,
+  start_date text,
+  deadline text,
+  progress float,
+  milestones text -- Python/JSON list literal, as in the CSV
+);
+
+create index if not exists project_schedule_rows_project_id_idx
+  on project_schedule_rows (project_id);
@@ -0,0 +1,97 @@
+import pytest
+
+from benchmarks.fakes import FakeSupabase, Latency
+from backend.bulk_writer import BulkWriter, BulkWriteError, idempotent_ids
+
+
+def _db() -> FakeSupabase:
+    return FakeSupabase(latency=Latency(db_ms=0, db_ms_per_row=0))
+
+
+class FlakyClient:
+    """Wraps a FakeSupabase; writes fail for the first `failures` calls and for any batch containing a row in `poison`."""
+
+    def __init__(self, db: FakeSupabase, failures: int = 0, poison=()):
+        self.db = db
+        self.failures = failures
+        self.poison = set(poison)
+        self.attempts = 0
+
+    def table(self, name: str):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("connection reset")
+        query = self.db.table(name)
+        insert = query.insert
+
+        def checked_insert(rows):
+            if any(row["id"] in self.poison for row in rows):
+                raise ValueError("invalid input syntax")
+            return insert(rows)
+
+        query.insert = checked_insert
+        return query
+
+
+def _rows(n: int):
+    return [{"id": str(i), "value": i} for i in range(n)]
+
+
+def test_batches_by_row_count():
+    db = _db()
+    stats = BulkWriter(lambda: db, batch_rows=10).write("items", _rows(25))
+    assert stats["rows"] == 25
+    assert stats["batches"] == 3
+    assert db.calls["items.insert"] == 3
+    assert len(db.tables["items"]) == 25
+
+
+def test_batches_by_size():
+    db = _db()
+    rows = [{"id": str(i), "text": "x" * 100} for i in range(10)]
+    stats = BulkWriter(lambda: db, batch_rows=1000, batch_bytes=300).write("items", rows)
+    assert stats["rows"] == 10
+    # Each row is about 120 bytes of JSON, so two fit under the limit
+    assert stats["batches"] == 5
+
+
+def test_retries_transient_failures():
+    db = _db()
+    client = FlakyClient(db, failures=2)
+    stats = BulkWriter(lambda: client, batch_rows=10, concurrency=1, backoff_seconds=0).write("items", _rows(10))
+    assert stats["retries"] == 2
+    assert stats["failed_rows"] == 0
+    assert len(db.tables["items"]) == 10
+
+
+def test_partial_failure_raises_after_sending_other_batches():
+    db = _db()
+    client = FlakyClient(db, poison={"12"})
+    writer = BulkWriter(lambda: client, batch_rows=10, max_retries=1, backoff_seconds=0)
+    with pytest.raises(BulkWriteError) as raised:
+        writer.write("items", _rows(30))
+    assert raised.value.table == "items"
+    assert raised.value.stats["failed_rows"] == 10
+    assert raised.value.stats["failed_batches"] == 1
+    assert raised.value.stats["retries"] == 1
+    assert "invalid input syntax" in str(raised.value)
+    # The batches without the bad row are still written
+    assert sorted(db.tables["items"], key=int) == [str(i) for i in range(30) if not 10 <= i < 20]
+
+
+def test_allow_partial_returns_stats():
+    db = _db()
+    client = FlakyClient(db, poison={"0"})
+    stats = BulkWriter(lambda: client, batch_rows=5, max_retries=0).write("items", _rows(10), allow_partial=True)
+    assert stats["rows"] == 5
+    assert stats["failed_rows"] == 5
+
+
+def test_upsert_with_idempotent_ids_is_repeatable():
+    db = _db()
+    writer = BulkWriter(lambda: db, batch_rows=4)
+    for _ in range(2):
+        rows = idempotent_ids(({"value": i} for i in range(10)), "items:p1")
+        writer.write("items", rows, method="upsert", on_conflict="id")
+    assert len(db.tables["items"]) == 10
+    assert db.calls["items.upsert"] == 6
@@ -0,0 +1,29 @@
+import io
+import contextlib
+
+from benchmarks.fakes import FakeSupabase, Latency
+from backend.bulk_writer import BulkWriter
+from backend.ingestion import UploadIngestion
+
+FINANCIALS = "date,category,amount,description,approved_by,budget_category\n" + "".join(
+    f"2024-01-{i + 1:02d},Travel,{'' if i == 3 else 100 + i},Flight {i},Bob,Ops\n" for i in range(6))
+PROJECTS = "name,start_date,deadline,current_progress,milestones\n" + "".join(
+    f"P{i},2024-01-01,2024-06-01,{'' if i == 1 else i * 10},[]\n" for i in range(6))
+
+
+def _upload(db: FakeSupabase, chunk_rows: int) -> UploadIngestion:
+    ingestion = UploadIngestion("p1", lambda: db, BulkWriter(lambda: db), chunk_rows=chunk_rows)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingestion.financials(io.BytesIO(FINANCIALS.encode()))
+        ingestion.projects(io.BytesIO(PROJECTS.encode()))
+    return ingestion
+
+
+def test_reupload_in_different_chunks_keeps_row_ids():
+    # A chunk whose numeric column has a blank parses as float (101.0), another one as int (101)
+    db = FakeSupabase(latency=Latency(db_ms=0, db_ms_per_row=0))
+    _upload(db, chunk_rows=6)
+    changes = _upload(db, chunk_rows=2).stats["changes"]
+    assert changes["financial_records"] == {"added": 0, "removed": 0, "unchanged": 6}
+    assert changes["project_schedule_rows"] == {"added": 0, "removed": 0, "unchanged": 6}
+    assert len(db.tables["financial_records"]) == 6
@@ -0,0 +1,174 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks.fakes import FakeGroq, FakeRateLimitError, Latency
+from backend.llm_scheduler import BATCH, INTERACTIVE, CircuitBreaker, LLMScheduler, LLMUnavailableError, TokenBucket
+
+MESSAGES = [{"role": "user", "content": "Summarize the project risks"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _groq(rate_limit_every: int = 0) -> FakeGroq:
+    return FakeGroq(latency=Latency(llm_first_token_ms=0, llm_ms_per_token=0), output_tokens=5,
+                    rate_limit_every=rate_limit_every)
+
+
+def _scheduler(clock=None, sleeps=None, **kwargs) -> LLMScheduler:
+    clock = clock or FakeClock()
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=10, reset_seconds=30, clock=clock))
+    return LLMScheduler(requests_per_minute=1000, tokens_per_minute=1_000_000, clock=clock,
+                        sleep=(sleeps.append if sleeps is not None else lambda seconds: None), **kwargs)
+
+
+def test_retries_rate_limit_using_retry_after():
+    groq = _groq(rate_limit_every=2)
+    sleeps = []
+    scheduler = _scheduler(sleeps=sleeps)
+    scheduler.complete(groq, MESSAGES, "model")
+    response = scheduler.complete(groq, MESSAGES, "model")
+    assert response.choices[0].message.content.startswith("Analysis:")
+    assert groq.calls["requests"] == 3
+    assert sleeps == [1.0]
+    assert scheduler.counters["retries"] == 1
+    assert scheduler.counters["rate_limited"] == 1
+
+
+def test_gives_up_after_max_retries():
+    groq = _groq(rate_limit_every=1)
+    scheduler = _scheduler(max_retries=2)
+    with pytest.raises(LLMUnavailableError):
+        scheduler.complete(groq, MESSAGES, "model")
+    assert groq.calls["requests"] == 3
+    assert scheduler.counters["failures"] == 1
+
+
+def test_non_retryable_errors_are_raised_as_is():
+    class BrokenClient:
+        calls = 0
+
+        def __init__(self):
+            self.chat = self
+            self.completions = self
+
+        def create(self, **kwargs):
+            BrokenClient.calls += 1
+            raise ValueError("bad request")
+
+    sleeps = []
+    with pytest.raises(ValueError):
+        _scheduler(sleeps=sleeps).complete(BrokenClient(), MESSAGES, "model")
+    assert BrokenClient.calls == 1
+    assert sleeps == []
+
+
+def test_breaker_opens_rejects_and_recovers():
+    clock = FakeClock()
+    groq = _groq(rate_limit_every=1)
+    scheduler = _scheduler(clock, max_retries=5,
+                           breaker=CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=clock))
+    with pytest.raises(LLMUnavailableError):
+        scheduler.complete(groq, MESSAGES, "model")
+    # Stops retrying as soon as the circuit opens
+    assert groq.calls["requests"] == 2
+    assert scheduler.breaker.state == "open"
+
+    with pytest.raises(LLMUnavailableError):
+        scheduler.complete(groq, MESSAGES, "model")
+    assert groq.calls["requests"] == 2
+    assert scheduler.counters["rejected"] == 1
+
+    clock.now += 31
+    groq.rate_limit_every = 0
+    scheduler.complete(groq, MESSAGES, "model")
+    assert scheduler.breaker.state == "closed"
+
+
+def test_stream_retries_opening_the_stream():
+    groq = _groq(rate_limit_every=1)
+    sleeps = []
+    scheduler = _scheduler(sleeps=sleeps)
+    chunks = scheduler.stream(groq, MESSAGES, "model")
+    with pytest.raises(LLMUnavailableError):
+        next(chunks)
+    assert groq.calls["requests"] == scheduler.max_retries + 1
+    assert len(sleeps) == scheduler.max_retries
+    assert scheduler.stats()["active"] == 0
+
+    groq.rate_limit_every = 0
+    fresh = _scheduler()
+    text = "".join(c.choices[0].delta.content for c in fresh.stream(groq, MESSAGES, "model"))
+    assert text.startswith("Analysis:")
+    # The slot is handed back once the stream is exhausted
+    assert fresh.stats()["active"] == 0
+
+
+def test_interactive_calls_go_before_queued_batch_calls():
+    release = threading.Event()
+    order = []
+
+    class GatedClient:
+        def __init__(self):
+            self.chat = self
+            self.completions = self
+
+        def create(self, messages, **kwargs):
+            order.append(messages[0]["content"])
+            if messages[0]["content"] == "first":
+                release.wait(5)
+            return None
+
+    client = GatedClient()
+    scheduler = LLMScheduler(requests_per_minute=1000, tokens_per_minute=1_000_000, max_concurrency=1)
+
+    def call(content, priority):
+        scheduler.complete(client, [{"role": "user", "content": content}], "model", priority=priority)
+
+    def wait_for(condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=call, args=("first", BATCH))]
+    threads[0].start()
+    wait_for(lambda: order == ["first"])
+    # The only slot is taken: queue a batch call, then an interactive one behind it
+    threads.append(threading.Thread(target=call, args=("batch", BATCH)))
+    threads[-1].start()
+    wait_for(lambda: scheduler.stats()["queue_depth"]["batch"] == 1)
+    threads.append(threading.Thread(target=call, args=("interactive", INTERACTIVE)))
+    threads[-1].start()
+    wait_for(lambda: scheduler.stats()["queue_depth"]["interactive"] == 1)
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["first", "interactive", "batch"]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_token_bucket_waits_for_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == 0.0
+
+
+def test_rate_limit_error_is_recognised():
+    from backend.llm_scheduler import is_rate_limit, is_retryable
+    error = FakeRateLimitError()
+    assert is_rate_limit(error) and is_retryable(error)
+    assert not is_retryable(ValueError())